@@ -0,0 +1,79 @@
+"""
+Бенчмарк записи событий ответов: пропускная способность AnswerEventsWriter
+в событиях в секунду.
+
+Производители кладут события через put(), то есть упираются
+в ограничение буфера, а не теряют события. События пишутся
+от отрицательных user_id и удаляются после прогона.
+
+    python benchmarks/answer_events.py --seconds 10 --producers 50
+    python benchmarks/answer_events.py --batch-size 5000 --buffer 100000
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+import sqlalchemy as sq
+from ruentrainerbot.db.events import AnswerEventsWriter
+from ruentrainerbot.db.models import AnswerEvents, UserStats
+from ruentrainerbot.db.queries import delete_user_stats
+from ruentrainerbot.db.session import engine
+
+
+async def _produce(writer: AnswerEventsWriter, deadline: float, counter: list[int]) -> None:
+    while time.perf_counter() < deadline:
+        await writer.put({
+            'answered_at': datetime.now(timezone.utc),
+            'user_id': -random.randint(1, 10_000),
+            'word_id': random.randint(1, 50_000),
+            'is_correct': random.random() < 0.7,
+            'picked_index': random.randrange(4),
+            'mode': 'general',
+        })
+        counter[0] += 1
+        # отдаем управление, как обработчик между апдейтами
+        if counter[0] % 100 == 0:
+            await asyncio.sleep(0)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--seconds', type=float, default=10, help='длительность прогона')
+    parser.add_argument('--producers', type=int, default=50, help='параллельных производителей')
+    parser.add_argument('--batch-size', type=int, default=1000, help='событий в одном INSERT')
+    parser.add_argument('--buffer', type=int, default=50_000, help='размер буфера')
+    parser.add_argument('--flush-interval', type=float, default=1.0, help='период сброса, с')
+    args = parser.parse_args()
+
+    async with engine.begin() as conn:
+        await conn.run_sync(AnswerEvents.__table__.create, checkfirst=True)
+
+    writer = AnswerEventsWriter(
+        engine,
+        max_buffer=args.buffer,
+        batch_size=args.batch_size,
+        flush_interval=args.flush_interval,
+    )
+    writer.start()
+    counter = [0]
+    started = time.perf_counter()
+    deadline = started + args.seconds
+    await asyncio.gather(*(_produce(writer, deadline, counter) for _ in range(args.producers)))
+    produced = time.perf_counter() - started
+    await writer.stop()
+    elapsed = time.perf_counter() - started
+
+    print(f'событий: {counter[0]}')
+    print(f'прием в буфер: {counter[0] / produced:.0f} событий/с')
+    print(f'запись в БД: {counter[0] / elapsed:.0f} событий/с '
+          f'(batch {args.batch_size}, buffer {args.buffer})')
+
+    async with engine.begin() as conn:
+        await conn.execute(sq.delete(AnswerEvents).where(AnswerEvents.user_id < 0))
+        await delete_user_stats(conn, UserStats.user_id < 0)
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
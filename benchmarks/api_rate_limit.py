@@ -0,0 +1,85 @@
+"""
+Бенчмарк исходящих вызовов Bot API под лимитами Telegram.
+
+Поднимает фейковый Bot API (fake_bot_api.py) и гоняет через настоящую
+AiohttpSession ответы квиза: answerCallbackQuery, editMessageText
+и sendMessage на каждый ответ, --answers ответов подряд в --chats чатах.
+Сравнивает сессию без ограничений и с ApiRateLimitMiddleware:
+время, успешные вызовы, ошибки 429 у клиента и 429 на сервере.
+
+    python benchmarks/api_rate_limit.py --chats 50 --answers 5
+"""
+import argparse
+import asyncio
+import time
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.exceptions import TelegramRetryAfter
+from ruentrainerbot.core.config import settings
+from ruentrainerbot.core.logging import configure_logging
+from ruentrainerbot.middlewares.api_rate_limit import ApiRateLimitMiddleware
+from fake_bot_api import FakeBotAPI, start_fake_bot_api
+
+PORT = 8099
+
+
+async def _answer(bot: Bot, chat_id: int, n: int, counters: dict[str, int]) -> None:
+    async def call(coro) -> None:
+        try:
+            await coro
+            counters['ok'] += 1
+        except TelegramRetryAfter:
+            counters['429'] += 1
+
+    await asyncio.gather(
+        call(bot.answer_callback_query(f'{chat_id}:{n}', text='✅ Верно!')),
+        call(bot.edit_message_text('✅ Верно!', chat_id=chat_id, message_id=n)),
+    )
+    await call(bot.send_message(chat_id, f'Вопрос {n + 1}'))
+
+
+async def run(limited: bool, chats: int, answers: int) -> None:
+    api = FakeBotAPI(settings.api_chat_rate, settings.api_chat_burst, settings.api_global_rate)
+    runner = await start_fake_bot_api(api, '127.0.0.1', PORT)
+    session = AiohttpSession(api=TelegramAPIServer.from_base(f'http://127.0.0.1:{PORT}'))
+    if limited:
+        session.middleware(ApiRateLimitMiddleware(
+            global_rate=settings.api_global_rate,
+            chat_rate=settings.api_chat_rate,
+            chat_burst=settings.api_chat_burst,
+            group_rate=settings.api_group_rate,
+            max_retries=settings.api_max_retries,
+        ))
+    bot = Bot(token='1:fake', session=session)
+    counters = {'ok': 0, '429': 0}
+
+    async def chat(chat_id: int) -> None:
+        for n in range(answers):
+            await _answer(bot, chat_id, n, counters)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(chat(chat_id) for chat_id in range(1, chats + 1)))
+    elapsed = time.perf_counter() - started
+    await session.close()
+    await runner.cleanup()
+
+    print(f'\n{"с лимитером" if limited else "без лимитера"}: {elapsed:.1f} с, '
+          f'успешно {counters["ok"]}, 429 у клиента {counters["429"]}, '
+          f'{counters["ok"] / elapsed:.0f} вызовов/с')
+    print(f'сервер: {api.stats()}')
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--chats', type=int, default=50, help='чатов')
+    parser.add_argument('--answers', type=int, default=5, help='ответов подряд в каждом чате')
+    args = parser.parse_args()
+
+    configure_logging(debug=False, log_level='ERROR')
+    await run(False, args.chats, args.answers)
+    await run(True, args.chats, args.answers)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
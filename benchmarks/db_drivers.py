@@ -0,0 +1,99 @@
+"""
+Бенчмарк запросов db/queries.py на драйверах asyncpg и psycopg.
+
+Берет DSN из настроек, подменяет в нем драйвер и гоняет одинаковую смесь
+запросов квиза из --concurrency параллельных задач. Настройки пула
+и кеша подготовленных выражений - из Settings (DB_POOL_SIZE и т.д.).
+
+    python benchmarks/db_drivers.py --seconds 10 --concurrency 50
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from collections import defaultdict
+import sqlalchemy as sq
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from ruentrainerbot.db.cache import user_words_cache
+from ruentrainerbot.db.models import Dictionary, Users
+from ruentrainerbot.db.queries import (get_random_words, get_similar_wrong_words,
+                                       get_distractors_for_words, get_user_active_words,
+                                       get_user_active_word_ids, add_word_to_user,
+                                       remove_word_from_user)
+from ruentrainerbot.db.session import create_engine, pool_checkout_wait
+from ruentrainerbot.core.config import settings
+
+DRIVERS = ('asyncpg', 'psycopg')
+USERS = 1000
+
+
+async def _workload(session_factory, word_ids: list[int], deadline: float, timings) -> None:
+    async def timed(name: str, coro):
+        started = time.perf_counter()
+        result = await coro
+        timings[name].append(time.perf_counter() - started)
+        return result
+
+    while time.perf_counter() < deadline:
+        # отрицательные id, чтобы не задеть настоящих пользователей
+        user_id = -random.randint(1, USERS)
+        word = Dictionary(id=random.choice(word_ids), en='', ru='')
+        async with session_factory() as session:
+            words = await timed('get_random_words', get_random_words(session, limit=10))
+            word.en = words[0].en if words else 'word'
+            await timed('get_similar_wrong_words', get_similar_wrong_words(session, word))
+            await timed('get_distractors_for_words', get_distractors_for_words(session, words))
+            user_words_cache.invalidate(user_id)
+            await timed('get_user_active_word_ids', get_user_active_word_ids(session, user_id))
+            await timed('add_word_to_user', add_word_to_user(session, user_id, word.id))
+            await timed('get_user_active_words', get_user_active_words(session, user_id, limit=10))
+            await timed('remove_word_from_user', remove_word_from_user(session, user_id, word.id))
+
+
+async def run_driver(driver: str, seconds: float, concurrency: int) -> None:
+    dsn = make_url(settings.dsn).set(drivername=f'postgresql+{driver}').render_as_string(hide_password=False)
+    engine = create_engine(dsn, name=driver)
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with engine.connect() as conn:
+        word_ids = list((await conn.execute(sq.select(Dictionary.id))).scalars())
+
+    timings: dict[str, list[float]] = defaultdict(list)
+    started = time.perf_counter()
+    deadline = started + seconds
+    await asyncio.gather(*(_workload(session_factory, word_ids, deadline, timings)
+                           for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    async with engine.begin() as conn:
+        await conn.execute(sq.delete(Users).where(Users.id < 0))
+    await engine.dispose()
+
+    total = sum(len(v) for v in timings.values())
+    print(f'\n{driver}: {total / elapsed:.0f} запросов/с, '
+          f'ожидание пула в среднем {_mean_wait(driver) * 1000:.2f} мс')
+    print(f'{"query":<28}{"count":>8}{"p50 ms":>10}{"p99 ms":>10}')
+    for name, values in timings.items():
+        q = statistics.quantiles(values, n=100)
+        print(f'{name:<28}{len(values):>8}{q[49] * 1000:>10.2f}{q[98] * 1000:>10.2f}')
+
+
+def _mean_wait(driver: str) -> float:
+    count = pool_checkout_wait.count(engine=driver)
+    return pool_checkout_wait.total(engine=driver) / count if count else 0.0
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--seconds', type=float, default=10, help='длительность прогона на драйвер')
+    parser.add_argument('--concurrency', type=int, default=50, help='параллельных задач')
+    parser.add_argument('--driver', choices=DRIVERS, action='append', help='драйвер (по умолчанию оба)')
+    args = parser.parse_args()
+
+    for driver in args.driver or DRIVERS:
+        await run_driver(driver, args.seconds, args.concurrency)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,144 @@
+"""
+Локальный фейковый сервер Bot API с лимитами, похожими на лимиты Telegram.
+
+Отвечает на POST /bot<token>/<method>: sendMessage возвращает сообщение
+и запоминает последнюю inline клавиатуру чата, остальные методы - true. Методы с chat_id ограничены ведром на чат
+(--chat-rate в секунду, --chat-burst подряд) и общим ведром (--global-rate).
+При превышении отвечает 429 с parameters.retry_after, как Telegram.
+
+Бота можно направить на сервер переменной TELEGRAM_API_URL:
+
+    python benchmarks/fake_bot_api.py --port 8081
+    TELEGRAM_API_URL=http://127.0.0.1:8081 python main.py
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import time
+from collections import defaultdict
+from aiohttp import web
+
+
+class _Bucket:
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """
+        Берет токен. Если его нет, возвращает, через сколько секунд он будет
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class FakeBotAPI:
+    def __init__(self,
+                 chat_rate: float = 1,
+                 chat_burst: float = 3,
+                 global_rate: float = 30,
+                 latency: float = 0.0
+                 ) -> None:
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.global_bucket = _Bucket(global_rate, global_rate)
+        self.latency = latency
+        self.chats: dict[str, _Bucket] = {}
+        self.requests: dict[str, int] = defaultdict(int)
+        self.throttled: dict[str, int] = defaultdict(int)
+        # chat_id -> inline_keyboard последнего sendMessage с клавиатурой
+        self.keyboards: dict[int, list] = {}
+        self._message_ids = itertools.count(1)
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self.handle)
+        return app
+
+    def _retry_after(self, chat_id: str | None) -> float:
+        if chat_id is None:
+            return 0.0
+        bucket = self.chats.get(chat_id)
+        if bucket is None:
+            bucket = self.chats[chat_id] = _Bucket(self.chat_rate, self.chat_burst)
+        return bucket.take() or self.global_bucket.take()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        form = await request.post()
+        chat_id = form.get('chat_id')
+        self.requests[method] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        retry_after = self._retry_after(chat_id)
+        if retry_after:
+            self.throttled[method] += 1
+            seconds = math.ceil(retry_after)
+            return web.json_response({
+                'ok': False,
+                'error_code': 429,
+                'description': f'Too Many Requests: retry after {seconds}',
+                'parameters': {'retry_after': seconds},
+            })
+
+        result: object = True
+        if method.lower() == 'sendmessage':
+            markup = json.loads(form.get('reply_markup') or '{}')
+            if 'inline_keyboard' in markup:
+                self.keyboards[int(chat_id)] = markup['inline_keyboard']
+            result = {
+                'message_id': next(self._message_ids),
+                'date': int(time.time()),
+                'chat': {'id': int(chat_id), 'type': 'private'},
+                'text': form.get('text', ''),
+            }
+        elif method.lower() == 'getme':
+            result = {'id': 1, 'is_bot': True, 'first_name': 'fake', 'username': 'fake_bot'}
+        return web.json_response({'ok': True, 'result': result})
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        return {'requests': dict(self.requests), 'throttled': dict(self.throttled)}
+
+
+async def start_fake_bot_api(api: FakeBotAPI, host: str, port: int) -> web.AppRunner:
+    runner = web.AppRunner(api.app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--chat-rate', type=float, default=1, help='сообщений в секунду на чат')
+    parser.add_argument('--chat-burst', type=float, default=3, help='сообщений подряд на чат')
+    parser.add_argument('--global-rate', type=float, default=30, help='сообщений в секунду всего')
+    parser.add_argument('--latency', type=float, default=0.0, help='задержка ответа, мс')
+    args = parser.parse_args()
+
+    api = FakeBotAPI(args.chat_rate, args.chat_burst, args.global_rate, args.latency / 1000)
+    runner = await start_fake_bot_api(api, args.host, args.port)
+    print(f'fake Bot API: http://{args.host}:{args.port}')
+    try:
+        await asyncio.Event().wait()
+    finally:
+        print(json.dumps(api.stats(), indent=2))
+        await runner.cleanup()
+
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
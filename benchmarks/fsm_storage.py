@@ -0,0 +1,87 @@
+"""
+Бенчмарк FSM хранилища: задержки get/set под конкурентной нагрузкой.
+
+Каждый виртуальный пользователь повторяет сценарий квиза:
+set_state + set_data с подготовленными вопросами, затем на каждый ответ
+get_state, get_data и update_data.
+
+    python benchmarks/fsm_storage.py --users 200 --rounds 3
+    python benchmarks/fsm_storage.py --storage memory
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from collections import defaultdict
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from ruentrainerbot.db.models import FSMStates
+from ruentrainerbot.db.session import engine
+from ruentrainerbot.db.storage import PostgresStorage
+
+BOT_ID = -1
+QUESTIONS = 10
+
+
+def _quiz_payload(user_id: int) -> dict:
+    questions = [
+        [user_id * 100 + i, [user_id * 100 + i + j for j in range(4)], i % 4, False]
+        for i in range(QUESTIONS)
+    ]
+    return {'mode': 'general', 'questions': questions, 'idx': 0, 'total': QUESTIONS, 'score': 0}
+
+
+async def _user(storage, user_id: int, rounds: int, timings: dict[str, list[float]]) -> None:
+    key = StorageKey(bot_id=BOT_ID, chat_id=user_id, user_id=user_id)
+
+    async def timed(name: str, coro):
+        started = time.perf_counter()
+        result = await coro
+        timings[name].append(time.perf_counter() - started)
+        return result
+
+    for _ in range(rounds):
+        await timed('set_state', storage.set_state(key, 'QuizStates:in_quiz'))
+        await timed('set_data', storage.set_data(key, _quiz_payload(user_id)))
+        for idx in range(QUESTIONS):
+            await timed('get_state', storage.get_state(key))
+            data = await timed('get_data', storage.get_data(key))
+            await timed('update_data', storage.update_data(key, {'idx': idx + 1, 'score': data['score']}))
+        await timed('set_state', storage.set_state(key, None))
+        await timed('set_data', storage.set_data(key, {}))
+
+
+def _report(timings: dict[str, list[float]], elapsed: float) -> None:
+    total = sum(len(v) for v in timings.values())
+    print(f'{"op":<12}{"count":>8}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}')
+    for name, values in sorted(timings.items()):
+        q = statistics.quantiles(values, n=100)
+        print(f'{name:<12}{len(values):>8}{q[49] * 1000:>10.2f}{q[94] * 1000:>10.2f}{q[98] * 1000:>10.2f}')
+    print(f'всего операций: {total}, {total / elapsed:.0f} оп/с за {elapsed:.2f} с')
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=200, help='количество конкурентных пользователей')
+    parser.add_argument('--rounds', type=int, default=3, help='квизов на пользователя')
+    parser.add_argument('--storage', choices=('postgres', 'memory'), default='postgres')
+    args = parser.parse_args()
+
+    if args.storage == 'postgres':
+        async with engine.begin() as conn:
+            await conn.run_sync(FSMStates.__table__.create, checkfirst=True)
+        storage = PostgresStorage(engine)
+    else:
+        storage = MemoryStorage()
+
+    timings: dict[str, list[float]] = defaultdict(list)
+    started = time.perf_counter()
+    await asyncio.gather(*(_user(storage, user_id, args.rounds, timings)
+                           for user_id in range(1, args.users + 1)))
+    elapsed = time.perf_counter() - started
+    _report(timings, elapsed)
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,66 @@
+"""
+Микробенчмарк сборки клавиатур квиза: стоимость одного рендера.
+
+- builder: прежняя сборка через InlineKeyboardBuilder на каждый вызов;
+- direct: сборка моделей напрямую, как в quiz_options_kb;
+- dump: сериализация разметки в запрос, для сравнения.
+
+    python benchmarks/keyboards.py --number 20000
+"""
+import argparse
+import timeit
+from aiogram.types import KeyboardButton, ReplyKeyboardMarkup
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+from ruentrainerbot.keyboards.callback_data import ADD, ANSWER, NOOP, REMOVE, STOP, pack
+from ruentrainerbot.keyboards.quiz import quiz_options_kb
+from ruentrainerbot.keyboards.reply import MAIN_MENU_ROWS, main_menu_kb
+
+OPTIONS = ['water', 'waiter', 'winter', 'wander']
+
+
+def builder_kb(options: list[str], word_id: int, is_added: bool):
+    kb = InlineKeyboardBuilder()
+    for i, opt in enumerate(options):
+        kb.button(text=opt, callback_data=pack(ANSWER, 0, 0, i))
+    if is_added:
+        kb.button(text='✅ Добавлен', callback_data=pack(NOOP, 0, 0))
+        kb.button(text='➖ Удалить', callback_data=pack(REMOVE, 0, 0, word_id))
+    else:
+        kb.button(text='➕ Добавить', callback_data=pack(ADD, 0, 0, word_id))
+    kb.button(text='Завершить квиз', callback_data=pack(STOP, 0, 0))
+    kb.adjust(2)
+    return kb.as_markup()
+
+
+def fresh_main_menu():
+    # прежняя сборка главного меню на каждый вызов, из тех же строк кнопок
+    return ReplyKeyboardMarkup(
+        keyboard=[[KeyboardButton(text=text) for text in row] for row in MAIN_MENU_ROWS],
+        resize_keyboard=True,
+        selective=True,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--number', type=int, default=20000, help='рендеров на замер')
+    args = parser.parse_args()
+
+    assert builder_kb(OPTIONS, 1, False) == quiz_options_kb(OPTIONS, 1, False)
+    assert fresh_main_menu() == main_menu_kb()
+    markup = quiz_options_kb(OPTIONS, 1, False)
+    cases = {
+        'quiz builder': lambda: builder_kb(OPTIONS, 1, False),
+        'quiz direct': lambda: quiz_options_kb(OPTIONS, 1, False),
+        'quiz dump': lambda: markup.model_dump(exclude_none=True),
+        'menu fresh': fresh_main_menu,
+        'menu const': main_menu_kb,
+    }
+    print(f'{"render":<14}{"us/call":>10}')
+    for name, fn in cases.items():
+        seconds = min(timeit.repeat(fn, number=args.number, repeat=3))
+        print(f'{name:<14}{seconds / args.number * 1e6:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Бенчмарк стоимости логирования для потока цикла событий.
+
+Пишет --events событий, похожих на события квиза, в --output
+в нескольких режимах configure_logging и показывает, сколько времени
+вызов логгера занимает в вызывающем потоке (p50/p99 и сумма),
+и за сколько фоновый поток дописывает очередь.
+
+    python benchmarks/logging_overhead.py --events 50000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from ruentrainerbot.core import logging as bot_logging
+
+MODES = [
+    ('sync json', dict(use_queue=False), False),
+    ('sync orjson', dict(use_queue=False), True),
+    ('queue orjson', dict(use_queue=True), True),
+    ('queue orjson, sample 0.1', dict(use_queue=True, sample={'quiz_answer_received': 0.1}), True),
+]
+
+
+def run(name: str, options: dict, fast_json: bool, events: int, output: str) -> None:
+    orjson = bot_logging.orjson
+    if not fast_json:
+        bot_logging.orjson = None
+    stdout = sys.stdout
+    sys.stdout = open(output, 'w')
+    try:
+        bot_logging.configure_logging(debug=False, log_level='INFO', queue_size=events, **options)
+        logger = bot_logging.get_logger('benchmark')
+        timings = []
+        started = time.perf_counter()
+        for n in range(events):
+            t = time.perf_counter()
+            logger.info(
+                'quiz_answer_received',
+                user_id=123456789,
+                question_index=n % 10,
+                picked_index=n % 4,
+                is_correct=n % 3 == 0,
+                mode='random',
+            )
+            timings.append(time.perf_counter() - t)
+        caller = time.perf_counter() - started
+        bot_logging._stop_writer()
+        drained = time.perf_counter() - started
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+        bot_logging.orjson = orjson
+
+    us = [t * 1e6 for t in timings]
+    print(
+        f'{name:<26}{statistics.median(us):>8.1f}{statistics.quantiles(us, n=100)[98]:>8.1f}'
+        f'{caller * 1000:>10.0f}{drained * 1000:>10.0f}'
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--events', type=int, default=50_000, help='событий на режим')
+    parser.add_argument('--output', default=os.devnull, help='куда писать логи')
+    args = parser.parse_args()
+
+    if bot_logging.orjson is None:
+        print('orjson не установлен: режимы orjson используют json')
+    print(f'{"режим":<26}{"p50 us":>8}{"p99 us":>8}{"поток ms":>10}{"всего ms":>10}')
+    for name, options, fast_json in MODES:
+        run(name, options, fast_json, args.events, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+"""
+Проверка планов запросов db/queries.py на больших таблицах.
+
+В одной транзакции, которая в конце откатывается, заполняет words,
+users, user_words и word_distractors синтетическими строками
+(--words слов, --users пользователей по --per-user слов, по 10 соседей
+у каждого второго слова), делает ANALYZE, вызывает функции запросов
+и для каждого их SQL запроса выполняет EXPLAIN с теми же параметрами.
+Запрос не проходит проверку, если в плане есть Seq Scan по таблице
+больше --min-rows строк. Функции, которым по задаче нужен проход
+по всей таблице, перечислены в FULL_SCAN с причиной и не проверяются.
+Код выхода 1, если хоть один запрос не прошел.
+
+    python benchmarks/query_plans.py --words 100000 --users 5000
+"""
+import argparse
+import asyncio
+import sys
+from datetime import datetime, timezone
+import sqlalchemy as sq
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from ruentrainerbot.core.logging import configure_logging
+from ruentrainerbot.db import queries
+from ruentrainerbot.db.models import Dictionary
+from ruentrainerbot.db.session import engine
+
+FIRST_USER_ID = -1_000_000_000
+TABLES = ('words', 'users', 'user_words', 'word_distractors', 'leaderboard_scores')
+
+# функции, которые читают таблицу целиком по задаче
+FULL_SCAN = {
+    'get_random_words': 'ORDER BY random() по всему словарю; квиз берет слова из снимка в памяти',
+    'get_all_words_en': 'пересчет соседей читает весь словарь',
+    'get_stale_distractor_word_ids': 'пересчет соседей сравнивает все слова с их соседями',
+    'get_distractor_score_floors': 'пересчет соседей читает оценки всех соседей',
+    'get_leaderboard_position': 'сумма по всем строкам leaderboard_scores: строка на число верных ответов, а не на пользователя',
+}
+
+
+class Capture:
+    def __init__(self) -> None:
+        self.label = ''
+        self.statements: list[tuple[str, str, tuple]] = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        if self.label and not executemany and not statement.lstrip().upper().startswith(('EXPLAIN', 'SAVEPOINT', 'RELEASE')):
+            self.statements.append((self.label, statement, parameters))
+
+
+async def _fill(conn: AsyncConnection, words: int, users: int, per_user: int) -> None:
+    await conn.execute(sq.text(
+        "INSERT INTO words (ru, en) "
+        "SELECT 'слово' || g, substr(md5(g::text), 1, 12) FROM generate_series(1, :n) g"
+    ), {'n': words})
+    await conn.execute(sq.text(
+        "INSERT INTO users (id) SELECT :first - g FROM generate_series(1, :n) g"
+    ), {'first': FIRST_USER_ID, 'n': users})
+    await conn.execute(sq.text(
+        "WITH w AS (SELECT array_agg(id) AS ids, count(*) AS n FROM words) "
+        "INSERT INTO user_words (user_id, word_id, is_active, due_at) "
+        "SELECT u.id, w.ids[1 + abs(hashtext(u.id || ':' || k)) % w.n], "
+        "       random() < 0.9, now() + random() * interval '30 days' "
+        "FROM users u, w, generate_series(1, :per_user) k "
+        "WHERE u.id < :first "
+        "ON CONFLICT DO NOTHING"
+    ), {'first': FIRST_USER_ID, 'per_user': per_user})
+    await conn.execute(sq.text(
+        "WITH w AS (SELECT array_agg(id ORDER BY id) AS ids, count(*) AS n FROM words) "
+        "INSERT INTO word_distractors (word_id, rank, distractor_id, score) "
+        "SELECT x.id, r, w.ids[1 + (x.id + r * 7919) % w.n], 1.0 / r "
+        "FROM words x, w, generate_series(1, 10) r "
+        "WHERE x.id % 2 = 0 "
+        "ON CONFLICT DO NOTHING"
+    ))
+    for table in TABLES:
+        await conn.execute(sq.text(f'ANALYZE {table}'))
+
+
+async def _run_queries(session: AsyncSession, capture: Capture) -> None:
+    async def call(label: str, coro) -> None:
+        capture.label = label
+        await coro
+        capture.label = ''
+
+    async def consume(label: str, chunks) -> None:
+        capture.label = label
+        async for _ in chunks:
+            pass
+        capture.label = ''
+
+    result = await session.execute(
+        sq.select(Dictionary)
+        .where(sq.func.mod(Dictionary.id, 2) == 0, sq.func.length(Dictionary.en) == 12)
+        .limit(10)
+    )
+    with_neighbours = list(result.scalars().all())
+    result = await session.execute(
+        sq.select(Dictionary)
+        .where(sq.func.mod(Dictionary.id, 2) == 1, sq.func.length(Dictionary.en) == 12)
+        .limit(1)
+    )
+    without_neighbours = result.scalars().one()
+    user_id = FIRST_USER_ID - 1
+    word_id = with_neighbours[0].id
+    pairs = [(FIRST_USER_ID - n, w.id) for n, w in enumerate(with_neighbours, start=1)]
+
+    await call('get_random_words', queries.get_random_words(session))
+    await call('get_similar_wrong_words', queries.get_similar_wrong_words(session, with_neighbours[0]))
+    await call('get_similar_wrong_words', queries.get_similar_wrong_words(session, without_neighbours))
+    await call('get_distractors_for_words', queries.get_distractors_for_words(session, with_neighbours))
+    await call('get_user_active_word_ids', queries.get_user_active_word_ids(session, user_id))
+    await call('add_word_to_user', queries.add_word_to_user(session, user_id, word_id))
+    await call('apply_user_words_changes', queries.apply_user_words_changes(
+        session, {pair: n % 2 == 0 for n, pair in enumerate(pairs)}
+    ))
+    await call('apply_user_words_reviews', queries.apply_user_words_reviews(
+        session, [(u, w, True) for u, w in pairs]
+    ))
+    await call('remove_word_from_user', queries.remove_word_from_user(session, user_id, word_id))
+    await call('get_user_active_words', queries.get_user_active_words(session, FIRST_USER_ID - 2, limit=10))
+    await call('get_due_words', queries.get_due_words(session, FIRST_USER_ID - 3))
+    await call('get_all_words_en', queries.get_all_words_en(session))
+    await call('get_stale_distractor_word_ids', queries.get_stale_distractor_word_ids(session, 10))
+    await call('get_distractor_score_floors', queries.get_distractor_score_floors(session))
+    await call('get_words_referencing_distractors', queries.get_words_referencing_distractors(
+        session, [w.id for w in with_neighbours]
+    ))
+    await call('replace_word_distractors', queries.replace_word_distractors(
+        session, [without_neighbours.id], [], datetime.now(timezone.utc)
+    ))
+    await call('get_words_by_ids', queries.get_words_by_ids(session, [w.id for w in with_neighbours]))
+    await call('get_leaderboard_position', queries.get_leaderboard_position(session, 10))
+    await call('count_learned_words', queries.count_learned_words(session, FIRST_USER_ID - 4))
+
+    conn = await session.connection()
+    await call('get_reminder_recipients', queries.get_reminder_recipients(conn, FIRST_USER_ID - 100, 500))
+    await consume('stream_user_words', queries.stream_user_words(conn, FIRST_USER_ID - 5))
+    await call('find_words', queries.find_words(
+        conn, ens={w.en for w in with_neighbours[:5]}, rus={w.ru for w in with_neighbours[5:]}
+    ))
+
+
+def _seq_scans(plan: dict) -> list[str]:
+    found = []
+    if plan.get('Node Type') == 'Seq Scan':
+        found.append(plan['Relation Name'])
+    for child in plan.get('Plans', []):
+        found.extend(_seq_scans(child))
+    return found
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--words', type=int, default=100_000, help='слов в words')
+    parser.add_argument('--users', type=int, default=5000, help='пользователей')
+    parser.add_argument('--per-user', type=int, default=40, help='слов в личном словаре')
+    parser.add_argument('--min-rows', type=int, default=1000, help='Seq Scan по таблице меньше - не ошибка')
+    args = parser.parse_args()
+
+    configure_logging(debug=False, log_level='ERROR')
+    capture = Capture()
+    failed = 0
+    async with engine.connect() as conn:
+        transaction = await conn.begin()
+        try:
+            await _fill(conn, args.words, args.users, args.per_user)
+            result = await conn.execute(sq.text(
+                'SELECT relname, reltuples FROM pg_class WHERE relname = ANY(:tables)'
+            ), {'tables': list(TABLES)})
+            sizes = {name: int(rows) for name, rows in result}
+            print('строк:', sizes)
+
+            sq.event.listen(conn.sync_connection, 'before_cursor_execute', capture)
+            session = AsyncSession(bind=conn, join_transaction_mode='create_savepoint', expire_on_commit=False)
+            await _run_queries(session, capture)
+            sq.event.remove(conn.sync_connection, 'before_cursor_execute', capture)
+
+            for label, statement, parameters in capture.statements:
+                first_line = ' '.join(statement.split())[:70]
+                if label in FULL_SCAN:
+                    print(f'skip {label:<34} {FULL_SCAN[label]}')
+                    continue
+                result = await conn.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + statement, parameters)
+                plan = result.scalar()[0]['Plan']
+                large = [t for t in _seq_scans(plan) if sizes.get(t, args.min_rows) >= args.min_rows]
+                if large:
+                    failed += 1
+                    print(f'FAIL {label:<34} Seq Scan {", ".join(large)}: {first_line}')
+                else:
+                    print(f'ok   {label:<34} {first_line}')
+        finally:
+            await transaction.rollback()
+    await engine.dispose()
+    print(f'\nзапросов с Seq Scan по большим таблицам: {failed}')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,282 @@
+"""
+Нагрузочный бенчмарк квиза: диспетчер бота, собранный как в run_bot
+(очередь исполнителя, фильтр приема, middleware, роутеры, снимок словаря),
+синтетические апдейты от тысяч виртуальных пользователей.
+
+Каждый пользователь проходит /start и --rounds квизов: отвечает на вопросы,
+иногда добавляет слово в личный словарь и иногда останавливает квиз.
+Запросы к Telegram не уходят: сессия бота только записывает вызовы API
+(с задержкой --api-latency). БД - локальный Postgres из DSN.
+Результат: апдейты в секунду, p50/p95/p99 от приема апдейта до конца
+обработки (с ожиданием в очереди), запросов к БД и вызовов API на апдейт.
+
+    python benchmarks/quiz_load.py --users 2000 --concurrency 200
+    python benchmarks/quiz_load.py --storage memory --api-latency 30
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import statistics
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any
+import sqlalchemy as sq
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import SendMessage, TelegramMethod
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+from ruentrainerbot.app import create_dispatcher
+from ruentrainerbot.core.config import settings
+from ruentrainerbot.core.logging import configure_logging
+from ruentrainerbot.core.query_stats import current_query_stats
+from ruentrainerbot.db.events import answer_events_writer
+from ruentrainerbot.db.models import AnswerEvents, FSMStates, Users, UserStats
+from ruentrainerbot.db.queries import delete_user_stats
+from ruentrainerbot.db.session import engine
+from ruentrainerbot.db.snapshot import dictionary_snapshot
+from ruentrainerbot.db.storage import PostgresStorage
+from ruentrainerbot.db.write_behind import user_words_writer
+from ruentrainerbot.keyboards.callback_data import ADD, ANSWER, STOP
+from ruentrainerbot.middlewares.executor import QueuedDispatcher, UpdateExecutor
+
+BOT_TOKEN = '1000000001:benchmark'
+BOT_ID = 1000000001
+# виртуальные пользователи с отрицательными id, чтобы не задеть настоящих
+FIRST_USER_ID = -1_000_000_000
+NOW = datetime.now(timezone.utc)
+
+
+class Sample:
+    __slots__ = ('api_calls', 'db_queries', 'done')
+
+    def __init__(self) -> None:
+        self.api_calls = 0
+        self.db_queries = 0
+        self.done = asyncio.Event()
+
+
+_sample: ContextVar[Sample | None] = ContextVar('sample', default=None)
+
+
+class RecordingSession(BaseSession):
+    """
+    Сессия бота, которая записывает вызовы API вместо запросов к Telegram
+    """
+    def __init__(self, latency: float) -> None:
+        super().__init__()
+        self.latency = latency
+        self.calls: dict[str, int] = defaultdict(int)
+        self.keyboards: dict[int, Any] = {}
+        self._message_ids = itertools.count(1)
+
+    async def make_request(self, bot: Bot, method: TelegramMethod[Any], timeout: int | None = None) -> Any:
+        self.calls[type(method).__name__] += 1
+        sample = _sample.get()
+        if sample is not None:
+            sample.api_calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if isinstance(method, SendMessage):
+            if method.reply_markup is not None and hasattr(method.reply_markup, 'inline_keyboard'):
+                self.keyboards[method.chat_id] = method.reply_markup
+            return Message(
+                message_id=next(self._message_ids),
+                date=NOW,
+                chat=Chat(id=method.chat_id, type='private'),
+                text=method.text,
+            )
+        return True
+
+    async def stream_content(self, *args: Any, **kwargs: Any):
+        yield b''
+
+    async def close(self) -> None:
+        pass
+
+
+class MeasuredExecutor(UpdateExecutor):
+    """
+    Исполнитель, который помечает задание апдейта замером:
+    задание выполняется в воркере, а не в задаче виртуального пользователя
+    """
+    async def submit(self, key, job) -> None:
+        sample = _sample.get()
+
+        async def measured():
+            token = _sample.set(sample)
+            try:
+                return await job()
+            finally:
+                _sample.reset(token)
+                sample.done.set()
+
+        await super().submit(key, measured if sample is not None else job)
+
+
+async def _collect_queries(handler, event, data):
+    # внутренний middleware: счетчик запросов апдейта запущен снаружи, до FSM
+    try:
+        return await handler(event, data)
+    finally:
+        stats = current_query_stats()
+        sample = _sample.get()
+        if stats is not None and sample is not None:
+            sample.db_queries = stats.count
+
+
+class VirtualUser:
+    _ids = itertools.count(1)
+
+    def __init__(self, user_id: int, dp: QueuedDispatcher, bot: Bot, session: RecordingSession, results) -> None:
+        self.user = User(id=user_id, is_bot=False, first_name='load')
+        self.chat = Chat(id=user_id, type='private')
+        self.dp = dp
+        self.bot = bot
+        self.session = session
+        self.results = results
+        # клавиатура текущего вопроса: нажатия приходят из сообщения с ней
+        self.keyboard = None
+
+    async def _feed(self, kind: str, update: Update) -> None:
+        sample = Sample()
+        token = _sample.set(sample)
+        started = time.perf_counter()
+        try:
+            # апдейт встает в очередь чата, замер заканчивается в воркере
+            await self.dp.feed_update(self.bot, update)
+            await sample.done.wait()
+        finally:
+            elapsed = time.perf_counter() - started
+            _sample.reset(token)
+        self.results[kind].append((elapsed, sample.db_queries, sample.api_calls))
+
+    async def command(self, text: str) -> None:
+        update_id = next(self._ids)
+        await self._feed(text, Update(update_id=update_id, message=Message(
+            message_id=update_id,
+            date=NOW,
+            chat=self.chat,
+            from_user=self.user,
+            text=text,
+            entities=[{'type': 'bot_command', 'offset': 0, 'length': len(text)}],
+        )))
+
+    async def tap(self, kind: str, data: str) -> None:
+        update_id = next(self._ids)
+        await self._feed(kind, Update(update_id=update_id, callback_query=CallbackQuery(
+            id=str(update_id),
+            from_user=self.user,
+            chat_instance='load',
+            data=data,
+            message=Message(message_id=update_id, date=NOW, chat=self.chat, text='question',
+                            reply_markup=self.keyboard),
+        )))
+
+    def _buttons(self) -> list[str]:
+        self.keyboard = self.session.keyboards.pop(self.chat.id, None)
+        if self.keyboard is None:
+            return []
+        return [button.callback_data for row in self.keyboard.inline_keyboard for button in row]
+
+    async def run(self, rounds: int, add_rate: float, stop_rate: float, think: float) -> None:
+        await self.command('/start')
+        for _ in range(rounds):
+            await self.command('/quiz')
+            while buttons := self._buttons():
+                await asyncio.sleep(think)
+                add = next((b for b in buttons if b[0] == ADD), None)
+                if add and random.random() < add_rate:
+                    await self.tap('add', add)
+                if random.random() < stop_rate:
+                    await self.tap('stop', next(b for b in buttons if b[0] == STOP))
+                    break
+                answers = [b for b in buttons if b[0] == ANSWER]
+                await self.tap('answer', random.choice(answers))
+
+
+def _percentile(values: list[float], q: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100)[q - 1]
+
+
+def _report(results: dict[str, list], elapsed: float, session: RecordingSession) -> None:
+    rows = [(kind, samples) for kind, samples in results.items()]
+    rows.append(('total', [s for samples in results.values() for s in samples]))
+    updates = len(rows[-1][1])
+    print(f'\nапдейтов: {updates} за {elapsed:.1f} с, {updates / elapsed:.0f} апдейтов/с')
+    print(f'{"update":<10}{"count":>8}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"db/upd":>8}{"api/upd":>9}')
+    for kind, samples in rows:
+        latencies = [s[0] * 1000 for s in samples]
+        print(
+            f'{kind:<10}{len(samples):>8}'
+            f'{_percentile(latencies, 50):>9.2f}{_percentile(latencies, 95):>9.2f}{_percentile(latencies, 99):>9.2f}'
+            f'{statistics.fmean(s[1] for s in samples):>8.2f}{statistics.fmean(s[2] for s in samples):>9.2f}'
+        )
+    print('вызовы API:', dict(session.calls))
+
+
+async def _cleanup() -> None:
+    async with engine.begin() as conn:
+        await conn.execute(sq.delete(FSMStates).where(FSMStates.bot_id == BOT_ID))
+        await conn.execute(sq.delete(Users).where(Users.id < 0))
+        await conn.execute(sq.delete(AnswerEvents).where(AnswerEvents.user_id < 0))
+        await delete_user_stats(conn, UserStats.user_id < 0)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=1000, help='виртуальных пользователей')
+    parser.add_argument('--concurrency', type=int, default=100, help='одновременно активных пользователей')
+    parser.add_argument('--rounds', type=int, default=1, help='квизов на пользователя')
+    parser.add_argument('--add-rate', type=float, default=0.1, help='доля вопросов с «➕ Добавить»')
+    parser.add_argument('--stop-rate', type=float, default=0.02, help='доля вопросов с остановкой квиза')
+    parser.add_argument('--think', type=float, default=0.0, help='пауза пользователя перед ответом, с')
+    parser.add_argument('--api-latency', type=float, default=0.0, help='задержка ответа API, мс')
+    parser.add_argument('--storage', choices=('postgres', 'memory'), default='postgres', help='FSM хранилище')
+    parser.add_argument('--workers', type=int, default=settings.update_concurrency,
+                        help='воркеров исполнителя апдейтов (UPDATE_CONCURRENCY)')
+    args = parser.parse_args()
+
+    configure_logging(debug=False, log_level='ERROR')
+    await dictionary_snapshot.load(engine)
+    session = RecordingSession(latency=args.api_latency / 1000)
+    bot = Bot(token=BOT_TOKEN, session=session)
+    storage = (
+        PostgresStorage(engine, cache_size=settings.fsm_cache_size)
+        if args.storage == 'postgres'
+        else MemoryStorage()
+    )
+    executor = MeasuredExecutor(concurrency=args.workers, max_queue=settings.update_queue_size)
+    dp = create_dispatcher(storage, executor)
+    dp.update.middleware(_collect_queries)
+
+    executor.start()
+    user_words_writer.start()
+    answer_events_writer.start()
+    results: dict[str, list] = defaultdict(list)
+    slots = asyncio.Semaphore(args.concurrency)
+
+    async def run_user(n: int) -> None:
+        async with slots:
+            user = VirtualUser(FIRST_USER_ID - n, dp, bot, session, results)
+            await user.run(args.rounds, args.add_rate, args.stop_rate, args.think)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run_user(n) for n in range(args.users)))
+    elapsed = time.perf_counter() - started
+
+    await executor.stop()
+    await user_words_writer.stop()
+    await answer_events_writer.stop()
+    _report(results, elapsed, session)
+    await _cleanup()
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
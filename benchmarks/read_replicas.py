@@ -0,0 +1,58 @@
+"""
+Проверка маршрутизации чтения на реплики.
+
+Реплики задаются как в боте, переменной DB_REPLICA_DSNS. Локально
+хватит одного Postgres под двумя DSN, а недоступный DSN покажет
+исключение реплики и переход на primary:
+
+    DB_REPLICA_DSNS='["postgresql+asyncpg://postgres@localhost:5432/bot",
+                      "postgresql+asyncpg://postgres@localhost:1/bot"]' \\
+        python benchmarks/read_replicas.py --reads 200
+
+Скрипт проверяет реплики, выполняет --reads запросов квиза через
+read_session и один через AsyncSessionLocal и печатает, сколько
+запросов ушло на каждый engine.
+"""
+import argparse
+import asyncio
+import sqlalchemy as sq
+from ruentrainerbot.core.logging import configure_logging
+from ruentrainerbot.db.queries import get_distractors_for_words, get_random_words
+from ruentrainerbot.db.session import (AsyncSessionLocal, engine, query_duration,
+                                       read_fallbacks, read_session, replica_router)
+
+
+def _counts() -> dict[str, int]:
+    engines = [engine, *replica_router.replicas]
+    return {e.pool.metrics_name: query_duration.count(engine=e.pool.metrics_name) for e in engines}
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--reads', type=int, default=200, help='чтений через read_session')
+    args = parser.parse_args()
+
+    configure_logging(debug=True, log_level='INFO')
+    if not replica_router.replicas:
+        print('DB_REPLICA_DSNS не задан: все чтения идут на primary')
+    await replica_router.check()
+    print('здоровые реплики:', [e.pool.metrics_name for e in replica_router.healthy])
+
+    before = _counts()
+    for _ in range(args.reads):
+        async with read_session() as session:
+            words = await get_random_words(session, limit=10)
+            await get_distractors_for_words(session, words)
+    async with AsyncSessionLocal() as session:
+        await session.execute(sq.text('SELECT 1'))
+    after = _counts()
+    print('запросов по engine:', {name: after[name] - before[name] for name in after})
+    print('чтений на primary из-за отсутствия здоровых реплик:', int(read_fallbacks.value()))
+
+    for replica in replica_router.replicas:
+        await replica.dispose()
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,134 @@
+"""
+Проверка рассылки напоминаний на заглушке сессии бота.
+
+Создает --users пользователей с отрицательными id и одним активным
+словом, каждый --blocked-every-й из них "заблокировал" бота (уже
+существующие пользователи с активными словами тоже получат сообщение
+заглушки). Рассылка за фиктивную дату прерывается после --interrupt
+отправок, затем запускается снова и продолжается с контрольной точки.
+Скрипт печатает скорость отправки, число повторных сообщений после
+перезапуска и итог из reminder_runs.
+
+    python benchmarks/reminders.py --users 2000 --rate 500 --latency 0.02
+"""
+import argparse
+import asyncio
+import time
+from collections import Counter
+from datetime import date
+from typing import Any
+import sqlalchemy as sq
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.exceptions import TelegramForbiddenError
+from aiogram.methods import SendMessage, TelegramMethod
+from ruentrainerbot.core.logging import configure_logging
+from ruentrainerbot.db.models import Dictionary, ReminderRuns, Users, UserWords
+from ruentrainerbot.db.session import engine
+from ruentrainerbot.jobs.reminders import ReminderBroadcaster
+
+RUN_DATE = date(2000, 1, 1)
+FIRST_USER_ID = -1_000_000_000
+
+
+class StubSession(BaseSession):
+    """
+    Сессия бота, которая считает отправленные сообщения по чатам
+    и отвечает 403 для заблокировавших бота
+    """
+    def __init__(self, latency: float, blocked: set[int]) -> None:
+        super().__init__()
+        self.latency = latency
+        self.blocked = blocked
+        self.sent: Counter[int] = Counter()
+
+    async def make_request(self, bot: Bot, method: TelegramMethod[Any], timeout: int | None = None) -> Any:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if isinstance(method, SendMessage):
+            if method.chat_id in self.blocked:
+                raise TelegramForbiddenError(method, 'Forbidden: bot was blocked by the user')
+            self.sent[method.chat_id] += 1
+        return True
+
+    async def stream_content(self, *args: Any, **kwargs: Any):
+        yield b''
+
+    async def close(self) -> None:
+        pass
+
+
+async def _cleanup() -> None:
+    async with engine.begin() as conn:
+        await conn.execute(sq.delete(Users).where(Users.id < 0))
+        await conn.execute(sq.delete(ReminderRuns).where(ReminderRuns.run_date == RUN_DATE))
+
+
+async def _populate(users: int) -> list[int]:
+    async with engine.begin() as conn:
+        word_id = (await conn.execute(sq.select(sq.func.min(Dictionary.id)))).scalar_one()
+        if word_id is None:
+            raise SystemExit('словарь пуст: сначала загрузите слова')
+        ids = [FIRST_USER_ID - n for n in range(users)]
+        await conn.execute(sq.insert(Users), [{'id': i} for i in ids])
+        await conn.execute(sq.insert(UserWords), [{'user_id': i, 'word_id': word_id} for i in ids])
+    return ids
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=2000, help='получателей')
+    parser.add_argument('--blocked-every', type=int, default=20, help='каждый N-й заблокировал бота')
+    parser.add_argument('--rate', type=float, default=500, help='сообщений в секунду')
+    parser.add_argument('--concurrency', type=int, default=20, help='одновременных отправок')
+    parser.add_argument('--latency', type=float, default=0.02, help='задержка ответа Bot API, с')
+    parser.add_argument('--chunk-size', type=int, default=200, help='размер пачки курсора')
+    parser.add_argument('--interrupt', type=int, default=700, help='прервать после N отправок, 0 - не прерывать')
+    args = parser.parse_args()
+
+    configure_logging(debug=True, log_level='WARNING')
+    await _cleanup()
+    ids = await _populate(args.users)
+    session = StubSession(args.latency, set(ids[::args.blocked_every]))
+    bot = Bot('1000000001:benchmark', session=session)
+
+    def broadcaster() -> ReminderBroadcaster:
+        return ReminderBroadcaster(bot, engine, rate=args.rate, concurrency=args.concurrency,
+                                   chunk_size=args.chunk_size, window=args.chunk_size * 5)
+
+    if args.interrupt:
+        task = asyncio.create_task(broadcaster().broadcast(RUN_DATE))
+        while sum(session.sent.values()) < args.interrupt and not task.done():
+            await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        print(f'прервано после {sum(session.sent.values())} отправок')
+
+    started = time.perf_counter()
+    # два процесса продолжают одну рассылку: ведет ее только один
+    results = await asyncio.gather(broadcaster().broadcast(RUN_DATE), broadcaster().broadcast(RUN_DATE))
+    elapsed = time.perf_counter() - started
+    totals = next(r for r in results if r is not None)
+    print(f'продолжение: {totals} за {elapsed:.1f} с, '
+          f'второй процесс отказался: {sum(r is None for r in results) == 1}')
+
+    repeated = sum(n - 1 for n in session.sent.values() if n > 1)
+    async with engine.connect() as conn:
+        recipients = (await conn.execute(
+            sq.select(sq.func.count(sq.distinct(UserWords.user_id))).where(UserWords.is_active == True)
+        )).scalar_one()
+    expected = recipients - len(session.blocked)
+    print(f'получили напоминание {len(session.sent)} из {expected}, '
+          f'повторных сообщений {repeated} (не больше пачки {args.chunk_size})')
+    async with engine.connect() as conn:
+        run = (await conn.execute(sq.select(ReminderRuns).where(ReminderRuns.run_date == RUN_DATE))).one()
+    print(f'reminder_runs: отправлено {run.sent}, заблокировали {run.blocked}, ошибок {run.failed}, '
+          f'завершена {run.finished_at is not None}')
+
+    await _cleanup()
+    await bot.session.close()
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
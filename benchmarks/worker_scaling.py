@@ -0,0 +1,142 @@
+"""
+Бенчмарк масштабирования многопроцессного режима (BOT_WORKERS).
+
+Поднимает фейковый Bot API (fake_bot_api.py) без лимитов, запускает
+лаунчер с N процессами-воркерами и раздает им синтетические апдейты:
+--users пользователей, у каждого /start, /quiz и --answers ответов.
+Ответ - первая кнопка последнего вопроса пользователя, поэтому ответы
+идут раундами: раунд ждет, пока всем пользователям придет следующий
+вопрос. Время считается от первого апдейта до остановки воркеров, которые
+перед выходом дообрабатывают все принятые апдейты. БД - локальный
+Postgres из DSN, FSM хранилище - --storage.
+
+    python benchmarks/worker_scaling.py --workers 1 2 4 --users 500
+"""
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+import sqlalchemy as sq
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+
+BOT_TOKEN = '1000000001:benchmark'
+BOT_ID = 1000000001
+PORT = 8098
+# настройки воркеров: они читают их из окружения при запуске
+os.environ.update({
+    'TOKEN': BOT_TOKEN,
+    'TELEGRAM_API_URL': f'http://127.0.0.1:{PORT}',
+    'METRICS_PORT': '0',
+    'API_GLOBAL_RATE': '1000000',
+    'API_CHAT_RATE': '1000000',
+    'API_CHAT_BURST': '1000000',
+    'LOG_LEVEL': 'ERROR',
+})
+
+from ruentrainerbot.core.logging import configure_logging  # noqa: E402
+from ruentrainerbot.db.models import AnswerEvents, FSMStates, Users, UserStats  # noqa: E402
+from ruentrainerbot.db.queries import delete_user_stats  # noqa: E402
+from ruentrainerbot.db.session import engine  # noqa: E402
+from ruentrainerbot.workers.launcher import Launcher  # noqa: E402
+from fake_bot_api import FakeBotAPI, start_fake_bot_api  # noqa: E402
+
+# пользователи с отрицательными id, чтобы не задеть настоящих
+FIRST_USER_ID = -1_000_000_000
+NOW = datetime.now(timezone.utc)
+
+
+def _command(update_id: int, user_id: int, text: str) -> Update:
+    return Update(update_id=update_id, message=Message(
+        message_id=update_id,
+        date=NOW,
+        chat=Chat(id=user_id, type='private'),
+        from_user=User(id=user_id, is_bot=False, first_name='load'),
+        text=text,
+        entities=[{'type': 'bot_command', 'offset': 0, 'length': len(text)}],
+    ))
+
+
+def _tap(update_id: int, user_id: int, data: str) -> Update:
+    return Update(update_id=update_id, callback_query=CallbackQuery(
+        id=str(update_id),
+        from_user=User(id=user_id, is_bot=False, first_name='load'),
+        chat_instance='load',
+        data=data,
+        message=Message(message_id=update_id, date=NOW, chat=Chat(id=user_id, type='private'), text='question'),
+    ))
+
+
+async def _next_keyboard(api: FakeBotAPI, user_id: int) -> list:
+    # callback_data вопроса содержит id квиза, поэтому ждем сам вопрос
+    while (keyboard := api.keyboards.pop(user_id, None)) is None:
+        await asyncio.sleep(0.005)
+    return keyboard
+
+
+async def _cleanup() -> None:
+    async with engine.begin() as conn:
+        await conn.execute(sq.delete(FSMStates).where(FSMStates.bot_id == BOT_ID))
+        await conn.execute(sq.delete(Users).where(Users.id < 0))
+        await conn.execute(sq.delete(AnswerEvents).where(AnswerEvents.user_id < 0))
+        await delete_user_stats(conn, UserStats.user_id < 0)
+
+
+async def run(workers: int, users: int, answers: int) -> float:
+    api = FakeBotAPI(chat_rate=1e9, chat_burst=1e9, global_rate=1e9)
+    runner = await start_fake_bot_api(api, '127.0.0.1', PORT)
+    launcher = Launcher(workers)
+    launcher.start()
+
+    # прогрев: по /start в каждый воркер, ждем ответа от всех
+    for n in range(workers):
+        await launcher.dispatch(_command(n + 1, FIRST_USER_ID + n, '/start'))
+    while api.requests.get('sendMessage', 0) < workers:
+        await asyncio.sleep(0.05)
+
+    update_id = workers + 1
+    started = time.perf_counter()
+    for n in range(users):
+        user_id = FIRST_USER_ID - n - 1
+        await launcher.dispatch(_command(update_id, user_id, '/start'))
+        await launcher.dispatch(_command(update_id + 1, user_id, '/quiz'))
+        update_id += 2
+    for _ in range(answers):
+        for n in range(users):
+            keyboard = await _next_keyboard(api, FIRST_USER_ID - n - 1)
+            await launcher.dispatch(_tap(update_id, FIRST_USER_ID - n - 1, keyboard[0][0]['callback_data']))
+            update_id += 1
+    await launcher.stop()
+    elapsed = time.perf_counter() - started
+    await runner.cleanup()
+
+    updates = users * (2 + answers)
+    rate = updates / elapsed
+    restarts = sum(w.restarts for w in launcher.workers)
+    print(f'воркеров {workers}: {updates} апдейтов за {elapsed:.1f} с, '
+          f'{rate:.0f} апдейтов/с, вызовов API {sum(api.requests.values())}, перезапусков {restarts}')
+    await _cleanup()
+    return rate
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help='числа воркеров')
+    parser.add_argument('--users', type=int, default=500, help='пользователей')
+    parser.add_argument('--answers', type=int, default=10, help='ответов на пользователя')
+    parser.add_argument('--storage', choices=('postgres', 'memory'), default='postgres', help='FSM хранилище')
+    args = parser.parse_args()
+
+    os.environ['FSM_STORAGE'] = args.storage
+    configure_logging(debug=False, log_level='ERROR')
+    await _cleanup()
+    base = None
+    for workers in args.workers:
+        rate = await run(workers, args.users, args.answers)
+        base = base or rate
+        print(f'  ускорение x{rate / base:.2f}')
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -1,12 +1,13 @@
 import asyncio
-from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
+from ruentrainerbot.app import run_bot
 from ruentrainerbot.core.config import settings
 from ruentrainerbot.core.logging import configure_logging, get_logger
+from ruentrainerbot.db.migrations import run_migrations
 from ruentrainerbot.db.queries import create_fill_tables
 from ruentrainerbot.db.session import engine
-from ruentrainerbot.middlewares.log_context import LogContextMiddleware
-from ruentrainerbot.handlers import routers
+from ruentrainerbot.jobs.distractors import refresh_distractors
+from ruentrainerbot.web.webhook import run_webhook
+from ruentrainerbot.workers.launcher import run_launcher
 
 logger = get_logger(__name__)
 
@@ -14,28 +15,25 @@ logger = get_logger(__name__)
 async def main():
     configure_logging(
         debug=settings.debug,
-        log_level=getattr(settings, 'log_level', 'INFO')
+        log_level=getattr(settings, 'log_level', 'INFO'),
+        use_queue=settings.log_queue,
+        queue_size=settings.log_queue_size,
+        sample=settings.log_sample,
     )
     logger.info('Бот запущен', debug=settings.debug)
+    await run_migrations(engine)
     if settings.debug:
         await create_fill_tables(engine)
         logger.info('tables_created')
-
-    bot = Bot(token=settings.token)
-    dp = Dispatcher(storage=MemoryStorage())
-    dp.update.middleware(LogContextMiddleware())
-
-    for r in routers:
-        dp.include_router(r)
-
-    try:
-        await dp.start_polling(bot)
-    except Exception:
-        logger.exception('polling_failed')
-        raise
-    finally:
-        await bot.session.close()
-        logger.info('bot_stopped')
+        await refresh_distractors()
+
+    if settings.workers > 1:
+        await run_launcher(settings.workers)
+    elif settings.mode == 'webhook':
+        await run_bot(run_webhook)
+    else:
+        # апдейты и так уходят в исполнитель, задачи поллинга не нужны
+        await run_bot(lambda dp, bot: dp.start_polling(bot, handle_as_tasks=False))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,127 @@
+from typing import Awaitable, Callable
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import PRODUCTION, TelegramAPIServer
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
+from ruentrainerbot.core.config import settings
+from ruentrainerbot.core.logging import get_logger
+from ruentrainerbot.db.cache import user_words_cache
+from ruentrainerbot.db.events import answer_events_writer
+from ruentrainerbot.db.session import engine, replica_router
+from ruentrainerbot.db.snapshot import dictionary_snapshot
+from ruentrainerbot.db.storage import PostgresStorage
+from ruentrainerbot.db.write_behind import user_words_writer
+from ruentrainerbot.middlewares.api_rate_limit import ApiRateLimitMiddleware
+from ruentrainerbot.middlewares.executor import QueuedDispatcher, UpdateExecutor
+from ruentrainerbot.middlewares.log_context import setup_log_context
+from ruentrainerbot.middlewares.metrics import setup_handler_metrics
+from ruentrainerbot.handlers import routers
+from ruentrainerbot.handlers.quiz import reject_stale_tap
+from ruentrainerbot.jobs.reminders import ReminderBroadcaster
+from ruentrainerbot.web.metrics import start_metrics_server
+
+logger = get_logger(__name__)
+
+
+def create_bot(global_rate: float = settings.api_global_rate) -> Bot:
+    """
+    Создает бота с сессией, ограничивающей вызовы Bot API.
+    global_rate - доля общего лимита Telegram, доступная этому процессу
+    """
+    session = AiohttpSession(
+        api=TelegramAPIServer.from_base(settings.telegram_api_url) if settings.telegram_api_url else PRODUCTION
+    )
+    session.middleware(ApiRateLimitMiddleware(
+        global_rate=global_rate,
+        chat_rate=settings.api_chat_rate,
+        chat_burst=settings.api_chat_burst,
+        group_rate=settings.api_group_rate,
+        max_retries=settings.api_max_retries,
+    ))
+    return Bot(token=settings.token, session=session)
+
+
+def create_dispatcher(storage: BaseStorage, executor: UpdateExecutor) -> QueuedDispatcher:
+    """
+    Собирает диспетчер бота: очередь исполнителя, фильтр приема,
+    middleware и роутеры. Общий для run_bot и нагрузочного бенчмарка,
+    исполнитель запускает вызывающий
+    """
+    # апдейт встает в очередь исполнителя при приеме, до FSM и middleware
+    dp = QueuedDispatcher(executor=executor, storage=storage)
+    dp.intake_filters.append(reject_stale_tap)
+    setup_log_context(dp)
+    setup_handler_metrics(dp)
+
+    for r in routers:
+        dp.include_router(r)
+    return dp
+
+
+async def run_bot(serve: Callable[[Dispatcher, Bot], Awaitable[None]],
+                  metrics_port: int = settings.metrics_port,
+                  reminders: bool = True,
+                  workers: int = 1
+                  ) -> None:
+    """
+    Собирает бота и диспетчер, запускает фоновые задачи
+    и передает управление serve(dp, bot): поллингу, вебхуку
+    или чтению апдейтов от лаунчера. После выхода из serve
+    дообрабатывает принятые апдейты и останавливает фоновые задачи.
+    reminders=False - не запускать рассылку напоминаний в этом процессе.
+    workers - число процессов, которые делят API_GLOBAL_RATE: у каждого
+    свое ведро токенов, поэтому процессу достается 1/workers лимита
+    """
+    try:
+        await dictionary_snapshot.load(engine)
+    except Exception:
+        logger.exception('dictionary_snapshot_load_failed')
+    dictionary_snapshot.start_refresh(engine, settings.snapshot_refresh_seconds)
+
+    bot = create_bot(global_rate=settings.api_global_rate / workers)
+    storage = (
+        PostgresStorage(engine, cache_size=settings.fsm_cache_size)
+        if settings.fsm_storage == 'postgres'
+        else MemoryStorage()
+    )
+    executor = UpdateExecutor(
+        concurrency=settings.update_concurrency,
+        max_queue=settings.update_queue_size,
+    )
+    dp = create_dispatcher(storage, executor)
+    executor.start()
+    replica_router.start(settings.db_replica_check_interval)
+    user_words_writer.start()
+    answer_events_writer.start()
+    broadcaster = None
+    if settings.reminders_enabled and reminders:
+        broadcaster = ReminderBroadcaster(
+            bot,
+            engine,
+            rate=settings.reminder_rate,
+            concurrency=settings.reminder_concurrency,
+        )
+        broadcaster.start(settings.reminder_time)
+    metrics_runner = None
+    if metrics_port:
+        metrics_runner = await start_metrics_server(settings.metrics_host, metrics_port)
+
+    try:
+        await serve(dp, bot)
+    except Exception:
+        logger.exception('polling_failed', mode=settings.mode)
+        raise
+    finally:
+        if broadcaster is not None:
+            await broadcaster.stop()
+        await executor.stop()
+        await user_words_writer.stop()
+        await answer_events_writer.stop()
+        await dictionary_snapshot.stop()
+        await replica_router.stop()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        logger.info('user_words_cache_stats', **user_words_cache.stats())
+        await bot.session.close()
+        logger.info('bot_stopped')
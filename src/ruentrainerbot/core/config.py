@@ -1,3 +1,4 @@
+from datetime import time
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
 
@@ -16,6 +17,51 @@ class Settings(BaseSettings):
     token: str = Field(alias='TOKEN')
     dsn: str = Field(alias='DSN')
     debug: bool = Field(default=True, alias='DEBUG')
+    db_pool_size: int = Field(default=10, alias='DB_POOL_SIZE')
+    db_max_overflow: int = Field(default=10, alias='DB_MAX_OVERFLOW')
+    db_pool_timeout: float = Field(default=30, alias='DB_POOL_TIMEOUT')
+    db_pool_recycle: int = Field(default=1800, alias='DB_POOL_RECYCLE')
+    db_pool_pre_ping: bool = Field(default=False, alias='DB_POOL_PRE_PING')
+    db_statement_cache_size: int = Field(default=100, alias='DB_STATEMENT_CACHE_SIZE')
+    db_slow_query_ms: float = Field(default=100, alias='DB_SLOW_QUERY_MS')
+    db_replica_dsns: list[str] = Field(default_factory=list, alias='DB_REPLICA_DSNS')
+    db_replica_check_interval: float = Field(default=5, alias='DB_REPLICA_CHECK_INTERVAL')
+    db_replica_max_lag: float = Field(default=10, alias='DB_REPLICA_MAX_LAG')
     log_level: str = Field(alias='LOG_LEVEL')
+    log_queue: bool = Field(default=False, alias='LOG_QUEUE')
+    log_queue_size: int = Field(default=10_000, alias='LOG_QUEUE_SIZE')
+    log_sample: dict[str, float] = Field(default_factory=dict, alias='LOG_SAMPLE')
+    mode: str = Field(default='polling', alias='BOT_MODE')
+    webhook_url: str | None = Field(default=None, alias='WEBHOOK_URL')
+    webhook_path: str = Field(default='/webhook', alias='WEBHOOK_PATH')
+    webhook_host: str = Field(default='0.0.0.0', alias='WEBHOOK_HOST')
+    webhook_port: int = Field(default=8080, alias='WEBHOOK_PORT')
+    webhook_secret: str | None = Field(default=None, alias='WEBHOOK_SECRET')
+    webhook_concurrency: int = Field(default=100, alias='WEBHOOK_CONCURRENCY')
+    update_concurrency: int = Field(default=100, alias='UPDATE_CONCURRENCY')
+    update_queue_size: int = Field(default=1000, alias='UPDATE_QUEUE_SIZE')
+    workers: int = Field(default=1, alias='BOT_WORKERS')
+    fsm_storage: str = Field(default='postgres', alias='FSM_STORAGE')
+    fsm_cache_size: int = Field(default=10_000, alias='FSM_CACHE_SIZE')
+    snapshot_refresh_seconds: float = Field(default=60, alias='SNAPSHOT_REFRESH_SECONDS')
+    user_words_cache_max_ids: int = Field(default=500_000, alias='USER_WORDS_CACHE_MAX_IDS')
+    user_words_cache_ttl: float = Field(default=600, alias='USER_WORDS_CACHE_TTL')
+    user_words_flush_size: int = Field(default=500, alias='USER_WORDS_FLUSH_SIZE')
+    user_words_flush_interval: float = Field(default=1.0, alias='USER_WORDS_FLUSH_INTERVAL')
+    answer_events_buffer_size: int = Field(default=50_000, alias='ANSWER_EVENTS_BUFFER_SIZE')
+    answer_events_batch_size: int = Field(default=1000, alias='ANSWER_EVENTS_BATCH_SIZE')
+    answer_events_flush_interval: float = Field(default=1.0, alias='ANSWER_EVENTS_FLUSH_INTERVAL')
+    metrics_host: str = Field(default='127.0.0.1', alias='METRICS_HOST')
+    metrics_port: int = Field(default=9100, alias='METRICS_PORT')
+    telegram_api_url: str | None = Field(default=None, alias='TELEGRAM_API_URL')
+    api_global_rate: float = Field(default=30, alias='API_GLOBAL_RATE')
+    api_chat_rate: float = Field(default=1, alias='API_CHAT_RATE')
+    api_chat_burst: float = Field(default=3, alias='API_CHAT_BURST')
+    api_group_rate: float = Field(default=20 / 60, alias='API_GROUP_RATE')
+    api_max_retries: int = Field(default=3, alias='API_MAX_RETRIES')
+    reminders_enabled: bool = Field(default=False, alias='REMINDERS_ENABLED')
+    reminder_time: time = Field(default=time(18, 0), alias='REMINDER_TIME')
+    reminder_rate: float = Field(default=20, alias='REMINDER_RATE')
+    reminder_concurrency: int = Field(default=10, alias='REMINDER_CONCURRENCY')
 
 settings = Settings()
\ No newline at end of file
@@ -1,34 +1,225 @@
+import atexit
+import copy
+import json
+import queue
+import random
 import sys
+import threading
+import time
 import logging
+import logging.handlers
+from datetime import datetime, timezone
 import structlog
+from ruentrainerbot.core.metrics import registry
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-def configure_logging(debug: bool, log_level: str = 'INFO') -> None:
+dropped_records = registry.counter('log_records_dropped_total', 'Записи лога, отброшенные при полной очереди')
+
+_writer: '_LogWriter | None' = None
+
+
+def _dumps(obj, **kwargs) -> str:
+    if orjson is not None:
+        # как json.dumps: ключи-числа в словарях события становятся строками
+        return orjson.dumps(obj, default=kwargs.get('default'), option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(obj, **kwargs)
+
+
+class EventSampler:
+    """
+    Процессор structlog, который пропускает только долю событий
+    с заданными именами: {'quiz_answer_received': 0.1} оставляет
+    каждое десятое в среднем. Предупреждения и ошибки не отбрасываются
+    """
+    def __init__(self, rates: dict[str, float]) -> None:
+        self.rates = rates
+
+    def __call__(self, logger, method_name: str, event_dict: dict) -> dict:
+        rate = self.rates.get(event_dict.get('event'))
+        if rate is not None and method_name in ('debug', 'info') and random.random() >= rate:
+            raise structlog.DropEvent
+        return event_dict
+
+
+def _stamp(logger, method_name: str, event_dict: dict) -> dict:
+    # в потоке цикла событий только запоминаем время, строку делает _LogWriter
+    event_dict['timestamp'] = time.time()
+    return event_dict
+
+
+def _format_stamp(logger, method_name: str, event_dict: dict) -> dict:
+    stamp = event_dict.get('timestamp')
+    if isinstance(stamp, float):
+        event_dict['timestamp'] = datetime.fromtimestamp(stamp, timezone.utc).isoformat().replace('+00:00', 'Z')
+    return event_dict
+
+
+def _record_exception(logger, method_name: str, event_dict: dict) -> dict:
+    # трейсбек записи logging, отформатированный в _QueueHandler.prepare
+    exc_text = event_dict['_record'].exc_text
+    if exc_text:
+        event_dict['exception'] = exc_text
+    return event_dict
+
+
+def _enqueue(records: queue.Queue, item) -> None:
+    try:
+        records.put_nowait(item)
+    except queue.Full:
+        dropped_records.inc()
+
+
+class _QueueLogger:
+    """
+    Логгер structlog, который кладет словарь события в очередь
+    """
+    def __init__(self, records: queue.Queue) -> None:
+        self.records = records
+
+    def msg(self, event_dict: dict) -> None:
+        _enqueue(self.records, event_dict)
+
+    debug = info = warning = warn = error = critical = exception = fatal = log = msg
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Кладет записи стандартного logging (aiogram, sqlalchemy)
+    в ту же очередь, форматирует их _LogWriter
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # как в QueueHandler: аргументы и трейсбек превращаются в строки
+        # сразу, пока объекты не изменились; остальное делает _LogWriter
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        _enqueue(self.queue, record)
+
+
+class _LogWriter(threading.Thread):
+    """
+    Фоновый поток: рендерит события из очереди и пишет их в stream.
+    Буфер stream сбрасывается, когда очередь опустела
+    """
+    def __init__(self, records: queue.Queue, stream, renderer) -> None:
+        super().__init__(name='log-writer', daemon=True)
+        self.records = records
+        self.stream = stream
+        self.processors = [_format_stamp, structlog.processors.UnicodeDecoder(), renderer]
+        self.formatter = structlog.stdlib.ProcessorFormatter(
+            foreign_pre_chain=[
+                structlog.processors.add_log_level,
+                structlog.processors.TimeStamper(fmt='iso', utc=True),
+                _record_exception,
+            ],
+            processors=[
+                structlog.stdlib.ProcessorFormatter.remove_processors_meta,
+                renderer,
+            ],
+        )
+
+    def _render(self, item) -> str:
+        if isinstance(item, logging.LogRecord):
+            return self.formatter.format(item)
+        method_name = item.get('level', 'info')
+        for processor in self.processors:
+            item = processor(None, method_name, item)
+        return item
+
+    def run(self) -> None:
+        while True:
+            item = self.records.get()
+            if item is None:
+                self.stream.flush()
+                return
+            try:
+                self.stream.write(self._render(item) + '\n')
+            except Exception as e:
+                sys.stderr.write(f'log_render_failed: {e!r}\n')
+            if self.records.empty():
+                self.stream.flush()
+
+    def stop(self) -> None:
+        self.records.put(None)
+        self.join()
+
+
+def _stop_writer() -> None:
+    global _writer
+    if _writer is not None:
+        _writer.stop()
+        _writer = None
+
+
+atexit.register(_stop_writer)
+
+
+def configure_logging(debug: bool,
+                      log_level: str = 'INFO',
+                      use_queue: bool = False,
+                      queue_size: int = 10_000,
+                      sample: dict[str, float] | None = None
+                      ) -> None:
     """
     Настраивает стандартный logging и structlog
     debug=True: консольный вывод
-    debug=False: JSON
+    debug=False: JSON (orjson, если установлен extra orjson)
+    use_queue=True: в вызывающем потоке только собирается словарь события,
+    рендер и запись в stdout идут в фоновом потоке через очередь на queue_size записей;
+    при полной очереди записи отбрасываются
+    sample: доля оставляемых info/debug событий по имени события
     """
+    global _writer
     level = getattr(logging, log_level.upper(), logging.INFO)
-
-    logging.basicConfig(
-        level=level,
-        format='%(message)s',
-        stream=sys.stdout
-    )
+    _stop_writer()
 
     shared_processors = [
         structlog.contextvars.merge_contextvars,
         structlog.processors.add_log_level,
-        structlog.processors.TimeStamper(fmt='iso', utc=True),
+        _stamp if use_queue else structlog.processors.TimeStamper(fmt='iso', utc=True),
         structlog.processors.StackInfoRenderer(),
         structlog.processors.format_exc_info,
     ]
+    if sample:
+        shared_processors.insert(0, EventSampler(sample))
 
     renderer = (
         structlog.dev.ConsoleRenderer()
         if debug
-        else structlog.processors.JSONRenderer()
+        else structlog.processors.JSONRenderer(serializer=_dumps)
+    )
+
+    if use_queue:
+        records = queue.Queue(maxsize=queue_size)
+        _writer = _LogWriter(records, sys.stdout, renderer)
+        _writer.start()
+        logging.basicConfig(level=level, handlers=[_QueueHandler(records)], force=True)
+        structlog.configure(
+            processors=[
+                *shared_processors,
+                lambda logger, method_name, event_dict: ((event_dict,), {}),
+            ],
+            wrapper_class=structlog.make_filtering_bound_logger(level),
+            logger_factory=lambda *args: _QueueLogger(records),
+            cache_logger_on_first_use=True,
+        )
+        return
+
+    logging.basicConfig(
+        level=level,
+        format='%(message)s',
+        stream=sys.stdout,
+        force=True,
     )
 
     structlog.configure(
@@ -43,4 +234,4 @@ def configure_logging(debug: bool, log_level: str = 'INFO') -> None:
     )
 
 def get_logger(name: str | None = None) -> structlog.stdlib.BoundLogger:
-    return structlog.get_logger(name)
\ No newline at end of file
+    return structlog.get_logger(name)
@@ -0,0 +1,40 @@
+from contextvars import ContextVar
+from typing import Any
+
+
+class QueryStats:
+    """
+    Счетчики SQL запросов, выполненных при обработке одного апдейта
+    """
+    __slots__ = ('count', 'duration')
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.duration = 0.0
+
+    def add(self, duration: float) -> None:
+        self.count += 1
+        self.duration += duration
+
+    def as_dict(self) -> dict[str, Any]:
+        return {'db_queries': self.count, 'db_time_ms': round(self.duration * 1000, 2)}
+
+
+_current: ContextVar[QueryStats | None] = ContextVar('query_stats', default=None)
+
+
+def start_query_stats() -> QueryStats:
+    """
+    Начинает подсчет запросов для текущего контекста (апдейта)
+    """
+    stats = QueryStats()
+    _current.set(stats)
+    return stats
+
+
+def stop_query_stats() -> None:
+    _current.set(None)
+
+
+def current_query_stats() -> QueryStats | None:
+    return _current.get()
@@ -0,0 +1,133 @@
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
+from ruentrainerbot.core.config import settings
+
+
+class UserWordsCache:
+    """
+    Кеш множеств активных слов пользователей (LRU + TTL).
+    Размер ограничен суммарным количеством id слов max_ids:
+    при переполнении вытесняются давно не использованные пользователи.
+    Запись сквозная: add_word_to_user и remove_word_from_user
+    обновляют кеш после коммита
+    """
+    def __init__(self, max_ids: int, ttl: float) -> None:
+        self.max_ids = max_ids
+        self.ttl = ttl
+        self._entries: OrderedDict[int, tuple[float, set[int]]] = OrderedDict()
+        self._size = 0
+        # user_id -> [число идущих загрузок, была ли запись во время загрузки]
+        self._loading: dict[int, list] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _lookup(self, user_id: int) -> set[int] | None:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        expires_at, word_ids = entry
+        if expires_at < time.monotonic():
+            self._drop(user_id)
+            return None
+        self._entries.move_to_end(user_id)
+        return word_ids
+
+    def _drop(self, user_id: int) -> None:
+        _, word_ids = self._entries.pop(user_id)
+        self._size -= len(word_ids)
+
+    def _store(self, user_id: int, word_ids: set[int]) -> None:
+        if len(word_ids) > self.max_ids:
+            return
+        if user_id in self._entries:
+            self._drop(user_id)
+        self._entries[user_id] = (time.monotonic() + self.ttl, word_ids)
+        self._size += len(word_ids)
+        self._evict()
+
+    def _evict(self) -> None:
+        while self._size > self.max_ids and self._entries:
+            user_id = next(iter(self._entries))
+            self._drop(user_id)
+            self.evictions += 1
+
+    def _mark_stale(self, user_id: int) -> None:
+        loading = self._loading.get(user_id)
+        if loading is not None:
+            loading[1] = True
+
+    async def get(self,
+                  user_id: int,
+                  load: Callable[[], Awaitable[set[int]]]
+                  ) -> set[int]:
+        """
+        Возвращает множество активных слов пользователя.
+        При промахе загружает его через load() и кладет в кеш.
+        Возвращаемое множество нельзя изменять
+        """
+        word_ids = self._lookup(user_id)
+        if word_ids is not None:
+            self.hits += 1
+            return word_ids
+
+        self.misses += 1
+        loading = self._loading.setdefault(user_id, [0, False])
+        loading[0] += 1
+        try:
+            word_ids = await load()
+        finally:
+            loading[0] -= 1
+            stale = loading[1]
+            if not loading[0]:
+                del self._loading[user_id]
+        # Если во время загрузки пришла запись, загруженное множество
+        # могло ее не увидеть: отдаем его, но не кешируем
+        if not stale:
+            self._store(user_id, word_ids)
+        return word_ids
+
+    def add(self, user_id: int, word_id: int) -> None:
+        """
+        Отмечает слово активным, если пользователь есть в кеше
+        """
+        self._mark_stale(user_id)
+        entry = self._entries.get(user_id)
+        if entry is not None and word_id not in entry[1]:
+            entry[1].add(word_id)
+            self._size += 1
+            self._evict()
+
+    def discard(self, user_id: int, word_id: int) -> None:
+        """
+        Отмечает слово неактивным, если пользователь есть в кеше
+        """
+        self._mark_stale(user_id)
+        entry = self._entries.get(user_id)
+        if entry is not None and word_id in entry[1]:
+            entry[1].discard(word_id)
+            self._size -= 1
+
+    def invalidate(self, user_id: int) -> None:
+        self._mark_stale(user_id)
+        if user_id in self._entries:
+            self._drop(user_id)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            'users': len(self._entries),
+            'word_ids': self._size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+user_words_cache = UserWordsCache(
+    max_ids=settings.user_words_cache_max_ids,
+    ttl=settings.user_words_cache_ttl,
+)
@@ -0,0 +1,161 @@
+import asyncio
+import contextlib
+from datetime import date, datetime, timezone
+from sqlalchemy.ext.asyncio import AsyncEngine
+from ruentrainerbot.core.config import settings
+from ruentrainerbot.core.logging import get_logger
+from ruentrainerbot.core.metrics import registry
+from ruentrainerbot.db.queries import (apply_answer_stats, create_answer_events_partition,
+                                       insert_answer_events)
+from ruentrainerbot.db.session import engine
+
+logger = get_logger(__name__)
+
+events_written = registry.counter('answer_events_written_total', 'Записанные события ответов')
+events_dropped = registry.counter('answer_events_dropped_total', 'События ответов, отброшенные при полном буфере')
+
+
+class AnswerEventsWriter:
+    """
+    Буферизованная запись событий ответов в answer_events.
+    В той же транзакции пачка прибавляется к счетчикам статистики.
+    record() только кладет событие в буфер и никогда не ждет БД;
+    фоновая задача сбрасывает буфер пачками по batch_size,
+    когда набирается batch_size событий или проходит flush_interval секунд.
+    Буфер ограничен max_buffer событиями: при переполнении record()
+    отбрасывает событие, а put() ждет, пока буфер освободится
+    """
+    def __init__(self,
+                 engine: AsyncEngine,
+                 max_buffer: int,
+                 batch_size: int,
+                 flush_interval: float
+                 ) -> None:
+        self.engine = engine
+        self.max_buffer = max_buffer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer: list[dict] = []
+        self._wakeup = asyncio.Event()
+        self._space = asyncio.Event()
+        self._space.set()
+        self._flush_lock = asyncio.Lock()
+        self._partitions: set[date] = set()
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def _append(self, event: dict) -> None:
+        self._buffer.append(event)
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+        if len(self._buffer) >= self.max_buffer:
+            self._space.clear()
+
+    def record(self,
+               user_id: int,
+               word_id: int,
+               is_correct: bool,
+               picked_index: int,
+               mode: str
+               ) -> bool:
+        """
+        Кладет событие ответа в буфер.
+        Возвращает False, если буфер полон и событие отброшено
+        """
+        if len(self._buffer) >= self.max_buffer:
+            events_dropped.inc()
+            self._wakeup.set()
+            return False
+        self._append({
+            'answered_at': datetime.now(timezone.utc),
+            'user_id': user_id,
+            'word_id': word_id,
+            'is_correct': is_correct,
+            'picked_index': picked_index,
+            'mode': mode,
+        })
+        return True
+
+    async def put(self, event: dict) -> None:
+        """
+        Кладет готовое событие в буфер, дожидаясь места в нем
+        """
+        while len(self._buffer) >= self.max_buffer:
+            self._wakeup.set()
+            await self._space.wait()
+        self._append(event)
+
+    async def _ensure_partitions(self, batch: list[dict]) -> None:
+        months = {event['answered_at'].date().replace(day=1) for event in batch} - self._partitions
+        if not months:
+            return
+        async with self.engine.begin() as conn:
+            for month in sorted(months):
+                await create_answer_events_partition(conn, month)
+        self._partitions |= months
+
+    async def flush(self) -> None:
+        """
+        Записывает весь буфер пачками по batch_size.
+        При ошибке незаписанные события возвращаются в начало буфера
+        """
+        async with self._flush_lock:
+            while self._buffer:
+                batch = self._buffer[:self.batch_size]
+                del self._buffer[:self.batch_size]
+                try:
+                    await self._ensure_partitions(batch)
+                    async with self.engine.begin() as conn:
+                        await insert_answer_events(conn, batch)
+                        await apply_answer_stats(conn, batch)
+                except Exception:
+                    self._buffer[:0] = batch
+                    raise
+                finally:
+                    if len(self._buffer) < self.max_buffer:
+                        self._space.set()
+                events_written.inc(len(batch))
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception('answer_events_flush_failed', buffered=len(self._buffer))
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Останавливает фоновый сброс и записывает остаток буфера
+        """
+        if self._task is not None:
+            # не отменяем задачу посреди сброса, чтобы не потерять пачку
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+            self._stopping = False
+        await self.flush()
+        logger.info(
+            'answer_events_writer_stopped',
+            written=events_written.value(),
+            dropped=events_dropped.value(),
+        )
+
+
+answer_events_writer = AnswerEventsWriter(
+    engine,
+    max_buffer=settings.answer_events_buffer_size,
+    batch_size=settings.answer_events_batch_size,
+    flush_interval=settings.answer_events_flush_interval,
+)
+registry.gauge('answer_events_buffered', 'События ответов в буфере', fn=lambda: len(answer_events_writer))
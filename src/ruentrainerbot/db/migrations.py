@@ -0,0 +1,198 @@
+"""
+Версионные миграции схемы БД.
+
+Каждая миграция - функция, которая получает соединение и выполняется
+в своей транзакции. Примененные версии записываются в schema_migrations,
+при запуске применяются все отсутствующие там версии по порядку.
+Запуск из нескольких процессов сразу безопасен: раннер держит
+advisory lock, пока применяет миграции.
+
+    python -m ruentrainerbot.db.migrations
+    python -m ruentrainerbot.db.migrations --list
+"""
+import argparse
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+import sqlalchemy as sq
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from ruentrainerbot.core.config import settings
+from ruentrainerbot.core.logging import configure_logging, get_logger
+from ruentrainerbot.db.models import Base, SchemaMigrations
+from ruentrainerbot.db.session import engine
+
+logger = get_logger(__name__)
+
+# ключ pg_advisory_lock раннера миграций
+LOCK_KEY = 7_301_019
+
+
+class MigrationSkipped(Exception):
+    """
+    Миграцию сейчас применить нельзя (например, нет расширения).
+    Она не записывается как примененная и повторится при следующем запуске
+    """
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    apply: Callable[[AsyncConnection], Awaitable[None]]
+
+
+async def _execute(conn: AsyncConnection, *statements: str) -> None:
+    for statement in statements:
+        await conn.execute(sq.text(statement))
+
+
+# таблицы схемы до версионных миграций: более поздние таблицы
+# создают свои миграции явным DDL, а не по текущим моделям
+INITIAL_TABLES = ('words', 'users', 'user_words', 'word_distractors', 'fsm_states', 'answer_events')
+
+
+async def _create_tables(conn: AsyncConnection) -> None:
+    # недостающие из начальных таблиц; существующие не трогает
+    tables = [Base.metadata.tables[name] for name in INITIAL_TABLES]
+    await conn.run_sync(lambda sync_conn: Base.metadata.create_all(sync_conn, tables=tables))
+
+
+async def _user_words_review_state(conn: AsyncConnection) -> None:
+    await _execute(
+        conn,
+        'ALTER TABLE user_words '
+        'ADD COLUMN IF NOT EXISTS repetitions smallint NOT NULL DEFAULT 0, '
+        'ADD COLUMN IF NOT EXISTS interval_days integer NOT NULL DEFAULT 0, '
+        'ADD COLUMN IF NOT EXISTS ease double precision NOT NULL DEFAULT 2.5, '
+        'ADD COLUMN IF NOT EXISTS due_at timestamptz NOT NULL DEFAULT now()',
+        'CREATE INDEX IF NOT EXISTS ix_user_words_user_due ON user_words (user_id, due_at) WHERE is_active',
+    )
+
+
+async def _hot_query_indexes(conn: AsyncConnection) -> None:
+    await _execute(
+        conn,
+        'CREATE INDEX IF NOT EXISTS ix_user_words_user_active '
+        'ON user_words (user_id) INCLUDE (word_id) WHERE is_active',
+        'CREATE INDEX IF NOT EXISTS ix_user_words_word ON user_words (word_id)',
+        'CREATE INDEX IF NOT EXISTS ix_word_distractors_distractor ON word_distractors (distractor_id)',
+    )
+
+
+async def _answer_stats(conn: AsyncConnection) -> None:
+    await _execute(
+        conn,
+        'CREATE TABLE IF NOT EXISTS user_stats ('
+        'user_id bigint PRIMARY KEY, '
+        'answers integer NOT NULL DEFAULT 0, '
+        'correct integer NOT NULL DEFAULT 0, '
+        'current_streak integer NOT NULL DEFAULT 0, '
+        'best_streak integer NOT NULL DEFAULT 0, '
+        'updated_at timestamptz DEFAULT now())',
+        'CREATE TABLE IF NOT EXISTS word_stats ('
+        'word_id integer PRIMARY KEY, '
+        'answers integer NOT NULL DEFAULT 0, '
+        'correct integer NOT NULL DEFAULT 0)',
+        'CREATE TABLE IF NOT EXISTS leaderboard_scores ('
+        'score integer PRIMARY KEY, '
+        'users integer NOT NULL DEFAULT 0)',
+    )
+
+
+async def _reminder_runs(conn: AsyncConnection) -> None:
+    await _execute(
+        conn,
+        'CREATE TABLE IF NOT EXISTS reminder_runs ('
+        'run_date date PRIMARY KEY, '
+        'last_user_id bigint, '
+        'sent integer NOT NULL DEFAULT 0, '
+        'blocked integer NOT NULL DEFAULT 0, '
+        'failed integer NOT NULL DEFAULT 0, '
+        'started_at timestamptz NOT NULL DEFAULT now(), '
+        'finished_at timestamptz)',
+    )
+
+
+async def _words_en_trigram(conn: AsyncConnection) -> None:
+    result = await conn.execute(sq.text(
+        "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"
+    ))
+    if result.scalar() is None:
+        raise MigrationSkipped('расширение pg_trgm не установлено на сервере')
+    await _execute(
+        conn,
+        'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+        'CREATE INDEX IF NOT EXISTS ix_words_en_trgm ON words USING gin (en gin_trgm_ops)',
+    )
+
+
+MIGRATIONS: list[Migration] = [
+    Migration(1, 'таблицы по моделям', _create_tables),
+    Migration(2, 'состояние повторения SM-2 в user_words', _user_words_review_state),
+    Migration(3, 'индексы для запросов личного словаря и соседей', _hot_query_indexes),
+    Migration(4, 'триграммный индекс words.en для ILIKE', _words_en_trigram),
+    Migration(5, 'статистика ответов и таблица лидеров', _answer_stats),
+    Migration(6, 'контрольные точки рассылки напоминаний', _reminder_runs),
+]
+
+
+async def _applied_versions(conn: AsyncConnection) -> set[int]:
+    await conn.run_sync(lambda sync_conn: SchemaMigrations.__table__.create(sync_conn, checkfirst=True))
+    result = await conn.execute(sq.select(SchemaMigrations.version))
+    return set(result.scalars().all())
+
+
+async def run_migrations(engine: AsyncEngine) -> list[int]:
+    """
+    Применяет миграции, которых нет в schema_migrations.
+    Возвращает версии, примененные за этот запуск
+    """
+    applied = []
+    async with engine.connect() as conn:
+        await conn.execute(sq.select(sq.func.pg_advisory_lock(LOCK_KEY)))
+        await conn.commit()
+        try:
+            async with conn.begin():
+                done = await _applied_versions(conn)
+            for migration in MIGRATIONS:
+                if migration.version in done:
+                    continue
+                try:
+                    async with conn.begin():
+                        await migration.apply(conn)
+                        await conn.execute(sq.insert(SchemaMigrations).values(
+                            version=migration.version,
+                            description=migration.description,
+                        ))
+                except MigrationSkipped as e:
+                    logger.warning('migration_skipped', version=migration.version, reason=str(e))
+                    continue
+                applied.append(migration.version)
+                logger.info('migration_applied', version=migration.version, description=migration.description)
+        finally:
+            await conn.execute(sq.select(sq.func.pg_advisory_unlock(LOCK_KEY)))
+            await conn.commit()
+    return applied
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description='Миграции схемы БД')
+    parser.add_argument('--list', action='store_true', help='показать миграции и не применять')
+    args = parser.parse_args()
+
+    configure_logging(debug=settings.debug, log_level=settings.log_level)
+    try:
+        if args.list:
+            async with engine.begin() as conn:
+                done = await _applied_versions(conn)
+            for migration in MIGRATIONS:
+                mark = '+' if migration.version in done else ' '
+                print(f'[{mark}] {migration.version:>3} {migration.description}')
+        else:
+            await run_migrations(engine)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
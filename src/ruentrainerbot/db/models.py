@@ -1,4 +1,5 @@
 import sqlalchemy as sq
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import declarative_base, relationship
 from sqlalchemy.sql import func
 
@@ -14,6 +15,8 @@ class Dictionary(Base):
     updated_at = sq.Column(sq.DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     user_words = relationship('UserWords', back_populates='word', cascade='all, delete-orphan')
 
+    # триграммный GIN индекс ix_words_en_trgm для поиска по en ILIKE
+    # создает миграция: ему нужно расширение pg_trgm
     __table_args__ = (
         sq.UniqueConstraint('ru', name='uq_words_ru'),
         sq.UniqueConstraint('en', name='uq_words_en')
@@ -49,9 +52,153 @@ class UserWords(Base):
     )
     added_at = sq.Column(sq.DateTime(timezone=True), server_default=func.now(), nullable=False)
     is_active = sq.Column(sq.Boolean, nullable=False, server_default=sq.true())
+    # состояние интервального повторения (SM-2)
+    repetitions = sq.Column(sq.SmallInteger, nullable=False, server_default='0')
+    interval_days = sq.Column(sq.Integer, nullable=False, server_default='0')
+    ease = sq.Column(sq.Float, nullable=False, server_default='2.5')
+    due_at = sq.Column(sq.DateTime(timezone=True), server_default=func.now(), nullable=False)
     user = relationship('Users', back_populates='words')
     word = relationship('Dictionary', back_populates='user_words')
 
+    __table_args__ = (
+        sq.Index(
+            'ix_user_words_user_due',
+            'user_id', 'due_at',
+            postgresql_where=sq.text('is_active'),
+        ),
+        # активные слова пользователя читаются только из индекса
+        sq.Index(
+            'ix_user_words_user_active',
+            'user_id',
+            postgresql_include=['word_id'],
+            postgresql_where=sq.text('is_active'),
+        ),
+        # каскадное удаление слова из words
+        sq.Index('ix_user_words_word', 'word_id'),
+    )
+
     def __str__(self):
         return f'Пользователь {self.user_id} | Слово {self.word_id}'
 
+
+class WordDistractors(Base):
+    __tablename__ = 'word_distractors'
+    word_id = sq.Column(
+        sq.Integer,
+        sq.ForeignKey('words.id', ondelete='CASCADE'),
+        primary_key=True,
+        nullable=False,
+    )
+    rank = sq.Column(sq.SmallInteger, primary_key=True, nullable=False)
+    distractor_id = sq.Column(
+        sq.Integer,
+        sq.ForeignKey('words.id', ondelete='CASCADE'),
+        nullable=False,
+    )
+    score = sq.Column(sq.Float, nullable=False)
+    computed_at = sq.Column(sq.DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        # поиск слов по соседу и каскадное удаление соседа
+        sq.Index('ix_word_distractors_distractor', 'distractor_id'),
+    )
+
+    def __str__(self):
+        return f'Слово {self.word_id} | #{self.rank} {self.distractor_id} ({self.score:.3f})'
+
+
+class FSMStates(Base):
+    __tablename__ = 'fsm_states'
+    bot_id = sq.Column(sq.BigInteger, primary_key=True, nullable=False)
+    chat_id = sq.Column(sq.BigInteger, primary_key=True, nullable=False)
+    user_id = sq.Column(sq.BigInteger, primary_key=True, nullable=False)
+    thread_id = sq.Column(sq.BigInteger, primary_key=True, nullable=False, server_default='0')
+    business_connection_id = sq.Column(sq.String(length=64), primary_key=True, nullable=False, server_default='')
+    destiny = sq.Column(sq.String(length=32), primary_key=True, nullable=False, server_default='default')
+    state = sq.Column(sq.String(length=100))
+    data = sq.Column(JSONB, nullable=False, server_default='{}')
+    updated_at = sq.Column(sq.DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __str__(self):
+        return f'Чат {self.chat_id} | Пользователь {self.user_id} | {self.state}'
+
+
+class AnswerEvents(Base):
+    # журнал ответов квиза, только на запись; секции по месяцам
+    # answered_at создает AnswerEventsWriter
+    __tablename__ = 'answer_events'
+    id = sq.Column(sq.BigInteger, sq.Identity(), primary_key=True)
+    answered_at = sq.Column(sq.DateTime(timezone=True), primary_key=True, nullable=False)
+    user_id = sq.Column(sq.BigInteger, nullable=False)
+    word_id = sq.Column(sq.Integer, nullable=False)
+    is_correct = sq.Column(sq.Boolean, nullable=False)
+    picked_index = sq.Column(sq.SmallInteger, nullable=False)
+    mode = sq.Column(sq.String(length=16), nullable=False)
+
+    __table_args__ = {'postgresql_partition_by': 'RANGE (answered_at)'}
+
+    def __str__(self):
+        return f'Пользователь {self.user_id} | Слово {self.word_id} | {self.is_correct}'
+
+
+class UserStats(Base):
+    # счетчики ответов пользователя, обновляются пачками вместе с answer_events
+    __tablename__ = 'user_stats'
+    user_id = sq.Column(sq.BigInteger, primary_key=True, autoincrement=False)
+    answers = sq.Column(sq.Integer, nullable=False, server_default='0')
+    correct = sq.Column(sq.Integer, nullable=False, server_default='0')
+    current_streak = sq.Column(sq.Integer, nullable=False, server_default='0')
+    best_streak = sq.Column(sq.Integer, nullable=False, server_default='0')
+    updated_at = sq.Column(sq.DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __str__(self):
+        return f'Пользователь {self.user_id} | {self.correct}/{self.answers}'
+
+
+class WordStats(Base):
+    # счетчики ответов по слову
+    __tablename__ = 'word_stats'
+    word_id = sq.Column(sq.Integer, primary_key=True, autoincrement=False)
+    answers = sq.Column(sq.Integer, nullable=False, server_default='0')
+    correct = sq.Column(sq.Integer, nullable=False, server_default='0')
+
+    def __str__(self):
+        return f'Слово {self.word_id} | {self.correct}/{self.answers}'
+
+
+class LeaderboardScores(Base):
+    # сколько пользователей набрало score верных ответов:
+    # место пользователя - 1 + сумма users по score выше его
+    __tablename__ = 'leaderboard_scores'
+    score = sq.Column(sq.Integer, primary_key=True, autoincrement=False)
+    users = sq.Column(sq.Integer, nullable=False, server_default='0')
+
+    def __str__(self):
+        return f'{self.score} | {self.users}'
+
+
+class ReminderRuns(Base):
+    # ежедневная рассылка напоминаний и ее контрольная точка:
+    # после перезапуска рассылка продолжается с пользователей после last_user_id
+    __tablename__ = 'reminder_runs'
+    run_date = sq.Column(sq.Date, primary_key=True)
+    last_user_id = sq.Column(sq.BigInteger)
+    sent = sq.Column(sq.Integer, nullable=False, server_default='0')
+    blocked = sq.Column(sq.Integer, nullable=False, server_default='0')
+    failed = sq.Column(sq.Integer, nullable=False, server_default='0')
+    started_at = sq.Column(sq.DateTime(timezone=True), server_default=func.now(), nullable=False)
+    finished_at = sq.Column(sq.DateTime(timezone=True))
+
+    def __str__(self):
+        return f'{self.run_date} | после {self.last_user_id} | отправлено {self.sent}'
+
+
+class SchemaMigrations(Base):
+    # примененные миграции схемы, см. db/migrations.py
+    __tablename__ = 'schema_migrations'
+    version = sq.Column(sq.Integer, primary_key=True)
+    description = sq.Column(sq.String(length=200), nullable=False)
+    applied_at = sq.Column(sq.DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __str__(self):
+        return f'{self.version} | {self.description}'
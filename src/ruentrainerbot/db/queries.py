@@ -1,9 +1,27 @@
+import random
 import sqlalchemy as sq
+from typing import AsyncIterator
+from collections import Counter, defaultdict
+from datetime import date, datetime
 from sqlalchemy import select, exists
-from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
-from ruentrainerbot.db.models import Base, Dictionary, Users, UserWords
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+from ruentrainerbot.db.cache import user_words_cache
+from ruentrainerbot.db.models import (Base, Dictionary, Users, UserWords, WordDistractors,
+                                      AnswerEvents, UserStats, WordStats, LeaderboardScores,
+                                      ReminderRuns)
 from sqlalchemy.dialects.postgresql import insert
 
+# SM-2: оценка ответа 0..5, верный ответ в квизе - 5, неверный - 2
+REVIEW_QUALITY_CORRECT = 5
+REVIEW_QUALITY_WRONG = 2
+MIN_EASE = 1.3
+# слово выучено, когда SM-2 отложил его повторение на три недели и больше
+LEARNED_INTERVAL_DAYS = 21
+
+
+def _ease_delta(quality: int) -> float:
+    return 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+
 
 async def create_fill_tables(engine: AsyncEngine) -> None:
     """
@@ -81,12 +99,32 @@ async def get_random_words(session: AsyncSession,
     result = await session.execute(stmt)
     return list(result.scalars().all())
 
+async def get_words_by_ids(session: AsyncSession, word_ids: list[int]) -> list[Dictionary]:
+    """
+    Возвращает слова с указанными id
+    """
+    result = await session.execute(sq.select(Dictionary).where(Dictionary.id.in_(word_ids)))
+    return list(result.scalars().all())
+
 async def get_similar_wrong_words(session: AsyncSession,
                                   correct_word: Dictionary
                                   ) -> list[Dictionary]:
     """
-    Возвращает неправильные варианты перевода
+    Возвращает неправильные варианты перевода.
+    Сначала берет заранее посчитанных соседей слова из word_distractors
+    (чтение по первичному ключу), если их нет - ищет похожие по ILIKE
     """
+    stmt = (
+        sq.select(Dictionary)
+        .join(WordDistractors, WordDistractors.distractor_id == Dictionary.id)
+        .where(WordDistractors.word_id == correct_word.id)
+        .order_by(WordDistractors.rank)
+    )
+    result = await session.execute(stmt)
+    neighbours = list(result.scalars().all())
+    if len(neighbours) >= 3:
+        return random.sample(neighbours, 3)
+
     en = correct_word.en.lower()
     if len(en) >= 3:
         part = en[:3]
@@ -122,6 +160,79 @@ async def get_similar_wrong_words(session: AsyncSession,
         words.extend(list(fallback_result.scalars().all()))
     return words
 
+async def get_distractors_for_words(
+        session: AsyncSession,
+        words: list[Dictionary],
+        count: int = 3,
+) -> dict[int, list[Dictionary]]:
+    """
+    Возвращает по count неправильных вариантов для каждого слова
+    одним запросом к word_distractors.
+    Для слов без посчитанных соседей добирает случайные слова
+    одним дополнительным запросом
+    """
+    word_ids = [w.id for w in words]
+    stmt = (
+        sq.select(WordDistractors.word_id, Dictionary)
+        .join(Dictionary, Dictionary.id == WordDistractors.distractor_id)
+        .where(WordDistractors.word_id.in_(word_ids))
+        .order_by(WordDistractors.word_id, WordDistractors.rank)
+    )
+    result = await session.execute(stmt)
+    neighbours: dict[int, list[Dictionary]] = defaultdict(list)
+    for word_id, distractor in result:
+        neighbours[word_id].append(distractor)
+
+    distractors: dict[int, list[Dictionary]] = {}
+    missing = []
+    for word in words:
+        candidates = neighbours.get(word.id, [])
+        if len(candidates) >= count:
+            distractors[word.id] = random.sample(candidates, count)
+        else:
+            distractors[word.id] = list(candidates)
+            missing.append(word)
+
+    if missing:
+        fallback_stmt = (
+            sq.select(Dictionary)
+            .order_by(sq.func.random())
+            .limit(count * len(missing) + len(words) + count)
+        )
+        fallback_result = await session.execute(fallback_stmt)
+        pool = list(fallback_result.scalars().all())
+        for word in missing:
+            chosen = distractors[word.id]
+            taken = {word.id, *(w.id for w in chosen)}
+            for candidate in pool:
+                if len(chosen) >= count:
+                    break
+                if candidate.id not in taken:
+                    chosen.append(candidate)
+                    taken.add(candidate.id)
+    return distractors
+
+async def get_user_active_word_ids(
+    session: AsyncSession,
+    user_id: int,
+) -> set[int]:
+    """
+    Возвращает множество id активных слов пользователя.
+    Берется из user_words_cache, при промахе загружается из БД
+    """
+    async def load() -> set[int]:
+        stmt = (
+            sq.select(UserWords.word_id)
+            .where(
+                UserWords.user_id == user_id,
+                UserWords.is_active == True,
+            )
+        )
+        result = await session.execute(stmt)
+        return set(result.scalars().all())
+
+    return await user_words_cache.get(user_id, load)
+
 async def add_word_to_user(
         session: AsyncSession,
         user_id: int,
@@ -149,6 +260,109 @@ async def add_word_to_user(
     )
     await session.execute(stmt)
     await session.commit()
+    user_words_cache.add(user_id, word_id)
+
+async def apply_user_words_changes(
+    session: AsyncSession,
+    changes: dict[tuple[int, int], bool],
+    chunk_size: int = 5000,
+) -> None:
+    """
+    Применяет пачку изменений личных словарей {(user_id, word_id): is_active}:
+    - добавления - многострочным upsert в users и user_words;
+    - удаления - одним UPDATE по списку пар.
+    Все изменения фиксируются одним коммитом
+    """
+    adds = [key for key, active in changes.items() if active]
+    removes = [key for key, active in changes.items() if not active]
+
+    for start in range(0, len(adds), chunk_size):
+        chunk = adds[start:start + chunk_size]
+        await session.execute(
+            insert(Users.__table__)
+            .values([{'id': user_id} for user_id in {user_id for user_id, _ in chunk}])
+            .on_conflict_do_nothing(index_elements=['id'])
+        )
+        stmt = insert(UserWords.__table__).values(
+            [{'user_id': user_id, 'word_id': word_id, 'is_active': True} for user_id, word_id in chunk]
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_id', 'word_id'],
+            set_={'is_active': True},
+        )
+        await session.execute(stmt)
+
+    for start in range(0, len(removes), chunk_size):
+        pairs = (
+            sq.values(
+                sq.column('user_id', sq.BigInteger),
+                sq.column('word_id', sq.Integer),
+                name='removed',
+            )
+            .data(removes[start:start + chunk_size])
+        )
+        await session.execute(
+            sq.update(UserWords)
+            .where(
+                UserWords.user_id == pairs.c.user_id,
+                UserWords.word_id == pairs.c.word_id,
+                UserWords.is_active == True,
+            )
+            .values(is_active=False)
+        )
+    await session.commit()
+
+async def apply_user_words_reviews(
+    session: AsyncSession,
+    reviews: list[tuple[int, int, bool]],
+    chunk_size: int = 5000,
+) -> None:
+    """
+    Применяет пачку ответов квиза [(user_id, word_id, is_correct)]
+    к состоянию повторения слов по SM-2 одним UPDATE на пачку:
+    - верный ответ: интервал 1, 6, затем interval * ease дней;
+    - неверный: повторения сбрасываются, интервал 1 день.
+    Пары в пачке должны быть уникальны.
+    Слова не из активного личного словаря пропускаются
+    """
+    for start in range(0, len(reviews), chunk_size):
+        answers = (
+            sq.values(
+                sq.column('user_id', sq.BigInteger),
+                sq.column('word_id', sq.Integer),
+                sq.column('is_correct', sq.Boolean),
+                name='answers',
+            )
+            .data(reviews[start:start + chunk_size])
+        )
+        is_correct = answers.c.is_correct
+        interval = sq.case(
+            (sq.not_(is_correct), 1),
+            (UserWords.repetitions == 0, 1),
+            (UserWords.repetitions == 1, 6),
+            else_=sq.cast(sq.func.ceil(UserWords.interval_days * UserWords.ease), sq.Integer),
+        )
+        await session.execute(
+            sq.update(UserWords)
+            .where(
+                UserWords.user_id == answers.c.user_id,
+                UserWords.word_id == answers.c.word_id,
+                UserWords.is_active == True,
+            )
+            .values(
+                repetitions=sq.case((is_correct, UserWords.repetitions + 1), else_=0),
+                interval_days=interval,
+                ease=sq.func.greatest(
+                    MIN_EASE,
+                    UserWords.ease + sq.case(
+                        (is_correct, _ease_delta(REVIEW_QUALITY_CORRECT)),
+                        else_=_ease_delta(REVIEW_QUALITY_WRONG),
+                    ),
+                ),
+                due_at=sq.func.now() + sq.func.make_interval(0, 0, 0, interval),
+            )
+        )
+    await session.commit()
 
 async def remove_word_from_user(
     session: AsyncSession,
@@ -169,6 +383,7 @@ async def remove_word_from_user(
     )
     await session.execute(stmt)
     await session.commit()
+    user_words_cache.discard(user_id, word_id)
 
 async def get_user_active_words(
     session: AsyncSession,
@@ -192,23 +407,438 @@ async def get_user_active_words(
     result = await session.execute(stmt)
     return list(result.scalars().all())
 
+async def get_due_words(
+    session: AsyncSession,
+    user_id: int,
+    limit: int = 10,
+) -> list[Dictionary]:
+    """
+    Возвращает limit слов личного словаря, которые раньше всех
+    пора повторить. Читает по индексу ix_user_words_user_due,
+    поэтому не зависит от размера словаря пользователя
+    """
+    stmt = (
+        sq.select(Dictionary)
+        .join(UserWords, UserWords.word_id == Dictionary.id)
+        .where(
+            UserWords.user_id == user_id,
+            UserWords.is_active == True,
+        )
+        .order_by(UserWords.due_at)
+        .limit(limit)
+    )
+    result = await session.execute(stmt)
+    return list(result.scalars().all())
+
 async def is_word_active_for_user(
     session: AsyncSession,
     user_id: int,
     word_id: int,
 ) -> bool:
     """
-    Проверяет добавлено ли слово в активный личный словарь пользователя
+    Проверяет добавлено ли слово в активный личный словарь пользователя.
+    Отвечает из user_words_cache
+    """
+    return word_id in await get_user_active_word_ids(session, user_id=user_id)
+
+async def get_all_words_en(session: AsyncSession) -> list[tuple[int, str]]:
+    """
+    Возвращает пары (id, en) всех слов словаря, отсортированные по id
     """
+    stmt = sq.select(Dictionary.id, Dictionary.en).order_by(Dictionary.id)
+    result = await session.execute(stmt)
+    return [(row.id, row.en) for row in result]
+
+async def get_stale_distractor_word_ids(
+    session: AsyncSession,
+    expected: int,
+) -> list[int]:
+    """
+    Возвращает id слов, для которых соседей нужно пересчитать:
+    соседей нет, их меньше expected или слово изменилось
+    после последнего расчета
+    """
+    computed = (
+        sq.select(
+            WordDistractors.word_id,
+            sq.func.min(WordDistractors.computed_at).label('computed_at'),
+            sq.func.count().label('n'),
+        )
+        .group_by(WordDistractors.word_id)
+        .subquery()
+    )
     stmt = (
-        sq.select(UserWords.word_id)
+        sq.select(Dictionary.id)
+        .outerjoin(computed, computed.c.word_id == Dictionary.id)
+        .where(
+            sq.or_(
+                computed.c.word_id.is_(None),
+                computed.c.n < expected,
+                sq.func.coalesce(Dictionary.updated_at, Dictionary.created_at) > computed.c.computed_at,
+            )
+        )
+        .order_by(Dictionary.id)
+    )
+    result = await session.execute(stmt)
+    return list(result.scalars().all())
+
+async def get_distractor_score_floors(session: AsyncSession) -> dict[int, float]:
+    """
+    Возвращает для каждого слова оценку его самого слабого соседа
+    """
+    stmt = (
+        sq.select(WordDistractors.word_id, sq.func.min(WordDistractors.score))
+        .group_by(WordDistractors.word_id)
+    )
+    result = await session.execute(stmt)
+    return {word_id: score for word_id, score in result}
+
+async def get_words_referencing_distractors(
+    session: AsyncSession,
+    distractor_ids: list[int],
+) -> list[int]:
+    """
+    Возвращает id слов, у которых среди соседей есть одно из distractor_ids
+    """
+    if not distractor_ids:
+        return []
+    stmt = (
+        sq.select(WordDistractors.word_id)
+        .where(WordDistractors.distractor_id.in_(distractor_ids))
+        .distinct()
+    )
+    result = await session.execute(stmt)
+    return list(result.scalars().all())
+
+async def replace_word_distractors(
+    session: AsyncSession,
+    word_ids: list[int],
+    rows: list[dict],
+    computed_at: datetime,
+) -> None:
+    """
+    Заменяет соседей для слов word_ids на rows
+    """
+    await session.execute(
+        sq.delete(WordDistractors).where(WordDistractors.word_id.in_(word_ids))
+    )
+    if rows:
+        await session.execute(
+            insert(WordDistractors.__table__),
+            [{**row, 'computed_at': computed_at} for row in rows],
+        )
+    await session.commit()
+
+async def create_answer_events_partition(conn: AsyncConnection, month: date) -> None:
+    """
+    Создает секцию answer_events за месяц month, если ее еще нет
+    """
+    start = month.replace(day=1)
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    table = AnswerEvents.__tablename__
+    await conn.execute(sq.text(
+        f"CREATE TABLE IF NOT EXISTS {table}_{start:%Y_%m} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{start.isoformat()} 00:00+00') TO ('{end.isoformat()} 00:00+00')"
+    ))
+
+async def insert_answer_events(conn: AsyncConnection, rows: list[dict]) -> None:
+    """
+    Вставляет пачку событий ответов
+    """
+    await conn.execute(sq.insert(AnswerEvents.__table__), rows)
+
+def _streaks(answers: list[bool]) -> tuple[int, int, int]:
+    """
+    Серии верных ответов в пачке: в начале, в конце и самая длинная
+    """
+    head = next((i for i, ok in enumerate(answers) if not ok), len(answers))
+    tail = next((i for i, ok in enumerate(reversed(answers)) if not ok), len(answers))
+    best = run = 0
+    for ok in answers:
+        run = run + 1 if ok else 0
+        best = max(best, run)
+    return head, tail, best
+
+async def apply_answer_stats(conn: AsyncConnection,
+                             rows: list[dict],
+                             chunk_size: int = 2000
+                             ) -> None:
+    """
+    Прибавляет пачку событий ответов (в порядке ответов) к счетчикам
+    user_stats, word_stats и leaderboard_scores. История ответов не читается:
+    - серии считаются по старой текущей серии и сериям внутри пачки;
+    - в leaderboard_scores пользователь переносится со старого
+      числа верных ответов на новое
+    """
+    per_user: dict[int, list[bool]] = defaultdict(list)
+    per_word: dict[int, list[int]] = defaultdict(lambda: [0, 0])
+    for row in rows:
+        per_user[row['user_id']].append(row['is_correct'])
+        counts = per_word[row['word_id']]
+        counts[0] += 1
+        counts[1] += row['is_correct']
+
+    user_ids = sorted(per_user)
+    scores: Counter[int] = Counter()
+    for start in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[start:start + chunk_size]
+        result = await conn.execute(
+            insert(UserStats.__table__)
+            .values([{'user_id': user_id} for user_id in chunk])
+            .on_conflict_do_nothing(index_elements=['user_id'])
+            .returning(UserStats.user_id)
+        )
+        new_users = set(result.scalars().all())
+
+        deltas = []
+        for user_id in chunk:
+            answers = per_user[user_id]
+            head, tail, best = _streaks(answers)
+            deltas.append((user_id, len(answers), sum(answers), head, tail, best))
+        batch = (
+            sq.values(
+                sq.column('user_id', sq.BigInteger),
+                sq.column('answers', sq.Integer),
+                sq.column('correct', sq.Integer),
+                sq.column('head', sq.Integer),
+                sq.column('tail', sq.Integer),
+                sq.column('best', sq.Integer),
+                name='batch',
+            )
+            .data(deltas)
+        )
+        result = await conn.execute(
+            sq.update(UserStats)
+            .where(UserStats.user_id == batch.c.user_id)
+            .values(
+                answers=UserStats.answers + batch.c.answers,
+                correct=UserStats.correct + batch.c.correct,
+                current_streak=sq.case(
+                    (batch.c.head == batch.c.answers, UserStats.current_streak + batch.c.answers),
+                    else_=batch.c.tail,
+                ),
+                best_streak=sq.func.greatest(
+                    UserStats.best_streak,
+                    batch.c.best,
+                    UserStats.current_streak + batch.c.head,
+                ),
+            )
+            .returning(UserStats.user_id, UserStats.correct, batch.c.correct)
+        )
+        for user_id, correct, delta in result:
+            if user_id in new_users:
+                scores[correct] += 1
+            elif delta:
+                scores[correct - delta] -= 1
+                scores[correct] += 1
+
+    changes = sorted((score, n) for score, n in scores.items() if n)
+    if changes:
+        stmt = insert(LeaderboardScores.__table__).values(
+            [{'score': score, 'users': n} for score, n in changes]
+        )
+        await conn.execute(stmt.on_conflict_do_update(
+            index_elements=['score'],
+            set_={'users': LeaderboardScores.users + stmt.excluded.users},
+        ))
+
+    word_ids = sorted(per_word)
+    for start in range(0, len(word_ids), chunk_size):
+        stmt = insert(WordStats.__table__).values([
+            {'word_id': word_id, 'answers': per_word[word_id][0], 'correct': per_word[word_id][1]}
+            for word_id in word_ids[start:start + chunk_size]
+        ])
+        await conn.execute(stmt.on_conflict_do_update(
+            index_elements=['word_id'],
+            set_={
+                'answers': WordStats.answers + stmt.excluded.answers,
+                'correct': WordStats.correct + stmt.excluded.correct,
+            },
+        ))
+
+async def delete_user_stats(conn: AsyncConnection, condition) -> None:
+    """
+    Удаляет счетчики пользователей по условию на UserStats
+    и убирает их из leaderboard_scores
+    """
+    result = await conn.execute(
+        sq.delete(UserStats).where(condition).returning(UserStats.correct)
+    )
+    removed = Counter(result.scalars().all())
+    for score, n in sorted(removed.items()):
+        await conn.execute(
+            sq.update(LeaderboardScores)
+            .where(LeaderboardScores.score == score)
+            .values(users=LeaderboardScores.users - n)
+        )
+
+async def get_user_stats(session: AsyncSession, user_id: int) -> UserStats | None:
+    """
+    Возвращает счетчики ответов пользователя
+    """
+    return await session.get(UserStats, user_id)
+
+async def get_leaderboard_position(session: AsyncSession, score: int) -> tuple[int, int]:
+    """
+    Возвращает место пользователя с score верными ответами
+    и число пользователей в рейтинге. Читает leaderboard_scores,
+    где по строке на значение score, а не на пользователя
+    """
+    stmt = sq.select(
+        sq.func.coalesce(sq.func.sum(LeaderboardScores.users).filter(LeaderboardScores.score > score), 0),
+        sq.func.coalesce(sq.func.sum(LeaderboardScores.users), 0),
+    )
+    above, total = (await session.execute(stmt)).one()
+    return int(above) + 1, int(total)
+
+async def count_learned_words(session: AsyncSession, user_id: int) -> int:
+    """
+    Возвращает число выученных слов личного словаря:
+    активных, с интервалом повторения от LEARNED_INTERVAL_DAYS дней
+    """
+    stmt = (
+        sq.select(sq.func.count())
+        .select_from(UserWords)
+        .where(
+            UserWords.user_id == user_id,
+            UserWords.is_active == True,
+            UserWords.interval_days >= LEARNED_INTERVAL_DAYS,
+        )
+    )
+    return (await session.execute(stmt)).scalar_one()
+
+async def get_reminder_recipients(conn: AsyncConnection,
+                                  after_user_id: int | None,
+                                  limit: int
+                                  ) -> list[int]:
+    """
+    Возвращает id пользователей с активными словами по возрастанию id,
+    начиная после after_user_id, не больше limit
+    """
+    stmt = (
+        sq.select(Users.id)
+        .where(
+            exists().where(UserWords.user_id == Users.id, UserWords.is_active == True),
+        )
+        .order_by(Users.id)
+        .limit(limit)
+    )
+    if after_user_id is not None:
+        stmt = stmt.where(Users.id > after_user_id)
+    result = await conn.execute(stmt)
+    return list(result.scalars())
+
+# первый ключ advisory lock рассылки, второй - день рассылки
+REMINDER_LOCK_KEY = 0x52454d44
+
+async def try_lock_reminder_run(conn: AsyncConnection, run_date: date) -> bool:
+    """
+    Берет advisory lock рассылки за run_date на соединении conn.
+    False - рассылку ведет другой процесс. Lock держится до
+    unlock_reminder_run или закрытия соединения, commit его не снимает
+    """
+    result = await conn.execute(
+        sq.select(sq.func.pg_try_advisory_lock(REMINDER_LOCK_KEY, run_date.toordinal()))
+    )
+    return bool(result.scalar_one())
+
+async def unlock_reminder_run(conn: AsyncConnection, run_date: date) -> None:
+    await conn.execute(sq.select(sq.func.pg_advisory_unlock(REMINDER_LOCK_KEY, run_date.toordinal())))
+
+async def get_or_create_reminder_run(conn: AsyncConnection, run_date: date) -> sq.Row:
+    """
+    Возвращает рассылку за run_date, создавая ее при первом запуске
+    """
+    await conn.execute(
+        insert(ReminderRuns.__table__)
+        .values(run_date=run_date)
+        .on_conflict_do_nothing(index_elements=['run_date'])
+    )
+    result = await conn.execute(sq.select(ReminderRuns).where(ReminderRuns.run_date == run_date))
+    return result.one()
+
+async def save_reminder_checkpoint(conn: AsyncConnection,
+                                   run_date: date,
+                                   last_user_id: int | None,
+                                   sent: int,
+                                   blocked: int,
+                                   failed: int,
+                                   finished: bool = False
+                                   ) -> None:
+    """
+    Записывает прогресс рассылки: всем до last_user_id включительно
+    напоминание уже отправлено, счетчики прибавляются
+    """
+    await conn.execute(
+        sq.update(ReminderRuns)
+        .where(ReminderRuns.run_date == run_date)
+        .values(
+            last_user_id=last_user_id,
+            sent=ReminderRuns.sent + sent,
+            blocked=ReminderRuns.blocked + blocked,
+            failed=ReminderRuns.failed + failed,
+            finished_at=sq.func.now() if finished else None,
+        )
+    )
+
+async def stream_user_words(conn: AsyncConnection,
+                            user_id: int,
+                            chunk_size: int = 1000
+                            ) -> AsyncIterator[list[sq.Row]]:
+    """
+    Отдает активные слова личного словаря (en, ru, added_at, due_at)
+    в порядке добавления пачками по chunk_size.
+    Строки читаются серверным курсором, в памяти только одна пачка
+    """
+    stmt = (
+        sq.select(Dictionary.en, Dictionary.ru, UserWords.added_at, UserWords.due_at)
+        .join(UserWords, UserWords.word_id == Dictionary.id)
         .where(
             UserWords.user_id == user_id,
-            UserWords.word_id == word_id,
             UserWords.is_active == True,
         )
-        .limit(1)
+        .order_by(UserWords.added_at, UserWords.word_id)
+        .execution_options(yield_per=chunk_size)
+    )
+    result = await conn.stream(stmt)
+    async for partition in result.partitions(chunk_size):
+        yield list(partition)
+
+async def find_words(conn: AsyncConnection,
+                     ens: set[str],
+                     rus: set[str]
+                     ) -> list[sq.Row]:
+    """
+    Ищет слова словаря (id, en, ru) по английским ens
+    или русским rus написаниям одним запросом
+    """
+    if not ens and not rus:
+        return []
+    stmt = sq.select(Dictionary.id, Dictionary.en, Dictionary.ru).where(
+        sq.or_(Dictionary.en.in_(ens), Dictionary.ru.in_(rus))
     )
-    res = await session.execute(stmt)
-    return res.scalar_one_or_none() is not None
+    return list((await conn.execute(stmt)).all())
 
+async def add_words_to_user(conn: AsyncConnection, user_id: int, word_ids: list[int]) -> int:
+    """
+    Добавляет слова в личный словарь пользователя одним upsert:
+    новые записи создаются, выключенные включаются обратно,
+    состояние повторения существующих не меняется.
+    Возвращает число новых и включенных обратно слов
+    """
+    if not word_ids:
+        return 0
+    await conn.execute(
+        insert(Users.__table__)
+        .values(id=user_id)
+        .on_conflict_do_nothing(index_elements=['id'])
+    )
+    stmt = insert(UserWords.__table__).values(
+        [{'user_id': user_id, 'word_id': word_id, 'is_active': True} for word_id in word_ids]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id', 'word_id'],
+        set_={'is_active': True},
+        where=UserWords.__table__.c.is_active == False,
+    ).returning(UserWords.__table__.c.word_id)
+    return len((await conn.execute(stmt)).all())
@@ -1,11 +1,220 @@
+import asyncio
+import contextlib
+import itertools
+import time
 from typing import AsyncGenerator
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+import sqlalchemy as sq
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from ruentrainerbot.core.config import settings
+from ruentrainerbot.core.logging import get_logger
+from ruentrainerbot.core.metrics import registry
+from ruentrainerbot.core.query_stats import current_query_stats
 
-engine = create_async_engine(
-    settings.dsn,
-    future=True
+logger = get_logger(__name__)
+
+pool_checkout_wait = registry.histogram(
+    'db_pool_checkout_wait_seconds',
+    'Время ожидания соединения из пула',
+    labelnames=('engine',),
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+pool_in_use = registry.gauge(
+    'db_pool_connections_in_use',
+    'Соединения, выданные из пула',
+    labelnames=('engine',),
+)
+query_duration = registry.histogram(
+    'db_query_duration_seconds',
+    'Время выполнения SQL запросов',
+    labelnames=('engine',),
+)
+replica_healthy = registry.gauge(
+    'db_replica_healthy',
+    '1, если реплика доступна и отстает не больше DB_REPLICA_MAX_LAG',
+    labelnames=('engine',),
+)
+read_fallbacks = registry.counter(
+    'db_read_fallback_total',
+    'Чтения, отправленные на primary, потому что нет здоровых реплик',
+)
+
+# отставание реплики в секундах; на primary - 0.
+# Реплика, которая применила весь полученный WAL, не отстает: время с последней
+# примененной транзакции на простаивающем primary растет без новых записей.
+# Иначе (или без потоковой репликации) отставание - время с последней транзакции
+REPLICA_LAG_SQL = sq.text(
+    'SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 '
+    'WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+    'ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0) END'
+)
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений, который замеряет время ожидания соединения
+    и количество выданных соединений
+    """
+    metrics_name = 'primary'
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_checkout_wait.observe(time.perf_counter() - started, engine=self.metrics_name)
+
+
+def _connect_args(dsn: str) -> dict:
+    """
+    Настройки кеша подготовленных выражений для драйвера из DSN
+    """
+    driver = make_url(dsn).get_driver_name()
+    if driver == 'asyncpg':
+        return {'prepared_statement_cache_size': settings.db_statement_cache_size}
+    if driver == 'psycopg':
+        return {'prepare_threshold': 5 if settings.db_statement_cache_size else None}
+    return {}
+
+
+def create_engine(dsn: str, name: str = 'primary') -> AsyncEngine:
+    """
+    Создает async engine с настройками пула из Settings
+    и метриками пула под именем name.
+    Каждый запрос засчитывается в QueryStats текущего апдейта,
+    запросы дольше DB_SLOW_QUERY_MS пишутся в лог slow_query
+    """
+    class Pool(InstrumentedQueuePool):
+        metrics_name = name
+
+    new_engine = create_async_engine(
+        dsn,
+        future=True,
+        poolclass=Pool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        connect_args=_connect_args(dsn),
+    )
+
+    @event.listens_for(new_engine.sync_engine, 'connect')
+    def _on_connect(dbapi_connection, connection_record):
+        if new_engine.dialect.driver == 'psycopg' and settings.db_statement_cache_size:
+            dbapi_connection.driver_connection.prepared_max = settings.db_statement_cache_size
+
+    @event.listens_for(new_engine.sync_engine, 'checkout')
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        pool_in_use.inc(engine=name)
+
+    @event.listens_for(new_engine.sync_engine, 'checkin')
+    def _on_checkin(dbapi_connection, connection_record):
+        pool_in_use.dec(engine=name)
+
+    @event.listens_for(new_engine.sync_engine, 'before_cursor_execute')
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    @event.listens_for(new_engine.sync_engine, 'after_cursor_execute')
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - context._query_started
+        query_duration.observe(duration, engine=name)
+        stats = current_query_stats()
+        if stats is not None:
+            stats.add(duration)
+        if duration * 1000 >= settings.db_slow_query_ms:
+            logger.warning(
+                'slow_query',
+                engine=name,
+                duration_ms=round(duration * 1000, 2),
+                statement=' '.join(statement.split())[:500],
+                executemany=executemany,
+            )
+
+    return new_engine
+
+
+engine = create_engine(settings.dsn)
+
+
+class ReplicaRouter:
+    """
+    Выбирает engine для запросов только на чтение:
+    здоровые реплики по кругу, а если здоровых нет - primary.
+    Фоновая проверка раз в interval секунд выполняет на каждой реплике
+    запрос отставания и исключает недоступные и отстающие больше max_lag.
+    До первой проверки все реплики считаются здоровыми
+    """
+    def __init__(self, primary: AsyncEngine, replicas: list[AsyncEngine], max_lag: float) -> None:
+        self.primary = primary
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self._healthy = list(replicas)
+        self._turn = itertools.count()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def healthy(self) -> list[AsyncEngine]:
+        return list(self._healthy)
+
+    def read_engine(self) -> AsyncEngine:
+        healthy = self._healthy
+        if not healthy:
+            if self.replicas:
+                read_fallbacks.inc()
+            return self.primary
+        return healthy[next(self._turn) % len(healthy)]
+
+    async def _lag(self, replica: AsyncEngine, timeout: float) -> float | None:
+        try:
+            async with asyncio.timeout(timeout):
+                async with replica.connect() as conn:
+                    return float((await conn.execute(REPLICA_LAG_SQL)).scalar())
+        except Exception as e:
+            logger.debug('replica_check_failed', engine=replica.pool.metrics_name, error=repr(e))
+            return None
+
+    async def check(self, timeout: float = 2.0) -> None:
+        """
+        Проверяет реплики и обновляет список здоровых
+        """
+        lags = await asyncio.gather(*(self._lag(replica, timeout) for replica in self.replicas))
+        healthy = []
+        for replica, lag in zip(self.replicas, lags):
+            name = replica.pool.metrics_name
+            ok = lag is not None and lag <= self.max_lag
+            if ok:
+                healthy.append(replica)
+            if ok != (replica in self._healthy):
+                logger.warning('replica_up' if ok else 'replica_down', engine=name, lag=lag)
+            replica_healthy.set(int(ok), engine=name)
+        self._healthy = healthy
+
+    async def _check_loop(self, interval: float) -> None:
+        while True:
+            await self.check()
+            await asyncio.sleep(interval)
+
+    def start(self, interval: float) -> None:
+        if self.replicas and self._task is None:
+            self._task = asyncio.create_task(self._check_loop(interval))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+
+replica_router = ReplicaRouter(
+    engine,
+    [create_engine(dsn, name=f'replica{i}') for i, dsn in enumerate(settings.db_replica_dsns, start=1)],
+    max_lag=settings.db_replica_max_lag,
 )
 
 AsyncSessionLocal = sessionmaker(
@@ -14,6 +223,14 @@ AsyncSessionLocal = sessionmaker(
     expire_on_commit=False,
 )
 
+def read_session() -> AsyncSession:
+    """
+    Сессия для запросов только на чтение, которым не нужны
+    только что записанные данные: на реплике или на primary.
+    Записи и чтение сразу после записи - через AsyncSessionLocal
+    """
+    return AsyncSessionLocal(bind=replica_router.read_engine())
+
 async def get_session() -> AsyncGenerator:
     async with AsyncSessionLocal() as session:
         yield session
\ No newline at end of file
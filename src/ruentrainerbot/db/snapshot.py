@@ -0,0 +1,158 @@
+import asyncio
+import contextlib
+import random
+import time
+from array import array
+from bisect import bisect_left
+import sqlalchemy as sq
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from ruentrainerbot.core.logging import get_logger
+from ruentrainerbot.db.models import Dictionary
+
+logger = get_logger(__name__)
+
+LOAD_CHUNK = 10_000
+
+
+class DictionarySnapshot:
+    """
+    Снимок словаря в памяти процесса для выбора случайных слов без запросов к БД.
+    Вместо ORM объектов слова лежат в компактных массивах:
+    - id: array('i') - 4 байта на слово;
+    - ru и en: по одной строке байт UTF-8 и массиву смещений array('I') - 4 байта на слово.
+    Итого 12 байт на слово плюс сами строки: около 30 МБ на миллион слов
+    при средней длине русского слова 6 символов и английского 6-7
+    """
+    def __init__(self) -> None:
+        self._ids = array('i')
+        self._ru = b''
+        self._ru_offsets = array('I', [0])
+        self._en = b''
+        self._en_offsets = array('I', [0])
+        self._version: tuple | None = None
+        self._task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @property
+    def loaded(self) -> bool:
+        return self._version is not None and len(self._ids) > 0
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Размер данных снимка в байтах
+        """
+        return (
+            self._ids.itemsize * len(self._ids)
+            + len(self._ru) + self._ru_offsets.itemsize * len(self._ru_offsets)
+            + len(self._en) + self._en_offsets.itemsize * len(self._en_offsets)
+        )
+
+    def _word(self, i: int) -> Dictionary:
+        ru_from, ru_to = self._ru_offsets[i], self._ru_offsets[i + 1]
+        en_from, en_to = self._en_offsets[i], self._en_offsets[i + 1]
+        return Dictionary(
+            id=self._ids[i],
+            ru=self._ru[ru_from:ru_to].decode(),
+            en=self._en[en_from:en_to].decode(),
+        )
+
+    def get(self, word_id: int) -> Dictionary | None:
+        """
+        Возвращает слово по id или None, если его нет в снимке.
+        id в снимке отсортированы, поиск - бинарный
+        """
+        i = bisect_left(self._ids, word_id)
+        if i < len(self._ids) and self._ids[i] == word_id:
+            return self._word(i)
+        return None
+
+    def sample(self, limit: int = 10) -> list[Dictionary]:
+        """
+        Возвращает limit случайных слов без повторов за O(limit)
+        """
+        picked = random.sample(range(len(self._ids)), min(limit, len(self._ids)))
+        return [self._word(i) for i in picked]
+
+    @staticmethod
+    async def _fetch_version(conn: AsyncConnection) -> tuple:
+        result = await conn.execute(
+            sq.select(sq.func.max(Dictionary.updated_at), sq.func.count(Dictionary.id))
+        )
+        return tuple(result.one())
+
+    async def load(self, engine: AsyncEngine) -> None:
+        """
+        Загружает словарь целиком, читая его потоком по LOAD_CHUNK строк
+        """
+        started = time.perf_counter()
+        ids = array('i')
+        ru = bytearray()
+        ru_offsets = array('I', [0])
+        en = bytearray()
+        en_offsets = array('I', [0])
+
+        async with engine.connect() as conn:
+            version = await self._fetch_version(conn)
+            result = await conn.stream(
+                sq.select(Dictionary.id, Dictionary.ru, Dictionary.en)
+                .order_by(Dictionary.id)
+                .execution_options(yield_per=LOAD_CHUNK)
+            )
+            async for word_id, word_ru, word_en in result:
+                ids.append(word_id)
+                ru += word_ru.encode()
+                ru_offsets.append(len(ru))
+                en += word_en.encode()
+                en_offsets.append(len(en))
+
+        self._ids, self._ru, self._ru_offsets = ids, bytes(ru), ru_offsets
+        self._en, self._en_offsets = bytes(en), en_offsets
+        self._version = version
+
+        logger.info(
+            'dictionary_snapshot_loaded',
+            words=len(ids),
+            bytes=self.nbytes,
+            bytes_per_million_words=self.nbytes * 1_000_000 // len(ids) if ids else 0,
+            elapsed=round(time.perf_counter() - started, 3),
+        )
+
+    async def refresh(self, engine: AsyncEngine) -> bool:
+        """
+        Перезагружает снимок, если в словаре изменился
+        max(updated_at) или количество слов
+        """
+        async with engine.connect() as conn:
+            version = await self._fetch_version(conn)
+        if version == self._version:
+            return False
+        await self.load(engine)
+        return True
+
+    async def _refresh_loop(self, engine: AsyncEngine, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh(engine)
+            except Exception:
+                logger.exception('dictionary_snapshot_refresh_failed')
+
+    def start_refresh(self, engine: AsyncEngine, interval: float) -> None:
+        """
+        Запускает фоновую проверку изменений словаря раз в interval секунд
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop(engine, interval))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+
+dictionary_snapshot = DictionarySnapshot()
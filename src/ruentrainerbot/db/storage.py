@@ -0,0 +1,124 @@
+import copy
+from collections import OrderedDict
+from typing import Any, Mapping
+import sqlalchemy as sq
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+from ruentrainerbot.db.models import FSMStates
+
+_table = FSMStates.__table__
+_KEY_COLUMNS = ['bot_id', 'chat_id', 'user_id', 'thread_id', 'business_connection_id', 'destiny']
+
+
+def _key_values(key: StorageKey) -> dict[str, Any]:
+    return {
+        'bot_id': key.bot_id,
+        'chat_id': key.chat_id,
+        'user_id': key.user_id,
+        'thread_id': key.thread_id or 0,
+        'business_connection_id': key.business_connection_id or '',
+        'destiny': key.destiny,
+    }
+
+
+def _key_clause(key: StorageKey) -> sq.ColumnElement[bool]:
+    return sq.and_(*(_table.c[name] == value for name, value in _key_values(key).items()))
+
+
+class PostgresStorage(BaseStorage):
+    """
+    FSM хранилище в таблице fsm_states на общем async engine.
+    Данные хранятся в JSONB, поэтому в состояние можно класть только
+    JSON-совместимые значения: id слов, индексы, строки, а не ORM объекты.
+    - состояние и данные читаются одним SELECT и запоминаются в процессе
+      (LRU на cache_size ключей): get_state в FSM middleware, проверка
+      состояния и get_data в обработчике не ходят в БД повторно;
+    - запись идет в БД сразу (set_state, set_data, update_data - по одному
+      upsert), кеш обновляется строкой из RETURNING.
+    Кеш верен, пока ключ обслуживает один процесс: так и есть в обычном
+    режиме и с воркерами, куда апдейты чата всегда приходят в один процесс.
+    После перезапуска состояние читается из БД
+    """
+    def __init__(self, engine: AsyncEngine, cache_size: int = 10_000) -> None:
+        self.engine = engine
+        self.cache_size = cache_size
+        self._rows: OrderedDict[StorageKey, tuple[str | None, dict[str, Any]]] = OrderedDict()
+
+    def _remember(self, key: StorageKey, state: str | None, data: dict[str, Any] | None) -> None:
+        if not self.cache_size:
+            return
+        self._rows[key] = (state, data or {})
+        self._rows.move_to_end(key)
+        if len(self._rows) > self.cache_size:
+            self._rows.popitem(last=False)
+
+    async def _row(self, key: StorageKey) -> tuple[str | None, dict[str, Any]]:
+        row = self._rows.get(key)
+        if row is not None:
+            self._rows.move_to_end(key)
+            return row
+        async with self.engine.connect() as conn:
+            result = await conn.execute(sq.select(_table.c.state, _table.c.data).where(_key_clause(key)))
+            found = result.one_or_none()
+        state, data = (found.state, found.data) if found is not None else (None, {})
+        self._remember(key, state, data)
+        return state, data or {}
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        value = state.state if isinstance(state, State) else state
+        stmt = insert(_table).values(**_key_values(key), state=value)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=_KEY_COLUMNS,
+            set_={'state': stmt.excluded.state, 'updated_at': sq.func.now()},
+        ).returning(_table.c.state, _table.c.data)
+        async with self.engine.begin() as conn:
+            row = (await conn.execute(stmt)).one()
+        self._remember(key, row.state, row.data)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        return (await self._row(key))[0]
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            msg = f'Data must be a dict or dict-like object, got {type(data).__name__}'
+            raise DataNotDictLikeError(msg)
+        async with self.engine.begin() as conn:
+            if not data:
+                # state.clear(): пустая запись без состояния не нужна
+                result = await conn.execute(
+                    sq.delete(_table).where(_key_clause(key), _table.c.state.is_(None))
+                )
+                if result.rowcount:
+                    self._remember(key, None, {})
+                    return
+            stmt = insert(_table).values(**_key_values(key), data=data)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=_KEY_COLUMNS,
+                set_={'data': stmt.excluded.data, 'updated_at': sq.func.now()},
+            ).returning(_table.c.state, _table.c.data)
+            row = (await conn.execute(stmt)).one()
+        self._remember(key, row.state, row.data)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        # копия: изменения словаря вызывающим не должны попасть в кеш
+        return copy.deepcopy((await self._row(key))[1])
+
+    async def update_data(self, key: StorageKey, data: Mapping[str, Any]) -> dict[str, Any]:
+        stmt = insert(_table).values(**_key_values(key), data=dict(data))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=_KEY_COLUMNS,
+            set_={
+                'data': _table.c.data.op('||')(stmt.excluded.data),
+                'updated_at': sq.func.now(),
+            },
+        ).returning(_table.c.state, _table.c.data)
+        async with self.engine.begin() as conn:
+            row = (await conn.execute(stmt)).one()
+        self._remember(key, row.state, row.data)
+        return copy.deepcopy(row.data)
+
+    async def close(self) -> None:
+        self._rows.clear()
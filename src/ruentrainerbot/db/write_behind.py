@@ -0,0 +1,155 @@
+import asyncio
+import contextlib
+import time
+from collections import OrderedDict
+from typing import Iterable
+from ruentrainerbot.core.config import settings
+from ruentrainerbot.core.logging import get_logger
+from ruentrainerbot.db.cache import user_words_cache
+from ruentrainerbot.db.queries import apply_user_words_changes, apply_user_words_reviews
+from ruentrainerbot.db.session import AsyncSessionLocal
+
+logger = get_logger(__name__)
+
+
+class UserWordsWriter:
+    """
+    Отложенная запись добавлений и удалений слов личного словаря
+    и ответов квиза для интервального повторения.
+    Повторные нажатия по одному слову схлопываются до последнего значения,
+    ответы по одному слову применяются по порядку,
+    накопленное сбрасывается в БД одной транзакцией, когда набирается
+    max_pending изменений или проходит flush_interval секунд.
+    user_words_cache обновляется сразу, поэтому кнопки отражают новое
+    состояние до записи в БД.
+    Запоминает, когда слова пользователя последний раз записаны в БД:
+    recent_window секунд после записи реплика может их еще не видеть,
+    и чтения словаря этого пользователя идут на primary
+    """
+    def __init__(self, max_pending: int, flush_interval: float, recent_window: float = 0) -> None:
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.recent_window = recent_window
+        self._pending: dict[tuple[int, int], bool] = {}
+        self._reviews: dict[tuple[int, int], list[bool]] = {}
+        self._written: OrderedDict[int, float] = OrderedDict()
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+        self.flushed = 0
+
+    def __len__(self) -> int:
+        return len(self._pending) + len(self._reviews)
+
+    def set(self, user_id: int, word_id: int, is_active: bool) -> None:
+        """
+        Ставит в очередь итоговое состояние слова у пользователя
+        """
+        self._pending[(user_id, word_id)] = is_active
+        if is_active:
+            user_words_cache.add(user_id, word_id)
+        else:
+            user_words_cache.discard(user_id, word_id)
+        if len(self) >= self.max_pending:
+            self._wakeup.set()
+
+    def review(self, user_id: int, word_id: int, is_correct: bool) -> None:
+        """
+        Ставит в очередь ответ квиза по слову личного словаря
+        """
+        self._reviews.setdefault((user_id, word_id), []).append(is_correct)
+        if len(self) >= self.max_pending:
+            self._wakeup.set()
+
+    def has_pending(self, user_id: int) -> bool:
+        return any(pending_user == user_id for pending_user, _ in (*self._pending, *self._reviews))
+
+    def mark_written(self, user_ids: Iterable[int]) -> None:
+        """
+        Отмечает, что слова пользователей только что записаны в БД
+        """
+        now = time.monotonic()
+        for user_id in user_ids:
+            self._written[user_id] = now
+            self._written.move_to_end(user_id)
+        # старые отметки в начале: запись вне окна реплика уже видит
+        while self._written and next(iter(self._written.values())) < now - self.recent_window:
+            self._written.popitem(last=False)
+
+    def wrote_recently(self, user_id: int) -> bool:
+        """
+        True, если слова пользователя записаны меньше recent_window секунд
+        назад: читать их нужно с primary
+        """
+        written_at = self._written.get(user_id)
+        return written_at is not None and time.monotonic() - written_at < self.recent_window
+
+    async def flush(self) -> None:
+        """
+        Записывает накопленные изменения.
+        При ошибке возвращает их в очередь, не перетирая более новые
+        """
+        async with self._flush_lock:
+            if not self._pending and not self._reviews:
+                return
+            batch, self._pending = self._pending, {}
+            reviews, self._reviews = self._reviews, {}
+            users = {user_id for user_id, _ in (*batch, *reviews)}
+            changes, answers_total = len(batch), sum(map(len, reviews.values()))
+            try:
+                async with AsyncSessionLocal() as session:
+                    if batch:
+                        await apply_user_words_changes(session, batch)
+                        batch = {}
+                    # один UPDATE на каждый по счету ответ по слову
+                    while reviews:
+                        await apply_user_words_reviews(
+                            session, [(*key, answers[0]) for key, answers in reviews.items()]
+                        )
+                        reviews = {key: answers[1:] for key, answers in reviews.items() if len(answers) > 1}
+            except Exception:
+                for key, is_active in batch.items():
+                    self._pending.setdefault(key, is_active)
+                for key, answers in reviews.items():
+                    self._reviews[key] = answers + self._reviews.get(key, [])
+                raise
+            self.mark_written(users)
+            self.flushed += changes + answers_total
+            logger.debug('user_words_flushed', changes=changes, reviews=answers_total)
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception('user_words_flush_failed', pending=len(self))
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Останавливает фоновый сброс и записывает остаток очереди
+        """
+        if self._task is not None:
+            # не отменяем задачу посреди сброса, чтобы не потерять пачку
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+            self._stopping = False
+        await self.flush()
+        logger.info('user_words_writer_stopped', flushed=self.flushed)
+
+
+user_words_writer = UserWordsWriter(
+    max_pending=settings.user_words_flush_size,
+    flush_interval=settings.user_words_flush_interval,
+    # реплика отстает не больше max_lag на момент проверки и до следующей
+    recent_window=settings.db_replica_max_lag + settings.db_replica_check_interval,
+)
@@ -1,4 +1,6 @@
 from .start import router as start_router
 from .quiz import router as quiz_router
+from .stats import router as stats_router
+from .dictionary import router as dictionary_router
 
-routers = (start_router, quiz_router)
+routers = (start_router, quiz_router, stats_router, dictionary_router)
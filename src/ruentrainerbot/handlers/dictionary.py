@@ -0,0 +1,128 @@
+import io
+from aiogram import Router, F
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+from ruentrainerbot.core.logging import get_logger
+from ruentrainerbot.db.cache import user_words_cache
+from ruentrainerbot.db.queries import add_words_to_user, find_words, get_user_active_word_ids
+from ruentrainerbot.db.session import AsyncSessionLocal, engine, replica_router
+from ruentrainerbot.db.write_behind import user_words_writer
+from ruentrainerbot.utils.user_dictionary import UserWordsExport, batched, parse_user_words
+
+router = Router(name='dictionary')
+logger = get_logger(__name__)
+
+IMPORT_BATCH_SIZE = 1000
+MAX_IMPORT_BYTES = 5 * 1024 * 1024
+IMPORT_HELP = (
+    'Пришли CSV или JSON файл с подписью /import.\n'
+    'CSV: колонки en и ru с заголовком или без него (en первой колонкой), '
+    'JSON: список объектов {"en": ..., "ru": ...}.\n'
+    'Файл из /export подходит как есть. Слова ищутся в словаре бота '
+    'по английскому, а если его нет - по русскому написанию'
+)
+
+
+@router.message(Command('export'))
+async def export_cmd(message: Message, command: CommandObject) -> None:
+    """
+    Обработчик команды /export [csv|json]
+    Присылает личный словарь файлом. Файл пишется прямо из курсора БД
+    во время отправки, поэтому размер словаря не ограничен памятью
+    """
+    user_id = message.from_user.id
+    fmt = (command.args or 'csv').strip().lower()
+    if fmt not in ('csv', 'json'):
+        await message.answer('Формат: /export csv или /export json')
+        return
+    logger.info('Команда export', fmt=fmt)
+    # недавно измененный словарь читаем с primary, иначе с реплики
+    if user_words_writer.has_pending(user_id):
+        await user_words_writer.flush()
+    async with AsyncSessionLocal() as session:
+        word_ids = await get_user_active_word_ids(session, user_id=user_id)
+    if not word_ids:
+        await message.answer('В личном словаре пока нет слов')
+        return
+    source = engine if user_words_writer.wrote_recently(user_id) else replica_router.read_engine()
+    try:
+        await message.answer_document(
+            UserWordsExport(source, user_id, fmt),
+            caption=f'Личный словарь: {len(word_ids)} слов',
+        )
+    except Exception:
+        logger.exception('Ошибка экспорта словаря')
+        await message.answer('Ошибка при выгрузке словаря')
+
+
+@router.message(Command('import'), F.document)
+async def import_file(message: Message) -> None:
+    """
+    Обработчик файла с подписью /import
+    Добавляет слова из файла в личный словарь пачками по IMPORT_BATCH_SIZE:
+    на пачку один запрос поиска слов и один upsert в user_words,
+    весь файл - одной транзакцией
+    """
+    user_id = message.from_user.id
+    document = message.document
+    logger.info('Команда import', file_name=document.file_name, size=document.file_size)
+    if document.file_size and document.file_size > MAX_IMPORT_BYTES:
+        await message.answer(f'Файл больше {MAX_IMPORT_BYTES // 1024 // 1024} МБ')
+        return
+
+    data = io.BytesIO()
+    await message.bot.download(document, destination=data)
+    # отложенные изменения этого пользователя не должны перетереть импорт
+    if user_words_writer.has_pending(user_id):
+        await user_words_writer.flush()
+
+    rows = found = added = unknown = 0
+    unknown_sample: list[str] = []
+    try:
+        async with engine.begin() as conn:
+            for batch in batched(parse_user_words(data.getvalue(), document.file_name), IMPORT_BATCH_SIZE):
+                rows += len(batch)
+                words = await find_words(
+                    conn,
+                    ens={en for en, _ in batch if en},
+                    rus={ru for en, ru in batch if ru and not en},
+                )
+                by_en = {w.en: w.id for w in words}
+                by_ru = {w.ru: w.id for w in words}
+                word_ids = set()
+                for en, ru in batch:
+                    word_id = by_en.get(en) if en else by_ru.get(ru)
+                    if word_id is None:
+                        unknown += 1
+                        if len(unknown_sample) < 10:
+                            unknown_sample.append(en or ru)
+                    else:
+                        word_ids.add(word_id)
+                found += len(word_ids)
+                added += await add_words_to_user(conn, user_id, sorted(word_ids))
+    except ValueError:
+        logger.warning('Файл импорта не разобран', file_name=document.file_name)
+        await message.answer('Не получилось разобрать файл.\n' + IMPORT_HELP)
+        return
+    except Exception:
+        logger.exception('Ошибка импорта словаря')
+        await message.answer('Ошибка при загрузке словаря')
+        return
+    user_words_cache.invalidate(user_id)
+    user_words_writer.mark_written([user_id])
+
+    logger.info('user_words_imported', rows=rows, found=found, added=added, unknown=unknown)
+    text = f'Загружено слов: {found} из {rows}, новых в словаре: {added}'
+    if unknown:
+        text += f'\nНе найдено в словаре бота: {", ".join(unknown_sample)}'
+        if unknown > len(unknown_sample):
+            text += f' и еще {unknown - len(unknown_sample)}'
+    await message.answer(text)
+
+
+@router.message(Command('import'))
+async def import_cmd(message: Message) -> None:
+    """
+    Обработчик команды /import без файла: подсказывает формат
+    """
+    await message.answer(IMPORT_HELP)
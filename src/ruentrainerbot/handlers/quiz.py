@@ -1,22 +1,38 @@
-from aiogram import Router, F
+import asyncio
+import contextlib
+from typing import Any, Awaitable, Callable
+from aiogram import Bot, Router, F
+from aiogram.exceptions import TelegramAPIError
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import Message, CallbackQuery, Update
 from ruentrainerbot.core.logging import get_logger
-from ruentrainerbot.db.queries import (get_random_words, get_similar_wrong_words,
-                                       is_word_active_for_user, get_user_active_words,
-                                       add_word_to_user, remove_word_from_user)
-from ruentrainerbot.db.session import AsyncSessionLocal
-from ruentrainerbot.keyboards.quiz import quiz_options_kb
+from ruentrainerbot.core.metrics import registry
+from ruentrainerbot.db.models import Dictionary
+from ruentrainerbot.db.queries import (get_random_words, get_distractors_for_words,
+                                       get_user_active_word_ids, get_due_words, get_words_by_ids)
+from ruentrainerbot.db.events import answer_events_writer
+from ruentrainerbot.db.session import AsyncSessionLocal, read_session
+from ruentrainerbot.db.snapshot import dictionary_snapshot
+from ruentrainerbot.db.write_behind import user_words_writer
+from ruentrainerbot.keyboards.callback_data import ADD, ANSWER, NOOP, REMOVE, STOP, QuizCallback, unpack
+from ruentrainerbot.keyboards.quiz import options_from_kb, quiz_options_kb
 from ruentrainerbot.keyboards.reply import BTN_QUIZ, BTN_MY_QUIZ
-from ruentrainerbot.utils.quiz import build_options, render_question_text
+from ruentrainerbot.utils.quiz import (Question, build_question, new_session_id, quiz_positions,
+                                       render_question_text)
 
-router = Router()
+router = Router(name='quiz')
 logger = get_logger(__name__)
 
 TOTAL_QUESTIONS = 10
 
+stale_taps = registry.counter(
+    'bot_quiz_stale_taps_total',
+    'Нажатия на кнопки старых вопросов и завершенных квизов',
+    labelnames=('action',),
+)
+
 
 class QuizStates(StatesGroup):
     """
@@ -25,20 +41,78 @@ class QuizStates(StatesGroup):
     in_quiz = State()
 
 
+async def _gather_best_effort(*calls) -> list[BaseException]:
+    """
+    Выполняет независимые вызовы API одновременно, дожидается всех
+    и возвращает ошибки, а не бросает первую: сбой одного вызова
+    не отменяет остальные.
+    Методы aiogram (call.answer() и т.п.) не корутины, а awaitable объекты,
+    поэтому оборачиваются в задачи
+    """
+    results = await asyncio.gather(*map(asyncio.ensure_future, calls), return_exceptions=True)
+    return [r for r in results if isinstance(r, BaseException)]
+
+
+async def _prepare_questions(user_id: int,
+                             words,
+                             mode: str
+                             ) -> list[Question]:
+    """
+    Готовит все вопросы квиза разом:
+    неправильные варианты для всех слов берутся одним запросом с реплики,
+    флаги «уже добавлено» - из кеша или с primary, где уже есть
+    только что сброшенные изменения
+    """
+    words = words[:TOTAL_QUESTIONS]
+    if mode != 'personal' and user_words_writer.has_pending(user_id):
+        await user_words_writer.flush()
+    async with read_session() as session:
+        distractors = await get_distractors_for_words(session, words)
+    if mode == 'personal':
+        added = {w.id for w in words}
+    else:
+        async with AsyncSessionLocal() as session:
+            added = await get_user_active_word_ids(session, user_id=user_id)
+    return [build_question(w, distractors[w.id], w.id in added) for w in words]
+
+
+async def _words_by_id(word_ids: list[int]) -> dict[int, Dictionary]:
+    """
+    Слова вопроса по id: из снимка словаря, а которых в нем нет
+    (снимок не загружен или уже обновился) - одним запросом с реплики
+    """
+    words = {}
+    missing = []
+    for word_id in word_ids:
+        word = dictionary_snapshot.get(word_id)
+        if word is None:
+            missing.append(word_id)
+        else:
+            words[word_id] = word
+    if missing:
+        async with read_session() as session:
+            words.update((w.id, w) for w in await get_words_by_ids(session, missing))
+    return words
+
+
 async def _send_next_question(chat_id: int,
-                              user_id: int,
                               bot,
-                              state: FSMContext
+                              state: FSMContext,
+                              data: dict | None = None
                               ) -> None:
     """
     Отправляет следующий вопрос квиза или завершает квиз,
-    если вопросы закончились
+    если вопросы закончились.
+    Вопросы подготовлены заранее, к БД не обращается.
+    data - уже прочитанные данные FSM (например, результат update_data)
     """
-    data = await state.get_data()
-    words = data.get('words', [])
+    if data is None:
+        data = await state.get_data()
+    questions = data.get('questions', [])
     idx = int(data.get('idx', 0))
-    total = int(data.get('total', len(words)))
+    total = int(data.get('total', len(questions)))
     score = int(data.get('score', 0))
+    session = int(data.get('session', 0))
 
     if idx >= total:
         percent = int((score / total) * 100) if total else 0
@@ -48,40 +122,43 @@ async def _send_next_question(chat_id: int,
             score=score,
             percent=percent)
         await state.clear()
+        quiz_positions.finish(state.key.user_id)
         await bot.send_message(
             chat_id,
             f'Квиз завершен\n'
             f'Результат: {percent}%',
         )
         return
-    correct = words[idx]
-
-    async with AsyncSessionLocal() as session:
-        wrong = await get_similar_wrong_words(session, correct)
-        added = await is_word_active_for_user(session, user_id=user_id, word_id=correct.id)
-    options, correct_index = build_options(correct, wrong)
+    question = Question.load(questions[idx])
+    if question is None:
+        logger.info('quiz_outdated', question_index=idx)
+        await state.clear()
+        quiz_positions.finish(state.key.user_id)
+        await bot.send_message(chat_id, 'Квиз устарел, начни новый: /quiz')
+        return
+    words = await _words_by_id(question.option_ids)
+    correct = words[question.word_id]
 
-    await state.update_data(
-        idx=idx,
-        correct_word_id=correct.id,
-        correct_ru=correct.ru,
-        correct_en=correct.en,
-        options=options,
-        correct_index=correct_index,
-    )
     text = render_question_text(idx + 1, total, correct.ru)
     logger.info(
         'Отправлен вопрос для квиза',
         question_index=idx,
         total=total,
-        correct_word_id=correct.id,
+        correct_word_id=question.word_id,
         correct_en=correct.en,
-        is_added=added,
+        is_added=question.is_added,
     )
+    quiz_positions.set(state.key.user_id, session, idx)
     await bot.send_message(
         chat_id,
         text,
-        reply_markup=quiz_options_kb(options, word_id=correct.id, is_added=added)
+        reply_markup=quiz_options_kb(
+            [words[word_id].en for word_id in question.option_ids],
+            word_id=question.word_id,
+            is_added=question.is_added,
+            session=session,
+            index=idx,
+        )
     )
 
 
@@ -106,19 +183,71 @@ async def _start_quiz_with_words(
                              '\nДобавляй слова во время квиза кнопкой «➕ Добавить»')
         return
 
+    questions = await _prepare_questions(user_id, words, mode)
     await state.set_state(QuizStates.in_quiz)
     await state.set_data(
         {
             'mode': mode,
-            'words': words,
+            'session': new_session_id(),
+            'questions': questions,
             'idx': 0,
-            'total': min(TOTAL_QUESTIONS, len(words)),
+            'total': len(questions),
             'score': 0,
         }
     )
 
     logger.info('Квиз запущен', mode=mode, total=len(words))
-    await _send_next_question(chat_id=chat_id, user_id=user_id, bot=message.bot, state=state)
+    await _send_next_question(chat_id=chat_id, bot=message.bot, state=state)
+
+
+def _stale_text(cb: QuizCallback) -> str:
+    stale_taps.inc(action=cb.action)
+    logger.info('quiz_stale_tap', action=cb.action, session=cb.session, question_index=cb.index)
+    return 'Этот вопрос уже закрыт' if cb.action == ANSWER else 'Этот квиз уже завершен'
+
+
+async def _reject_stale(call: CallbackQuery, cb: QuizCallback) -> None:
+    """
+    Отвечает на нажатие кнопки старого вопроса или завершенного квиза
+    """
+    await call.answer(_stale_text(cb))
+
+
+def reject_stale_tap(bot: Bot, update: Update) -> Callable[[], Awaitable[Any]] | None:
+    """
+    Фильтр приема QueuedDispatcher: нажатие на старый вопрос или кнопку
+    прошлого квиза отклоняется по quiz_positions до очереди исполнителя
+    и загрузки FSM, в очередь чата встает только ответ на нажатие.
+    Если позиция неизвестна, нажатие проверяет обработчик по данным FSM
+    """
+    call = update.callback_query
+    if call is None:
+        return None
+    cb = unpack(call.data)
+    if cb is None:
+        return None
+    user_id = call.from_user.id
+    if cb.action == ANSWER:
+        accepted = quiz_positions.accept_answer(user_id, cb.session, cb.index)
+    elif cb.action == STOP:
+        accepted = quiz_positions.accept_stop(user_id, cb.session)
+    else:
+        return None
+    if accepted:
+        return None
+    text = _stale_text(cb)
+    return lambda: bot.answer_callback_query(callback_query_id=call.id, text=text)
+
+
+def _options_markup(call: CallbackQuery, cb: QuizCallback, word_id: int, is_added: bool):
+    """
+    Клавиатура нажатого вопроса с новым состоянием кнопки «Добавить»:
+    варианты ответа берутся из самой клавиатуры, а не из FSM
+    """
+    options = options_from_kb(getattr(call.message, 'reply_markup', None))
+    if not options:
+        return None
+    return quiz_options_kb(options, word_id=word_id, is_added=is_added, session=cb.session, index=cb.index)
 
 
 @router.message(Command('quiz'))
@@ -132,25 +261,31 @@ async def quiz_cmd(message: Message, state: FSMContext) -> None:
     chat_id = message.chat.id
     logger.info('Команда quiz')
     try:
-        async with AsyncSessionLocal() as session:
-            words = await get_random_words(session, limit=TOTAL_QUESTIONS)
+        if dictionary_snapshot.loaded:
+            words = dictionary_snapshot.sample(TOTAL_QUESTIONS)
+        else:
+            async with read_session() as session:
+                words = await get_random_words(session, limit=TOTAL_QUESTIONS)
         if not words:
             logger.warning('Нет слов в словаре')
             await message.answer('Пока нет слов в словаре')
             return
 
+        questions = await _prepare_questions(user_id, words, mode='general')
         await state.set_state(QuizStates.in_quiz)
         await state.set_data(
             {
-                'words': words,
+                'mode': 'general',
+                'session': new_session_id(),
+                'questions': questions,
                 'idx': 0,
-                'total': min(TOTAL_QUESTIONS, len(words)),
+                'total': len(questions),
                 'score': 0,
             }
         )
         logger.info('quiz_started', total=len(words))
 
-        await _send_next_question(chat_id=chat_id, user_id=user_id, bot=message.bot, state=state)
+        await _send_next_question(chat_id=chat_id, bot=message.bot, state=state)
     except Exception:
         logger.exception('Ошибка запуска квиза')
         await message.answer('Ошибка при запуске квиза!')
@@ -161,22 +296,30 @@ async def quiz_cmd(message: Message, state: FSMContext) -> None:
 async def my_quiz_cmd(message: Message, state: FSMContext) -> None:
     """
     Обработчик команды /myquiz
-    Запускает персональный квиз со словами пользователя
+    Запускает персональный квиз со словами пользователя,
+    которые раньше всех пора повторить
     """
     user_id = message.from_user.id
     logger.info('Команда quiz', mode='personal')
 
     try:
-        async with AsyncSessionLocal() as session:
-            words = await get_user_active_words(session, user_id=user_id, limit=TOTAL_QUESTIONS)
+        # недавно записанный словарь читаем с primary: реплика может отставать
+        if user_words_writer.has_pending(user_id):
+            await user_words_writer.flush()
+        session_factory = AsyncSessionLocal if user_words_writer.wrote_recently(user_id) else read_session
+        async with session_factory() as session:
+            words = await get_due_words(session, user_id=user_id, limit=TOTAL_QUESTIONS)
         await _start_quiz_with_words(message, state, words, mode='personal')
     except Exception:
         logger.exception('Ошибка запуска квиза', mode='personal')
         await message.answer('Ошибка при запуске квиза')
 
 
-@router.callback_query(lambda c: c.data == 'quiz:noop')
-async def quiz_noop(call: CallbackQuery) -> None:
+async def quiz_noop(call: CallbackQuery,
+                    state: FSMContext,
+                    cb: QuizCallback,
+                    raw_state: str | None
+                    ) -> None:
     """
     Callback заглушка для кнопки,
     когда слово уже добавлено пользователю
@@ -184,13 +327,21 @@ async def quiz_noop(call: CallbackQuery) -> None:
     await call.answer('Уже в личном словаре', show_alert=False)
 
 
-@router.callback_query(lambda c: c.data == 'quiz:stop')
-async def quiz_stop(call: CallbackQuery, state: FSMContext) -> None:
+async def quiz_stop(call: CallbackQuery,
+                    state: FSMContext,
+                    cb: QuizCallback,
+                    raw_state: str | None
+                    ) -> None:
     """
     Останавливает активный квиз по запросу пользователя
-    и показывает текущий результат
+    и показывает текущий результат.
+    Кнопка прошлого квиза не останавливает текущий
     """
+    user_id = call.from_user.id
     data = await state.get_data()
+    if data.get('session') != cb.session:
+        await _reject_stale(call, cb)
+        return
     score = int(data.get('score', 0))
     total = int(data.get('total', 0))
     logger.info(
@@ -199,83 +350,102 @@ async def quiz_stop(call: CallbackQuery, state: FSMContext) -> None:
         total=total
     )
 
-    await state.clear()
-    await call.answer('Остановлено')
+    quiz_positions.finish(user_id)
+    fsm_write = asyncio.ensure_future(state.clear())
+    calls = [call.answer('Остановлено')]
     if call.message:
         percent = int((score / total) * 100) if total else 0
-        await call.message.edit_text(
+        calls.append(call.message.edit_text(
             f'Квиз остановлен\n'
             f'Результат: {score}/{total} ({percent}%)'
-        )
+        ))
+    for error in await _gather_best_effort(*calls):
+        logger.warning('quiz_stop_api_failed', error=repr(error))
+    await fsm_write
 
 
-@router.callback_query(lambda c: c.data and c.data.startswith('quiz:add:'))
-async def quiz_add_word(call: CallbackQuery, state: FSMContext) -> None:
+async def quiz_add_word(call: CallbackQuery,
+                        state: FSMContext,
+                        cb: QuizCallback,
+                        raw_state: str | None
+                        ) -> None:
     """
     Добавляет слово из квиза в личный словарь пользователя
     """
     user_id = call.from_user.id
+    answered = False
 
     try:
-        word_id = int(call.data.split(':')[-1])
+        word_id = cb.arg
         logger.info('Запрос на добавление слова', word_id=word_id)
 
-        async with AsyncSessionLocal() as session:
-            await add_word_to_user(session, user_id=user_id, word_id=word_id)
-
-        data = await state.get_data()
-        options = data.get('options', [])
-        if call.message:
-            await call.message.edit_reply_markup(
-                reply_markup=quiz_options_kb(options, word_id=word_id, is_added=True)
-            )
+        user_words_writer.set(user_id, word_id, is_active=True)
 
+        calls = [call.answer('Добавлено ➕')]
+        markup = _options_markup(call, cb, word_id, is_added=True)
+        if markup is not None:
+            calls.append(call.message.edit_reply_markup(reply_markup=markup))
+        answered = True
+        for error in await _gather_best_effort(*calls):
+            logger.warning('quiz_add_word_api_failed', error=repr(error))
         logger.info('user_word_added', word_id=word_id)
-        await call.answer('Добавлено ➕')
 
     except Exception:
         logger.exception('Ошибка при добавлении слова')
-        await call.answer('Ошибка при добавлении слова')
+        if not answered:
+            with contextlib.suppress(TelegramAPIError):
+                await call.answer('Ошибка при добавлении слова')
 
 
-@router.callback_query(lambda c: c.data and c.data.startswith('quiz:rm:'))
-async def quiz_remove_word(call: CallbackQuery, state: FSMContext) -> None:
+async def quiz_remove_word(call: CallbackQuery,
+                           state: FSMContext,
+                           cb: QuizCallback,
+                           raw_state: str | None
+                           ) -> None:
     """
     Удаляет слово из личного словаря пользователя
     """
     user_id = call.from_user.id
+    answered = False
 
     try:
-        word_id = int(call.data.split(':')[-1])
+        word_id = cb.arg
         logger.info('user_word_remove_requested', word_id=word_id)
 
-        async with AsyncSessionLocal() as session:
-            await remove_word_from_user(session, user_id=user_id, word_id=word_id)
-
-        data = await state.get_data()
-        options = data.get('options', [])
-        if call.message:
-            await call.message.edit_reply_markup(
-                reply_markup=quiz_options_kb(options, word_id=word_id, is_added=False)
-            )
+        user_words_writer.set(user_id, word_id, is_active=False)
 
+        calls = [call.answer('Удалено ➖')]
+        markup = _options_markup(call, cb, word_id, is_added=False)
+        if markup is not None:
+            calls.append(call.message.edit_reply_markup(reply_markup=markup))
+        answered = True
+        for error in await _gather_best_effort(*calls):
+            logger.warning('quiz_remove_word_api_failed', error=repr(error))
         logger.info('user_word_removed', word_id=word_id)
-        await call.answer('Удалено ➖')
     except Exception:
         logger.exception('Ошибка при удалении слова')
-        await call.answer('Ошибка при удалении слова')
+        if not answered:
+            with contextlib.suppress(TelegramAPIError):
+                await call.answer('Ошибка при удалении слова')
 
 
-@router.callback_query(lambda c: c.data and c.data.startswith('quiz:ans:'))
-async def quiz_answer(call: CallbackQuery, state: FSMContext) -> None:
+async def quiz_answer(call: CallbackQuery,
+                      state: FSMContext,
+                      cb: QuizCallback,
+                      raw_state: str | None
+                      ) -> None:
     """
     Обрабатывает ответ пользователя на вопрос квиза,
-    обновляет счет и отправляет следующий вопрос
+    обновляет счет и отправляет следующий вопрос.
+    Ответ на старый вопрос или вопрос прошлого квиза отклоняет
+    reject_stale_tap при приеме, а здесь - данные FSM (если позиция
+    процессу неизвестна, например после перезапуска)
     """
     user_id = call.from_user.id
     chat_id = call.message.chat.id if call.message else None
+    answered = False
     try:
-        if await state.get_state() != QuizStates.in_quiz:
+        if raw_state != QuizStates.in_quiz.state:
             logger.warning('Квиз не активен')
             await call.answer('Квиз не активен')
             return
@@ -283,12 +453,24 @@ async def quiz_answer(call: CallbackQuery, state: FSMContext) -> None:
         idx = int(data.get('idx', 0))
         total = int(data.get('total', 0))
         score = int(data.get('score', 0))
+        if (data.get('session'), idx) != (cb.session, cb.index):
+            await _reject_stale(call, cb)
+            return
+        quiz_positions.set(user_id, cb.session, idx + 1)
 
-        options = data.get('options', [])
-        correct_index = int(data.get('correct_index', -1))
-        correct_en = data.get('correct_en')
-        picked_index = int(call.data.split(':')[-1])
-        picked_value = options[picked_index] if 0 <= picked_index < len(options) else None
+        question = Question.load(data['questions'][idx])
+        if question is None:
+            await state.clear()
+            quiz_positions.finish(user_id)
+            await call.answer('Этот квиз уже завершен, начни новый: /quiz')
+            return
+        option_ids = question.option_ids
+        correct_index = question.correct_index
+        picked_index = cb.arg
+        picked_id = option_ids[picked_index] if 0 <= picked_index < len(option_ids) else None
+        words = await _words_by_id([question.word_id] if picked_id is None else [question.word_id, picked_id])
+        correct_en = words[question.word_id].en
+        picked_value = words[picked_id].en if picked_id in words else None
         is_correct = picked_index == correct_index
 
         logger.info(
@@ -304,18 +486,70 @@ async def quiz_answer(call: CallbackQuery, state: FSMContext) -> None:
 
         if is_correct:
             score += 1
-            await state.update_data(score=score)
             toast = '✅ Верно!'
             text = f'✅ Верно! Ответ: {correct_en}'
         else:
             toast = '❌ Неверно!'
             text = f'❌ Неверно. Правильный ответ: {correct_en}'
 
-        await call.answer(toast)
+        answer_events_writer.record(
+            user_id=user_id,
+            word_id=question.word_id,
+            is_correct=is_correct,
+            picked_index=picked_index,
+            mode=data.get('mode', 'general'),
+        )
+        if question.is_added:
+            user_words_writer.review(user_id, question.word_id, is_correct)
+
+        # запись счета и ответы API друг от друга не зависят; правка старого
+        # сообщения и всплывающий ответ - по возможности: их сбой (сообщение
+        # слишком старое, 429 после повторов) не должен оставить квиз
+        # без следующего вопроса
+        fsm_write = asyncio.ensure_future(state.update_data(idx=idx + 1, score=score))
+        calls = [call.answer(toast)]
         if call.message:
-            await call.message.edit_text(text)
-        await state.update_data(idx=idx + 1)
-        await _send_next_question(chat_id=chat_id, user_id=user_id, bot=call.bot, state=state)
+            calls.append(call.message.edit_text(text))
+        answered = True
+        for error in await _gather_best_effort(*calls):
+            logger.warning('quiz_answer_api_failed', error=repr(error))
+        data = await fsm_write
+        await _send_next_question(chat_id=chat_id, bot=call.bot, state=state, data=data)
     except Exception:
+        # позицию сверим с FSM при следующем нажатии
+        quiz_positions.discard(user_id)
         logger.exception('не удалось ответить на тест', user_id=user_id, chat_id=chat_id)
-        await call.answer('не удалось ответить на тест')
\ No newline at end of file
+        if not answered:
+            with contextlib.suppress(TelegramAPIError):
+                await call.answer('не удалось ответить на тест')
+
+
+_ACTIONS = {
+    ANSWER: quiz_answer,
+    ADD: quiz_add_word,
+    REMOVE: quiz_remove_word,
+    NOOP: quiz_noop,
+    STOP: quiz_stop,
+}
+
+
+@router.callback_query(F.data.func(unpack).as_('cb'))
+async def quiz_callback(call: CallbackQuery,
+                        state: FSMContext,
+                        cb: QuizCallback,
+                        raw_state: str | None
+                        ) -> None:
+    """
+    Единая точка входа для кнопок квиза: callback_data разбирается
+    один раз в фильтре, обработчик выбирается по действию из словаря.
+    raw_state - состояние, которое FSM middleware уже прочитало
+    """
+    await _ACTIONS[cb.action](call, state, cb, raw_state)
+
+
+@router.callback_query(F.data.startswith('quiz:'))
+async def quiz_legacy_callback(call: CallbackQuery) -> None:
+    """
+    Кнопки сообщений, отправленных до перехода на упакованный формат
+    """
+    await call.answer('Этот квиз уже завершен, начни новый: /quiz')
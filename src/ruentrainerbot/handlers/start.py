@@ -5,7 +5,7 @@ from aiogram.types import Message
 from ruentrainerbot.core.logging import get_logger
 from ruentrainerbot.keyboards.reply import main_menu_kb, BTN_START
 
-router = Router()
+router = Router(name='start')
 logger = get_logger(__name__)
 
 @router.message(CommandStart())
@@ -18,6 +18,8 @@ async def start_cmd(message: Message) -> None:
     await message.answer(
         'Привет! Я помогу тебе с изучением английских слов\n'
         'Нажми /quiz чтобы начать квиз\n'
-        'Нажми /myquiz чтобы начать квиз по личным словам',
+        'Нажми /myquiz чтобы начать квиз по личным словам\n'
+        'Нажми /stats чтобы посмотреть статистику\n'
+        '/export выгрузит личный словарь файлом, /import загрузит слова из файла',
         reply_markup=main_menu_kb(),
     )
\ No newline at end of file
@@ -0,0 +1,45 @@
+from aiogram import Router, F
+from aiogram.filters import Command
+from aiogram.types import Message
+from ruentrainerbot.core.logging import get_logger
+from ruentrainerbot.db.queries import count_learned_words, get_leaderboard_position, get_user_stats
+from ruentrainerbot.db.session import read_session
+from ruentrainerbot.keyboards.reply import BTN_STATS
+
+router = Router(name='stats')
+logger = get_logger(__name__)
+
+
+@router.message(Command('stats'))
+@router.message(F.text == BTN_STATS)
+async def stats_cmd(message: Message) -> None:
+    """
+    Обработчик команды /stats
+    Показывает точность, серии верных ответов, выученные слова
+    и место в рейтинге по числу верных ответов.
+    Счетчики обновляются пачками, последние ответы
+    появляются в статистике через секунду-две
+    """
+    user_id = message.from_user.id
+    logger.info('Команда stats')
+    try:
+        async with read_session() as session:
+            stats = await get_user_stats(session, user_id)
+            if stats is None or not stats.answers:
+                await message.answer('Пока нет ответов. Нажми /quiz чтобы начать квиз')
+                return
+            learned = await count_learned_words(session, user_id)
+            position, total = await get_leaderboard_position(session, stats.correct)
+    except Exception:
+        logger.exception('Ошибка получения статистики')
+        await message.answer('Ошибка при получении статистики')
+        return
+
+    percent = round(stats.correct / stats.answers * 100)
+    await message.answer(
+        f'📊 Твоя статистика\n'
+        f'Ответов: {stats.answers}, верных: {stats.correct} ({percent}%)\n'
+        f'Серия верных ответов: {stats.current_streak}, лучшая: {stats.best_streak}\n'
+        f'Выучено слов: {learned}\n'
+        f'Место в рейтинге: {position} из {total}'
+    )
@@ -0,0 +1,117 @@
+import argparse
+import asyncio
+import time
+import numpy as np
+import sqlalchemy as sq
+from ruentrainerbot.core.config import settings
+from ruentrainerbot.core.logging import configure_logging, get_logger
+from ruentrainerbot.db.queries import (get_all_words_en, get_stale_distractor_word_ids,
+                                       get_distractor_score_floors,
+                                       get_words_referencing_distractors,
+                                       replace_word_distractors)
+from ruentrainerbot.db.session import AsyncSessionLocal, engine
+from ruentrainerbot.utils.similarity import ngram_matrix, nearest_neighbours, max_similarity
+
+logger = get_logger(__name__)
+
+TOP_K = 10
+WRITE_BATCH = 1000
+
+
+def _positions(ids: np.ndarray, values) -> np.ndarray:
+    """
+    Возвращает позиции values в отсортированном массиве ids,
+    пропуская значения, которых в нем нет
+    """
+    values = np.asarray(list(values), dtype=ids.dtype)
+    pos = np.searchsorted(ids, values)
+    pos = np.minimum(pos, len(ids) - 1)
+    return pos[ids[pos] == values]
+
+
+async def refresh_distractors(full: bool = False, top_k: int = TOP_K) -> int:
+    """
+    Пересчитывает таблицу word_distractors.
+    full=False: только слова, изменившиеся после прошлого расчета,
+    и слова, чьи списки соседей эти изменения затрагивают.
+    Возвращает количество пересчитанных слов
+    """
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as session:
+        computed_at = (await session.execute(sq.select(sq.func.now()))).scalar_one()
+        words = await get_all_words_en(session)
+        if len(words) < 2:
+            logger.info('distractors_skipped', total=len(words))
+            return 0
+
+        ids = np.fromiter((word_id for word_id, _ in words), dtype=np.int64, count=len(words))
+        vectors = ngram_matrix([en for _, en in words])
+        expected = min(top_k, len(words) - 1)
+
+        if full:
+            targets = np.arange(len(ids))
+        else:
+            stale_ids = await get_stale_distractor_word_ids(session, expected)
+            if not stale_ids:
+                logger.info('distractors_up_to_date', total=len(ids))
+                return 0
+            stale = _positions(ids, stale_ids)
+            if len(stale) == len(ids):
+                targets = stale
+            else:
+                # Изменившиеся слова могут оказаться ближе,
+                # чем самый слабый сосед у других слов
+                floors = await get_distractor_score_floors(session)
+                floor = np.full(len(ids), np.inf, dtype=np.float32)
+                known = _positions(ids, floors.keys())
+                floor[known] = [floors[int(word_id)] for word_id in ids[known]]
+                affected = np.flatnonzero(max_similarity(vectors, stale) > floor)
+                referencing = _positions(
+                    ids, await get_words_referencing_distractors(session, stale_ids)
+                )
+                targets = np.union1d(np.union1d(stale, affected), referencing)
+
+        for start in range(0, len(targets), WRITE_BATCH):
+            chunk = targets[start:start + WRITE_BATCH]
+            neighbours, scores = nearest_neighbours(vectors, chunk, top_k)
+            rows = [
+                {
+                    'word_id': int(ids[word]),
+                    'rank': rank,
+                    'distractor_id': int(ids[neighbours[i, rank]]),
+                    'score': float(scores[i, rank]),
+                }
+                for i, word in enumerate(chunk)
+                for rank in range(neighbours.shape[1])
+            ]
+            await replace_word_distractors(
+                session,
+                word_ids=[int(ids[word]) for word in chunk],
+                rows=rows,
+                computed_at=computed_at,
+            )
+
+    logger.info(
+        'distractors_refreshed',
+        words=len(targets),
+        total=len(ids),
+        full=full,
+        elapsed=round(time.perf_counter() - started, 3),
+    )
+    return len(targets)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description='Пересчет соседей-дистракторов для слов словаря')
+    parser.add_argument('--full', action='store_true', help='пересчитать для всех слов')
+    args = parser.parse_args()
+
+    configure_logging(debug=settings.debug, log_level=settings.log_level)
+    try:
+        await refresh_distractors(full=args.full)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,193 @@
+import argparse
+import asyncio
+import csv
+import time
+from pathlib import Path
+from typing import Iterator
+import sqlalchemy as sq
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+from ruentrainerbot.core.config import settings
+from ruentrainerbot.core.logging import configure_logging, get_logger
+from ruentrainerbot.db.models import Dictionary
+from ruentrainerbot.db.session import engine
+
+logger = get_logger(__name__)
+
+CHUNK_SIZE = 50_000
+MAX_WORD_LENGTH = Dictionary.__table__.c.ru.type.length
+
+_staging = sq.Table(
+    'words_import',
+    sq.MetaData(),
+    sq.Column('line', sq.BigInteger, nullable=False),
+    sq.Column('ru', sq.Text, nullable=False),
+    sq.Column('en', sq.Text, nullable=False),
+    sq.Column('kept', sq.Boolean, nullable=False, server_default=sq.false()),
+    prefixes=['TEMPORARY'],
+    postgresql_on_commit='DROP',
+)
+
+
+def read_chunks(path: Path,
+                delimiter: str,
+                skip_header: bool,
+                stats: dict[str, int],
+                chunk_size: int = CHUNK_SIZE
+                ) -> Iterator[list[tuple[int, str, str]]]:
+    """
+    Читает пары ru/en из CSV/TSV потоком и отдает их пачками по chunk_size.
+    Пустые и слишком длинные слова пропускаются и считаются в stats['invalid']
+    """
+    chunk: list[tuple[int, str, str]] = []
+    with path.open(encoding='utf-8', newline='') as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        if skip_header:
+            next(reader, None)
+        for line, row in enumerate(reader, start=1):
+            stats['read'] += 1
+            if len(row) < 2:
+                stats['invalid'] += 1
+                continue
+            ru, en = row[0].strip(), row[1].strip()
+            if not ru or not en or len(ru) > MAX_WORD_LENGTH or len(en) > MAX_WORD_LENGTH:
+                stats['invalid'] += 1
+                continue
+            chunk.append((line, ru, en))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+async def _copy_chunk(conn: AsyncConnection, chunk: list[tuple[int, str, str]]) -> None:
+    """
+    Загружает пачку в staging таблицу по протоколу COPY
+    через драйвер соединения (asyncpg или psycopg)
+    """
+    raw = await conn.get_raw_connection()
+    driver = raw.driver_connection
+    if conn.dialect.driver == 'asyncpg':
+        await driver.copy_records_to_table(_staging.name, records=chunk, columns=['line', 'ru', 'en'])
+    else:
+        async with driver.cursor() as cursor:
+            async with cursor.copy(f'COPY {_staging.name} (line, ru, en) FROM STDIN') as copy:
+                for record in chunk:
+                    await copy.write_row(record)
+
+
+async def _dedupe(conn: AsyncConnection) -> int:
+    """
+    Отмечает в staging строки, которые остаются после дублей внутри файла:
+    строка остается, если ее ru и en не заняты более ранней оставшейся
+    строкой (для (a,x),(b,x),(b,y) остаются (a,x) и (b,y)).
+    Идет раундами: строки, первые и по ru, и по en среди кандидатов,
+    остаются, кандидаты с их ru или en отбрасываются. Обычно хватает
+    нескольких раундов. Возвращает число оставшихся строк
+    """
+    candidates = sq.select(
+        _staging.c.line,
+        sq.func.row_number().over(partition_by=_staging.c.ru, order_by=_staging.c.line).label('ru_n'),
+        sq.func.row_number().over(partition_by=_staging.c.en, order_by=_staging.c.line).label('en_n'),
+    ).where(~_staging.c.kept).subquery('candidates')
+    keep = (
+        sq.update(_staging)
+        .where(_staging.c.line.in_(
+            sq.select(candidates.c.line).where(candidates.c.ru_n == 1, candidates.c.en_n == 1)
+        ))
+        .values(kept=True)
+    )
+    kept = _staging.alias('kept_rows')
+    drop = [
+        sq.delete(_staging).where(
+            ~_staging.c.kept,
+            sq.exists().where(kept.c.kept, kept.c[column] == _staging.c[column]),
+        )
+        for column in ('ru', 'en')
+    ]
+    unique = 0
+    rounds = 0
+    while True:
+        result = await conn.execute(keep)
+        if not result.rowcount:
+            break
+        unique += result.rowcount
+        rounds += 1
+        for stmt in drop:
+            await conn.execute(stmt)
+    logger.debug('words_import_deduped', unique=unique, rounds=rounds)
+    return unique
+
+
+async def _merge(conn: AsyncConnection) -> tuple[int, int]:
+    """
+    Переносит слова из staging в words: дубли внутри файла отсекает
+    _dedupe, строки, конфликтующие с uq_words_ru/uq_words_en, пропускаются.
+    Возвращает (уникальных строк в файле, вставлено)
+    """
+    unique = await _dedupe(conn)
+    unique_rows = sq.select(_staging.c.ru, _staging.c.en).where(_staging.c.kept).cte('unique_rows')
+    inserted = (
+        insert(Dictionary.__table__)
+        .from_select(['ru', 'en'], sq.select(unique_rows.c.ru, unique_rows.c.en))
+        .on_conflict_do_nothing()
+        .returning(Dictionary.__table__.c.id)
+        .cte('inserted')
+    )
+    stmt = sq.select(sq.select(sq.func.count()).select_from(inserted).scalar_subquery())
+    added = (await conn.execute(stmt)).scalar_one()
+    return unique, added
+
+
+async def import_words(path: Path,
+                       delimiter: str,
+                       skip_header: bool = False,
+                       chunk_size: int = CHUNK_SIZE
+                       ) -> dict[str, int | float]:
+    """
+    Импортирует словарь из CSV/TSV файла (ru, en в первых двух колонках)
+    одной транзакцией: COPY пачками во временную таблицу, затем слияние в words.
+    Возвращает статистику импорта
+    """
+    started = time.perf_counter()
+    stats = {'read': 0, 'invalid': 0, 'staged': 0}
+    async with engine.begin() as conn:
+        await conn.run_sync(_staging.create)
+        for chunk in read_chunks(path, delimiter, skip_header, stats, chunk_size):
+            await _copy_chunk(conn, chunk)
+            stats['staged'] += len(chunk)
+            logger.debug('words_import_chunk', staged=stats['staged'])
+        unique, added = await _merge(conn)
+
+    elapsed = time.perf_counter() - started
+    report = {
+        **stats,
+        'duplicates': stats['staged'] - unique,
+        'conflicts': unique - added,
+        'inserted': added,
+        'elapsed': round(elapsed, 3),
+        'rows_per_sec': round(stats['read'] / elapsed) if elapsed else 0,
+    }
+    logger.info('words_imported', path=str(path), **report)
+    return report
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description='Импорт пар ru/en в словарь из CSV/TSV')
+    parser.add_argument('path', type=Path, help='файл со словами: ru и en в первых двух колонках')
+    parser.add_argument('--delimiter', help='разделитель колонок (по умолчанию по расширению файла)')
+    parser.add_argument('--header', action='store_true', help='пропустить первую строку')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='строк в одной пачке COPY')
+    args = parser.parse_args()
+
+    delimiter = args.delimiter or ('\t' if args.path.suffix.lower() == '.tsv' else ',')
+    configure_logging(debug=settings.debug, log_level=settings.log_level)
+    try:
+        await import_words(args.path, delimiter, skip_header=args.header, chunk_size=args.chunk_size)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,167 @@
+import asyncio
+import contextlib
+import time
+from datetime import date, datetime, time as dtime, timedelta, timezone
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramForbiddenError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from ruentrainerbot.core.logging import get_logger
+from ruentrainerbot.core.metrics import registry
+from ruentrainerbot.db.queries import (get_or_create_reminder_run, get_reminder_recipients,
+                                       save_reminder_checkpoint, try_lock_reminder_run,
+                                       unlock_reminder_run)
+from ruentrainerbot.db.session import replica_router
+from ruentrainerbot.middlewares.api_rate_limit import TokenBucket
+
+logger = get_logger(__name__)
+
+reminders_sent = registry.counter(
+    'bot_reminders_total',
+    'Напоминания рассылки по результату',
+    labelnames=('result',),
+)
+
+REMINDER_TEXT = 'Пора повторить слова! Нажми /myquiz, чтобы начать квиз по личным словам'
+
+
+class ReminderBroadcaster:
+    """
+    Ежедневная рассылка напоминаний пользователям с активными словами.
+    - получатели читаются (с реплики, если она есть) окнами по window id,
+      соединение закрывается до отправки: долгий запрос на реплике
+      конфликтовал бы с применением WAL. Окно отправляется пачками
+      по chunk_size;
+    - рассылку за день ведет один процесс: перед началом он берет
+      advisory lock дня на primary и держит его до конца рассылки;
+    - отправка не быстрее rate сообщений в секунду и не больше
+      concurrency одновременно (поверх лимитов сессии бота);
+    - после каждой пачки в reminder_runs записывается последний
+      обработанный id: после перезапуска рассылка продолжается с него,
+      повторно может уйти только незаконченная пачка
+    """
+    def __init__(self,
+                 bot: Bot,
+                 engine: AsyncEngine,
+                 rate: float = 20,
+                 concurrency: int = 10,
+                 chunk_size: int = 500,
+                 window: int = 5000,
+                 text: str = REMINDER_TEXT
+                 ) -> None:
+        self.bot = bot
+        self.engine = engine
+        self.rate = rate
+        self.concurrency = concurrency
+        self.chunk_size = chunk_size
+        self.window = window
+        self.text = text
+        self._task: asyncio.Task | None = None
+
+    async def _send(self, user_id: int, bucket: TokenBucket, slots: asyncio.Semaphore) -> str:
+        async with slots:
+            await bucket.acquire()
+            try:
+                await self.bot.send_message(user_id, self.text)
+                result = 'sent'
+            except TelegramForbiddenError:
+                result = 'blocked'
+            except TelegramAPIError as e:
+                logger.warning('reminder_failed', user_id=user_id, error=str(e))
+                result = 'failed'
+        reminders_sent.inc(result=result)
+        return result
+
+    async def broadcast(self, run_date: date) -> dict[str, int] | None:
+        """
+        Рассылает напоминания за run_date или продолжает начатую рассылку.
+        Возвращает счетчики этого запуска и скорость в сообщениях в секунду,
+        None - рассылку за run_date сейчас ведет другой процесс
+        """
+        async with self.engine.connect() as lock_conn:
+            locked = await try_lock_reminder_run(lock_conn, run_date)
+            # lock сессионный: транзакцию закрываем, чтобы соединение не висело в ней
+            await lock_conn.commit()
+            if not locked:
+                logger.info('reminders_locked_elsewhere', run_date=str(run_date))
+                return None
+            try:
+                return await self._broadcast(run_date)
+            finally:
+                await unlock_reminder_run(lock_conn, run_date)
+                await lock_conn.commit()
+
+    async def _broadcast(self, run_date: date) -> dict[str, int]:
+        async with self.engine.begin() as conn:
+            run = await get_or_create_reminder_run(conn, run_date)
+        if run.finished_at is not None:
+            return {'sent': 0, 'blocked': 0, 'failed': 0, 'rate': 0}
+
+        last_user_id = run.last_user_id
+        bucket = TokenBucket(self.rate, 1)
+        slots = asyncio.Semaphore(self.concurrency)
+        totals = {'sent': 0, 'blocked': 0, 'failed': 0}
+        started = time.perf_counter()
+        logger.info('reminders_started', run_date=str(run_date), after_user_id=last_user_id)
+
+        while True:
+            async with replica_router.read_engine().connect() as conn:
+                recipients = await get_reminder_recipients(conn, last_user_id, self.window)
+            for i in range(0, len(recipients), self.chunk_size):
+                chunk = recipients[i:i + self.chunk_size]
+                results = await asyncio.gather(*(self._send(u, bucket, slots) for u in chunk))
+                counts = {key: results.count(key) for key in totals}
+                last_user_id = chunk[-1]
+                async with self.engine.begin() as checkpoint:
+                    await save_reminder_checkpoint(checkpoint, run_date, last_user_id, **counts)
+                for key, n in counts.items():
+                    totals[key] += n
+                elapsed = time.perf_counter() - started
+                logger.info('reminders_progress', last_user_id=last_user_id,
+                            rate=round(sum(totals.values()) / elapsed, 1), **totals)
+            if len(recipients) < self.window:
+                break
+
+        async with self.engine.begin() as conn:
+            await save_reminder_checkpoint(conn, run_date, last_user_id, 0, 0, 0, finished=True)
+        elapsed = time.perf_counter() - started
+        totals['rate'] = round(sum(totals.values()) / elapsed, 1) if elapsed else 0
+        logger.info('reminders_finished', run_date=str(run_date), elapsed=round(elapsed, 1), **totals)
+        return totals
+
+    async def _schedule_loop(self, at: dtime) -> None:
+        while True:
+            now = datetime.now(timezone.utc)
+            today = now.date()
+            if now.time() >= at:
+                # время рассылки сегодня прошло: догоняем или продолжаем ее
+                try:
+                    totals = await self.broadcast(today)
+                except Exception:
+                    logger.exception('reminders_failed', run_date=str(today))
+                    await asyncio.sleep(60)
+                    continue
+                if totals is None:
+                    # если другой процесс упадет, рассылку продолжит этот
+                    await asyncio.sleep(60)
+                    continue
+                next_run = datetime.combine(today + timedelta(days=1), at, tzinfo=timezone.utc)
+            else:
+                next_run = datetime.combine(today, at, tzinfo=timezone.utc)
+            await asyncio.sleep((next_run - datetime.now(timezone.utc)).total_seconds())
+
+    def start(self, at: dtime) -> None:
+        """
+        Запускает ежедневную рассылку в at по UTC
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._schedule_loop(at))
+
+    async def stop(self) -> None:
+        """
+        Останавливает рассылку: незаконченная пачка повторится после перезапуска
+        """
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
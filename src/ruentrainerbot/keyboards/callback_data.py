@@ -0,0 +1,43 @@
+from typing import NamedTuple
+
+# действие - первый символ callback_data
+ANSWER = 'a'
+ADD = 'd'
+REMOVE = 'r'
+NOOP = 'n'
+STOP = 's'
+ACTIONS = frozenset((ANSWER, ADD, REMOVE, NOOP, STOP))
+
+
+class QuizCallback(NamedTuple):
+    """
+    Данные кнопки квиза: действие, id квиза, номер вопроса
+    и аргумент действия (индекс варианта ответа или id слова).
+    Упаковываются в строку вида a1f3c9e0:3:2 - несколько байт
+    из 64 разрешенных Telegram
+    """
+    action: str
+    session: int
+    index: int
+    arg: int = 0
+
+
+def pack(action: str, session: int, index: int, arg: int = 0) -> str:
+    """
+    Упаковывает данные кнопки квиза в callback_data
+    """
+    return f'{action}{session:x}:{index}:{arg}'
+
+
+def unpack(data: str | None) -> QuizCallback | None:
+    """
+    Разбирает callback_data кнопки квиза.
+    Возвращает None для чужого или старого формата (quiz:ans:0)
+    """
+    if not data or data[0] not in ACTIONS:
+        return None
+    try:
+        session, index, arg = data[1:].split(':')
+        return QuizCallback(data[0], int(session, 16), int(index), int(arg))
+    except ValueError:
+        return None
@@ -1,22 +1,45 @@
-from aiogram.types import InlineKeyboardMarkup
-from aiogram.utils.keyboard import InlineKeyboardBuilder
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from ruentrainerbot.keyboards.callback_data import ADD, ANSWER, NOOP, REMOVE, STOP, pack
+
 
 def quiz_options_kb(
         options: list[str],
         word_id: int,
     is_added: bool,
+    session: int = 0,
+    index: int = 0,
 ) -> InlineKeyboardMarkup:
     """
-    Кнопки ответы и завершить
+    Кнопки ответы и завершить.
+    В callback_data каждой кнопки упакованы id квиза session и номер
+    вопроса index, по ним отсекаются нажатия на старые вопросы.
+    Поэтому разметка у каждого вопроса своя и не кешируется: модели
+    собираются напрямую, без InlineKeyboardBuilder
     """
-    kb = InlineKeyboardBuilder()
-    for i, opt in enumerate(options):
-        kb.button(text=opt, callback_data=f'quiz:ans:{i}')
+    buttons = [
+        InlineKeyboardButton(text=opt, callback_data=pack(ANSWER, session, index, i))
+        for i, opt in enumerate(options)
+    ]
     if is_added:
-        kb.button(text='✅ Добавлен', callback_data='quiz:noop')
-        kb.button(text='➖ Удалить', callback_data=f'quiz:rm:{word_id}')
+        buttons.append(InlineKeyboardButton(text='✅ Добавлен', callback_data=pack(NOOP, session, index)))
+        buttons.append(InlineKeyboardButton(text='➖ Удалить', callback_data=pack(REMOVE, session, index, word_id)))
     else:
-        kb.button(text='➕ Добавить', callback_data=f'quiz:add:{word_id}')
-    kb.button(text='Завершить квиз', callback_data='quiz:stop')
-    kb.adjust(2)
-    return kb.as_markup()
+        buttons.append(InlineKeyboardButton(text='➕ Добавить', callback_data=pack(ADD, session, index, word_id)))
+    buttons.append(InlineKeyboardButton(text='Завершить квиз', callback_data=pack(STOP, session, index)))
+    # по две кнопки в ряд
+    return InlineKeyboardMarkup(inline_keyboard=[buttons[i:i + 2] for i in range(0, len(buttons), 2)])
+
+
+def options_from_kb(markup: InlineKeyboardMarkup | None) -> list[str]:
+    """
+    Возвращает варианты ответа из клавиатуры вопроса
+    """
+    if markup is None:
+        return []
+    return [
+        button.text
+        for row in markup.inline_keyboard
+        for button in row
+        if button.callback_data and button.callback_data[0] == ANSWER
+    ]
+
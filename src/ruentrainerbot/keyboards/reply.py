@@ -3,14 +3,21 @@ from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
 BTN_START = "Старт"
 BTN_QUIZ = "Квиз"
 BTN_MY_QUIZ = "Мой квиз"
+BTN_STATS = "Статистика"
+
+MAIN_MENU_ROWS = (
+    (BTN_START,),
+    (BTN_QUIZ, BTN_MY_QUIZ),
+    (BTN_STATS,),
+)
+
+# клавиатура не меняется, собираем ее один раз
+MAIN_MENU_KB = ReplyKeyboardMarkup(
+    keyboard=[[KeyboardButton(text=text) for text in row] for row in MAIN_MENU_ROWS],
+    resize_keyboard=True,
+    selective=True,
+)
 
 
 def main_menu_kb() -> ReplyKeyboardMarkup:
-    return ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton(text=BTN_START)],
-            [KeyboardButton(text=BTN_QUIZ), KeyboardButton(text=BTN_MY_QUIZ)],
-        ],
-        resize_keyboard=True,
-        selective=True,
-    )
+    return MAIN_MENU_KB
@@ -0,0 +1,139 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod
+from ruentrainerbot.core.logging import get_logger
+from ruentrainerbot.core.metrics import registry
+
+logger = get_logger(__name__)
+
+throttle_wait = registry.histogram(
+    'bot_api_throttle_wait_seconds',
+    'Ожидание токена перед вызовом Bot API',
+    labelnames=('method',),
+)
+retry_after_total = registry.counter(
+    'bot_api_retry_after_total',
+    'Ответы Bot API 429 с retry_after',
+    labelnames=('method',),
+)
+
+
+class TokenBucket:
+    """
+    Ведро токенов: rate токенов в секунду, не больше capacity подряд.
+    acquire() резервирует токен сразу и спит до момента, когда он
+    станет доступен, поэтому ожидающие обслуживаются по очереди.
+    pause() блокирует ведро на время retry_after
+    """
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    @property
+    def idle(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity and self.blocked_until <= self.updated
+
+    async def acquire(self) -> float:
+        """
+        Берет токен, при необходимости дожидаясь его.
+        Возвращает время ожидания в секундах
+        """
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= 1
+        wait = max(-self.tokens / self.rate, self.blocked_until - now, 0.0)
+        if wait:
+            await asyncio.sleep(wait)
+        return wait
+
+    def pause(self, seconds: float) -> None:
+        now = time.monotonic()
+        self._refill(now)
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        # токены, выданные до паузы, снова станут доступны только после нее
+        self.tokens = min(self.tokens, 0.0)
+
+
+class ApiRateLimitMiddleware(BaseRequestMiddleware):
+    """
+    Middleware сессии бота, которое ограничивает исходящие вызовы Bot API
+    под лимиты Telegram:
+    - методы с chat_id (отправка и редактирование сообщений) проходят
+      через общее ведро global_rate в секунду и ведро своего чата:
+      chat_rate в секунду для личных чатов, group_rate для групп;
+    - на 429 ответ ставит на паузу ведро чата (без чата - ждет сам вызов)
+      на retry_after секунд и повторяет вызов до max_retries раз.
+    Ведра чатов, которые полностью восстановились, вытесняются,
+    когда их больше max_chats
+    """
+    def __init__(self,
+                 global_rate: float,
+                 chat_rate: float,
+                 chat_burst: float,
+                 group_rate: float,
+                 max_retries: int,
+                 max_chats: int = 10_000
+                 ) -> None:
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self.max_chats = max_chats
+        self._chats: OrderedDict[Any, TokenBucket] = OrderedDict()
+
+    def _chat_bucket(self, chat_id: Any) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            is_group = isinstance(chat_id, str) or chat_id < 0
+            bucket = self._chats[chat_id] = TokenBucket(
+                self.group_rate if is_group else self.chat_rate,
+                self.chat_burst,
+            )
+            while len(self._chats) > self.max_chats:
+                oldest_id, oldest = next(iter(self._chats.items()))
+                if not oldest.idle:
+                    break
+                del self._chats[oldest_id]
+        else:
+            self._chats.move_to_end(chat_id)
+        return bucket
+
+    async def __call__(self,
+                       make_request: NextRequestMiddlewareType,
+                       bot: Bot,
+                       method: TelegramMethod
+                       ) -> Any:
+        chat_id = getattr(method, 'chat_id', None)
+        name = type(method).__name__
+        attempt = 0
+        while True:
+            if chat_id is not None:
+                waited = await self._chat_bucket(chat_id).acquire()
+                waited += await self.global_bucket.acquire()
+                throttle_wait.observe(waited, method=name)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                retry_after_total.inc(method=name)
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                logger.warning('bot_api_retry_after', method=name, retry_after=e.retry_after, attempt=attempt)
+                if chat_id is None:
+                    await asyncio.sleep(e.retry_after)
+                else:
+                    self._chat_bucket(chat_id).pause(e.retry_after)
@@ -0,0 +1,153 @@
+import asyncio
+import contextlib
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Hashable
+from aiogram import Bot, Dispatcher
+from aiogram.dispatcher.middlewares.user_context import UserContextMiddleware
+from aiogram.types import Update
+from ruentrainerbot.core.logging import get_logger
+from ruentrainerbot.core.metrics import registry
+
+logger = get_logger(__name__)
+
+queue_depth = registry.gauge('bot_update_queue_depth', 'Апдейты в очереди исполнителя и в обработке')
+active_chats = registry.gauge('bot_update_active_chats', 'Чаты с апдейтами в очереди или в обработке')
+queue_wait = registry.histogram('bot_update_queue_wait_seconds', 'Ожидание апдейта в очереди исполнителя')
+
+Job = tuple[Callable[[], Awaitable[Any]], float]
+# фильтр приема: вернул задание - оно встает в очередь чата вместо апдейта
+IntakeFilter = Callable[[Bot, Update], Callable[[], Awaitable[Any]] | None]
+
+
+def chat_key(update: Update) -> Hashable:
+    """
+    Ключ очереди апдейта: чат, пользователь или сам апдейт
+    """
+    context = UserContextMiddleware.resolve_event_context(update)
+    if context.chat is not None:
+        return context.chat.id
+    if context.user is not None:
+        return context.user.id
+    return object()
+
+
+class UpdateExecutor:
+    """
+    Исполнитель апдейтов: очереди по чатам и concurrency воркеров.
+    Задания ставит QueuedDispatcher при приеме апдейта, до middleware
+    диспетчера, поэтому загрузка FSM и вся цепочка middleware
+    выполняются уже в воркере.
+    - задания одного чата выполняются строго по очереди, поэтому
+      get_data/update_data одного квиза не пересекаются;
+    - разные чаты обрабатываются параллельно, не больше concurrency сразу,
+      чаты обслуживаются по кругу по одному заданию;
+    - в очереди не больше max_queue заданий: когда она полна,
+      прием нового апдейта ждет (поллинг не запрашивает новые апдейты,
+      вебхук не отвечает Telegram)
+    """
+    def __init__(self, concurrency: int, max_queue: int) -> None:
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self._slots = asyncio.Semaphore(max_queue)
+        self._chats: dict[Hashable, deque[Job]] = {}
+        self._ready: asyncio.Queue[Hashable] = asyncio.Queue()
+        self._workers: list[asyncio.Task] = []
+        self._queued = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def __len__(self) -> int:
+        return self._queued
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    async def submit(self, key: Hashable, job: Callable[[], Awaitable[Any]]) -> None:
+        """
+        Ставит задание в очередь чата key.
+        Возвращает управление сразу, при полной очереди ждет места
+        """
+        await self._slots.acquire()
+        self._queued += 1
+        self._idle.clear()
+        queue_depth.set(self._queued)
+        jobs = self._chats.get(key)
+        if jobs is None:
+            self._chats[key] = deque([(job, time.monotonic())])
+            active_chats.set(len(self._chats))
+            self._ready.put_nowait(key)
+        else:
+            jobs.append((job, time.monotonic()))
+
+    async def _worker(self) -> None:
+        while True:
+            key = await self._ready.get()
+            jobs = self._chats[key]
+            job, queued_at = jobs.popleft()
+            queue_wait.observe(time.monotonic() - queued_at)
+            try:
+                await job()
+            except Exception:
+                # необработанную ошибку апдейта aiogram уже залогировал,
+                # здесь она не должна остановить воркер
+                logger.exception('update_job_failed')
+            finally:
+                if jobs:
+                    # чат снова в конец очереди, чтобы не занимать воркер надолго
+                    self._ready.put_nowait(key)
+                else:
+                    del self._chats[key]
+                    active_chats.set(len(self._chats))
+                self._queued -= 1
+                queue_depth.set(self._queued)
+                self._slots.release()
+                if not self._queued:
+                    self._idle.set()
+
+    def start(self) -> None:
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        """
+        Дожидается обработки принятых апдейтов и останавливает воркеры
+        """
+        await self._idle.wait()
+        for worker in self._workers:
+            worker.cancel()
+        for worker in self._workers:
+            with contextlib.suppress(asyncio.CancelledError):
+                await worker
+        self._workers = []
+
+
+class QueuedDispatcher(Dispatcher):
+    """
+    Диспетчер, который принимает апдейты в UpdateExecutor.
+    feed_update - общая точка приема поллинга, вебхука и воркера:
+    апдейт ставится в очередь своего чата как есть, а обычный
+    feed_update (outer middleware, FSM, ошибки в dp.errors, лог
+    «handled/not handled» с полным временем) выполняется в воркере.
+    intake_filters вызываются синхронно до очереди: если фильтр вернул
+    задание (например, короткий ответ на устаревшее нажатие), в очередь
+    чата встает оно, а апдейт в диспетчер не попадает
+    """
+    def __init__(self, *, executor: UpdateExecutor, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.executor = executor
+        self.intake_filters: list[IntakeFilter] = []
+
+    async def feed_update(self, bot: Bot, update: Update, **kwargs: Any) -> Any:
+        if not self.executor.running:
+            return await super().feed_update(bot, update, **kwargs)
+        for intake_filter in self.intake_filters:
+            job = intake_filter(bot, update)
+            if job is not None:
+                break
+        else:
+            feed = super().feed_update
+            job = lambda: feed(bot, update, **kwargs)  # noqa: E731
+        await self.executor.submit(chat_key(update), job)
+        return None
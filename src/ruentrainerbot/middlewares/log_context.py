@@ -1,13 +1,23 @@
+import time
 import structlog
-from typing import Any, Awaitable, Callable, Dict, Optional
-from aiogram import BaseMiddleware
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.dispatcher.event.bases import UNHANDLED
 from aiogram.types import TelegramObject, Update
+from ruentrainerbot.core.logging import get_logger
+from ruentrainerbot.core.query_stats import start_query_stats, stop_query_stats
+
+logger = get_logger(__name__)
 
 
 class LogContextMiddleware(BaseMiddleware):
     """
     Автоматически добавляет
-    контекст текущего Telegram апдейта в логи structlog
+    контекст текущего Telegram апдейта в логи structlog.
+    Считает SQL запросы апдейта и по завершении пишет одну запись
+    update_processed (INFO) с итогом: db_queries, db_time_ms и duration_ms.
+    Внешний middleware, стоит перед FSMContextMiddleware (см. setup_log_context),
+    поэтому чтение состояния FSM тоже засчитывается апдейту
     """
     async def __call__(
             self,
@@ -16,7 +26,7 @@ class LogContextMiddleware(BaseMiddleware):
             data: Dict[str, Any],
     ) -> Any:
         ctx: Dict[str, Any] = {}
-        update = data.get('update')
+        update = event if isinstance(event, Update) else data.get('event_update')
         from_user = data.get('event_from_user')
         chat = data.get('event_chat')
         if update is not None:
@@ -27,7 +37,34 @@ class LogContextMiddleware(BaseMiddleware):
             ctx['chat_id'] = chat.id
 
         structlog.contextvars.bind_contextvars(**ctx)
+        stats = start_query_stats()
+        started = time.perf_counter()
+        handled = False
         try:
-            return await handler(event, data)
+            response = await handler(event, data)
+            handled = response is not UNHANDLED
+            return response
         finally:
+            logger.info(
+                'update_processed',
+                handled=handled,
+                duration_ms=round((time.perf_counter() - started) * 1000, 2),
+                **stats.as_dict(),
+            )
+            stop_query_stats()
             structlog.contextvars.clear_contextvars()
+
+
+def setup_log_context(dp: Dispatcher) -> None:
+    """
+    Подключает LogContextMiddleware внешним middleware апдейтов
+    сразу после UserContextMiddleware (пользователь и чат уже известны)
+    и перед FSMContextMiddleware, который читает состояние из хранилища
+    """
+    outer = dp.update.outer_middleware
+    fsm_registered = dp.fsm in outer[:]
+    if fsm_registered:
+        outer.unregister(dp.fsm)
+    outer(LogContextMiddleware())
+    if fsm_registered:
+        outer(dp.fsm)
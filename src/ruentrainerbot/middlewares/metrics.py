@@ -0,0 +1,58 @@
+import time
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.types import TelegramObject
+from ruentrainerbot.core.metrics import registry
+
+handler_latency = registry.histogram(
+    'bot_handler_latency_seconds',
+    'Время работы обработчика апдейта',
+    labelnames=('router', 'handler', 'update_type'),
+)
+handler_errors = registry.counter(
+    'bot_handler_errors_total',
+    'Исключения в обработчиках апдейтов',
+    labelnames=('router', 'handler', 'update_type', 'error'),
+)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """
+    Замеряет время работы обработчика и считает исключения
+    с разбивкой по роутеру, имени обработчика и типу апдейта.
+    Внутренний middleware: вызывается уже после фильтров,
+    когда известно, какой обработчик выбран
+    """
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any],
+    ) -> Any:
+        handler_object = data.get('handler')
+        router = data.get('event_router')
+        update = data.get('event_update')
+        labels = {
+            'router': router.name if router is not None else '',
+            'handler': handler_object.callback.__name__ if handler_object is not None else '',
+            'update_type': update.event_type if update is not None else '',
+        }
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            handler_errors.inc(error=type(e).__name__, **labels)
+            raise
+        finally:
+            handler_latency.observe(time.perf_counter() - started, **labels)
+
+
+def setup_handler_metrics(dp: Dispatcher) -> None:
+    """
+    Подключает HandlerMetricsMiddleware ко всем типам событий диспетчера.
+    Внутренние middleware наследуются вложенными роутерами
+    """
+    middleware = HandlerMetricsMiddleware()
+    for name, observer in dp.observers.items():
+        if name not in ('update', 'error'):
+            observer.middleware(middleware)
@@ -1,16 +1,52 @@
 import random
+from collections import OrderedDict
+from typing import NamedTuple
 from ruentrainerbot.db.models import Dictionary
 
+
+class Question(NamedTuple):
+    """
+    Подготовленный вопрос квиза.
+    В FSM хранится как JSON-массив id без текста слов:
+    ru и en берутся по id из снимка словаря при отправке вопроса
+    """
+    word_id: int
+    option_ids: list[int]
+    correct_index: int
+    is_added: bool
+
+    @classmethod
+    def load(cls, raw: list) -> 'Question | None':
+        """
+        Восстанавливает вопрос из FSM.
+        None - вопрос в старом формате (с текстом слов)
+        """
+        if len(raw) != len(cls._fields):
+            return None
+        return cls(*raw)
+
+
 def build_options(correct: Dictionary,
                    wrong: list[Dictionary]
-                   ) -> tuple[list[str], int]:
+                   ) -> tuple[list[int], int]:
     """
-    Возвращает options, correct_index
+    Возвращает option_ids, correct_index
     """
-    options = [correct.en, *[w.en for w in wrong]]
-    random.shuffle(options)
-    correct_index = options.index(correct.en)
-    return options, correct_index
+    option_ids = [correct.id, *[w.id for w in wrong]]
+    random.shuffle(option_ids)
+    correct_index = option_ids.index(correct.id)
+    return option_ids, correct_index
+
+def build_question(correct: Dictionary,
+                   wrong: list[Dictionary],
+                   is_added: bool
+                   ) -> Question:
+    """
+    Готовит вопрос квиза для хранения в FSM:
+    id слова, id вариантов ответа, индекс правильного и флаг «уже добавлено»
+    """
+    option_ids, correct_index = build_options(correct, wrong)
+    return Question(correct.id, option_ids, correct_index, is_added)
 
 def render_question_text(question_num: int,
                         total: int,
@@ -22,4 +58,82 @@ def render_question_text(question_num: int,
     return (
         f'Вопрос {question_num}/{total}\n'
         f'Как переводится: {ru_word}?'
-    )
\ No newline at end of file
+    )
+
+
+def new_session_id() -> int:
+    """
+    Возвращает id нового квиза для callback_data, 0 означает «квиза нет»
+    """
+    return random.randrange(1, 2 ** 32)
+
+
+class QuizPositions:
+    """
+    Текущий вопрос (id квиза, номер вопроса) активных квизов,
+    которые ведет этот процесс. По нему нажатие на кнопку старого
+    вопроса или прошлого квиза отсекается при приеме апдейта,
+    до очереди и загрузки FSM.
+    Хранит не больше max_users последних пользователей; если
+    пользователя нет (вытеснен, процесс перезапущен), позиция
+    сверяется с данными FSM
+    """
+    def __init__(self, max_users: int = 100_000) -> None:
+        self.max_users = max_users
+        self._positions: OrderedDict[int, tuple[int, int]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def set(self, user_id: int, session: int, index: int) -> None:
+        self._positions[user_id] = (session, index)
+        self._positions.move_to_end(user_id)
+        if len(self._positions) > self.max_users:
+            self._positions.popitem(last=False)
+
+    def discard(self, user_id: int) -> None:
+        self._positions.pop(user_id, None)
+
+    def finish(self, user_id: int) -> None:
+        """
+        Квиз завершен: все нажатия по его кнопкам устарели
+        """
+        self.set(user_id, 0, 0)
+
+    def accept_answer(self, user_id: int, session: int, index: int) -> bool:
+        """
+        Проверяет ответ на вопрос index квиза session при приеме апдейта.
+        False - вопрос уже не текущий. Принятый ответ сразу сдвигает
+        позицию на следующий вопрос, поэтому повторное нажатие отклоняется,
+        даже если первое еще ждет в очереди. Неизвестную позицию
+        проверяет обработчик по данным FSM
+        """
+        position = self._positions.get(user_id)
+        if position is None:
+            return True
+        if position != (session, index):
+            return False
+        self.set(user_id, session, index + 1)
+        return True
+
+    def accept_stop(self, user_id: int, session: int) -> bool:
+        """
+        Проверяет кнопку «Завершить» квиза session при приеме апдейта.
+        False - это кнопка прошлого или уже завершенного квиза
+        """
+        position = self._positions.get(user_id)
+        if position is None:
+            return True
+        if position[0] != session:
+            return False
+        self.finish(user_id)
+        return True
+
+    def get(self, user_id: int) -> tuple[int, int] | None:
+        """
+        Возвращает (id квиза, номер вопроса) или None, если позиция неизвестна
+        """
+        return self._positions.get(user_id)
+
+
+quiz_positions = QuizPositions()
@@ -0,0 +1,104 @@
+import zlib
+import numpy as np
+
+NGRAM_SIZE = 3
+FEATURE_DIM = 256
+BLOCK_SIZE = 256
+# предел памяти на матрицу близостей одного блока: при большом словаре
+# блок сжимается до MAX_BLOCK_BYTES // (N * байт на ячейку) строк
+MAX_BLOCK_BYTES = 64 * 1024 * 1024
+
+
+def _ngrams(word: str, n: int) -> list[str]:
+    """
+    Возвращает символьные n-граммы слова с маркерами начала и конца
+    """
+    padded = f'^{word.lower()}$'
+    if len(padded) <= n:
+        return [padded]
+    return [padded[i:i + n] for i in range(len(padded) - n + 1)]
+
+
+def ngram_matrix(words: list[str],
+                 n: int = NGRAM_SIZE,
+                 dim: int = FEATURE_DIM
+                 ) -> np.ndarray:
+    """
+    Строит матрицу (len(words), dim) хешированных n-грамм,
+    нормированных по L2: скалярное произведение строк
+    равно косинусной близости слов
+    """
+    rows: list[int] = []
+    cols: list[int] = []
+    for i, word in enumerate(words):
+        for gram in _ngrams(word, n):
+            rows.append(i)
+            cols.append(zlib.crc32(gram.encode()) % dim)
+
+    matrix = np.zeros((len(words), dim), dtype=np.float32)
+    np.add.at(matrix, (np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)), 1.0)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+def _block_rows(n: int, block_size: int, bytes_per_cell: int) -> int:
+    """
+    Число строк в блоке: не больше block_size и столько, чтобы
+    блок из n столбцов по bytes_per_cell байт уместился в MAX_BLOCK_BYTES
+    """
+    return max(1, min(block_size, MAX_BLOCK_BYTES // max(n * bytes_per_cell, 1)))
+
+
+def nearest_neighbours(vectors: np.ndarray,
+                       query: np.ndarray,
+                       k: int,
+                       block_size: int = BLOCK_SIZE
+                       ) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Для строк vectors[query] возвращает индексы и оценки k ближайших
+    соседей (без самого слова), отсортированные по убыванию близости.
+    Считается блоками, чтобы не держать в памяти всю матрицу N x N:
+    на ячейку блока нужно 12 байт (близость float32 и индекс argpartition),
+    поэтому блок - не больше block_size строк и не больше MAX_BLOCK_BYTES
+    (при N = 500 000 это около 11 строк)
+    """
+    k = min(k, len(vectors) - 1)
+    indices = np.empty((len(query), max(k, 0)), dtype=np.int64)
+    scores = np.empty((len(query), max(k, 0)), dtype=np.float32)
+    if k <= 0:
+        return indices, scores
+
+    block_size = _block_rows(len(vectors), block_size, bytes_per_cell=12)
+    for start in range(0, len(query), block_size):
+        block = query[start:start + block_size]
+        sims = vectors[block] @ vectors.T
+        sims[np.arange(len(block)), block] = -np.inf
+        # минус на месте, без второй матрицы блока
+        np.negative(sims, out=sims)
+        top = np.argpartition(sims, k - 1, axis=1)[:, :k]
+        top_scores = -np.take_along_axis(sims, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        indices[start:start + len(block)] = np.take_along_axis(top, order, axis=1)
+        scores[start:start + len(block)] = np.take_along_axis(top_scores, order, axis=1)
+    return indices, scores
+
+
+def max_similarity(vectors: np.ndarray,
+                   query: np.ndarray,
+                   block_size: int = BLOCK_SIZE
+                   ) -> np.ndarray:
+    """
+    Для каждого слова возвращает максимальную близость
+    к любому из слов vectors[query] (не считая самого себя).
+    Блок близостей float32 ограничен MAX_BLOCK_BYTES, как в nearest_neighbours
+    """
+    best = np.full(len(vectors), -np.inf, dtype=np.float32)
+    block_size = _block_rows(len(vectors), block_size, bytes_per_cell=4)
+    for start in range(0, len(query), block_size):
+        block = query[start:start + block_size]
+        sims = vectors[block] @ vectors.T
+        sims[np.arange(len(block)), block] = -np.inf
+        np.maximum(best, sims.max(axis=0), out=best)
+    return best
@@ -0,0 +1,127 @@
+import csv
+import io
+import json
+from typing import AsyncGenerator, Iterator
+from aiogram import Bot
+from aiogram.types import InputFile
+from sqlalchemy.ext.asyncio import AsyncEngine
+from ruentrainerbot.db.models import Dictionary
+from ruentrainerbot.db.queries import stream_user_words
+
+EXPORT_FIELDS = ('en', 'ru', 'added_at', 'due_at')
+MAX_WORD_LENGTH = Dictionary.__table__.c.ru.type.length
+
+
+def _isoformat(value) -> str:
+    return value.isoformat() if value is not None else ''
+
+
+class UserWordsExport(InputFile):
+    """
+    Файл с личным словарем пользователя для answer_document.
+    Содержимое не собирается в памяти: read() читает user_words серверным
+    курсором и отдает CSV или JSON пачками, aiohttp отправляет их в Telegram
+    по мере чтения. При повторной отправке курсор открывается заново
+    """
+    def __init__(self, engine: AsyncEngine, user_id: int, fmt: str = 'csv') -> None:
+        super().__init__(filename=f'my_words.{fmt}')
+        self.engine = engine
+        self.user_id = user_id
+        self.fmt = fmt
+
+    def _csv(self, rows: list, header: bool) -> bytes:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if header:
+            writer.writerow(EXPORT_FIELDS)
+        writer.writerows((r.en, r.ru, _isoformat(r.added_at), _isoformat(r.due_at)) for r in rows)
+        return buffer.getvalue().encode()
+
+    def _json(self, rows: list, first: bool) -> bytes:
+        items = (
+            json.dumps(dict(zip(EXPORT_FIELDS, (r.en, r.ru, _isoformat(r.added_at), _isoformat(r.due_at)))),
+                       ensure_ascii=False)
+            for r in rows
+        )
+        return (('' if first else ',\n') + ',\n'.join(items)).encode()
+
+    async def read(self, bot: Bot) -> AsyncGenerator[bytes, None]:
+        if self.fmt == 'json':
+            yield b'[\n'
+        first = True
+        async with self.engine.connect() as conn:
+            async for rows in stream_user_words(conn, self.user_id):
+                yield self._json(rows, first) if self.fmt == 'json' else self._csv(rows, first)
+                first = False
+        if self.fmt == 'json':
+            yield b'\n]\n'
+        elif first:
+            yield self._csv([], header=True)
+
+
+def _word(value) -> str:
+    word = str(value or '').strip()
+    return word if len(word) <= MAX_WORD_LENGTH else ''
+
+
+def _json_rows(text: str) -> Iterator[tuple[str, str]]:
+    items = json.loads(text)
+    if not isinstance(items, list):
+        raise ValueError('JSON словаря должен быть списком')
+    for item in items:
+        if isinstance(item, dict):
+            yield _word(item.get('en')), _word(item.get('ru'))
+        elif isinstance(item, (list, tuple)) and item:
+            yield _word(item[0]), _word(item[1] if len(item) > 1 else '')
+        elif isinstance(item, str):
+            yield _word(item), ''
+
+
+def _csv_rows(text: str) -> Iterator[tuple[str, str]]:
+    lines = io.StringIO(text, newline='')
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(lines, dialect)
+    en_column, ru_column = 0, 1
+    for n, row in enumerate(reader):
+        cells = [cell.strip().lower() for cell in row]
+        if n == 0 and ('en' in cells or 'ru' in cells):
+            # заголовок: колонки по именам, как в файле /export
+            en_column = cells.index('en') if 'en' in cells else None
+            ru_column = cells.index('ru') if 'ru' in cells else None
+            continue
+        en = row[en_column] if en_column is not None and en_column < len(row) else ''
+        ru = row[ru_column] if ru_column is not None and ru_column < len(row) else ''
+        yield _word(en), _word(ru)
+
+
+def parse_user_words(data: bytes, filename: str | None) -> Iterator[tuple[str, str]]:
+    """
+    Разбирает загруженный файл словаря в пары (en, ru).
+    JSON: список объектов {"en": ..., "ru": ...} (как в /export json),
+    пар [en, ru] или строк en. CSV/TSV: колонки en и ru по заголовку,
+    без заголовка - en в первой колонке, ru во второй.
+    Пустое или слишком длинное слово возвращается как ''
+    Бросает ValueError, если файл не разбирается
+    """
+    text = data.decode('utf-8-sig')
+    if (filename or '').lower().endswith('.json') or text.lstrip().startswith('['):
+        return _json_rows(text)
+    return _csv_rows(text)
+
+
+def batched(rows: Iterator[tuple[str, str]], size: int) -> Iterator[list[tuple[str, str]]]:
+    """
+    Нарезает пары на пачки по size без повторов и пустых строк
+    """
+    batch: dict[tuple[str, str], None] = {}
+    for row in rows:
+        if row[0] or row[1]:
+            batch[row] = None
+        if len(batch) >= size:
+            yield list(batch)
+            batch = {}
+    if batch:
+        yield list(batch)
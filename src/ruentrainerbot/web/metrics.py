@@ -0,0 +1,29 @@
+from aiohttp import web
+from ruentrainerbot.core.metrics import registry
+from ruentrainerbot.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    return web.Response(
+        body=registry.render().encode(),
+        headers={'Content-Type': CONTENT_TYPE},
+    )
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    """
+    Поднимает отдельный aiohttp сервер с GET /metrics
+    в текстовом формате Prometheus.
+    Возвращает runner, который нужно закрыть через cleanup()
+    """
+    app = web.Application()
+    app.router.add_get('/metrics', metrics_handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info('metrics_server_started', host=host, port=port)
+    return runner
@@ -0,0 +1,93 @@
+import asyncio
+from typing import Any
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+from ruentrainerbot.core.config import settings
+from ruentrainerbot.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class BoundedRequestHandler(SimpleRequestHandler):
+    """
+    Обработчик вебхука, который сразу отвечает Telegram 200
+    и обрабатывает апдейт в фоне.
+    Одновременно обрабатывается не больше concurrency апдейтов:
+    когда все слоты заняты, ответ на новый запрос ждет освобождения слота,
+    и Telegram сам притормаживает доставку
+    """
+    def __init__(self,
+                 dispatcher: Dispatcher,
+                 bot: Bot,
+                 concurrency: int,
+                 secret_token: str | None = None,
+                 **data: Any
+                 ) -> None:
+        super().__init__(dispatcher, bot, handle_in_background=True, secret_token=secret_token, **data)
+        self._slots = asyncio.Semaphore(concurrency)
+
+    async def _background_feed_update(self, bot: Bot, update: dict[str, Any]) -> None:
+        try:
+            await super()._background_feed_update(bot=bot, update=update)
+        except Exception:
+            # трейсбек уже залогирован диспетчером aiogram
+            logger.error('webhook_update_failed', update_id=update.get('update_id'))
+        finally:
+            self._slots.release()
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        update = await request.json(loads=bot.session.json_loads)
+        await self._slots.acquire()
+        task = asyncio.create_task(self._background_feed_update(bot=bot, update=update))
+        self._background_feed_update_tasks.add(task)
+        task.add_done_callback(self._background_feed_update_tasks.discard)
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    async def close(self) -> None:
+        """
+        Дожидается обработки принятых апдейтов и закрывает сессию бота
+        """
+        if self._background_feed_update_tasks:
+            await asyncio.gather(*self._background_feed_update_tasks, return_exceptions=True)
+        await super().close()
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot) -> None:
+    """
+    Поднимает aiohttp сервер для приема апдейтов через вебхук.
+    Если задан WEBHOOK_URL, регистрирует вебхук в Telegram,
+    иначе только слушает порт (для локальной отправки апдейтов POST-запросом)
+    """
+    app = web.Application()
+    handler = BoundedRequestHandler(
+        dp,
+        bot,
+        concurrency=settings.webhook_concurrency,
+        secret_token=settings.webhook_secret,
+    )
+    handler.register(app, path=settings.webhook_path)
+    setup_application(app, dp, bot=bot)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, settings.webhook_host, settings.webhook_port)
+    await site.start()
+
+    if settings.webhook_url:
+        await bot.set_webhook(
+            settings.webhook_url.rstrip('/') + settings.webhook_path,
+            secret_token=settings.webhook_secret,
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+    logger.info(
+        'webhook_started',
+        host=settings.webhook_host,
+        port=settings.webhook_port,
+        path=settings.webhook_path,
+        concurrency=settings.webhook_concurrency,
+    )
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
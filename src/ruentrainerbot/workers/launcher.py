@@ -0,0 +1,199 @@
+import asyncio
+import contextlib
+import sys
+from aiogram import Bot, Dispatcher
+from aiogram.dispatcher.middlewares.user_context import UserContextMiddleware
+from aiogram.types import Update
+from aiohttp import web
+from ruentrainerbot.app import create_bot
+from ruentrainerbot.core.config import settings
+from ruentrainerbot.core.logging import get_logger
+from ruentrainerbot.core.metrics import registry
+from ruentrainerbot.handlers import routers
+
+logger = get_logger(__name__)
+
+routed_updates = registry.counter('bot_routed_updates_total', 'Апдейты, переданные воркерам', labelnames=('worker',))
+worker_restarts = registry.counter('bot_worker_restarts_total', 'Перезапуски упавших воркеров', labelnames=('worker',))
+
+MAX_RESTART_DELAY = 30.0
+STOP_TIMEOUT = 30.0
+
+
+class WorkerProcess:
+    """
+    Процесс-воркер и канал к нему: stdin процесса, по JSON апдейту на строку.
+    Если процесс завершился сам, перезапускает его с растущей задержкой.
+    Апдейты, которые воркер принял, но не успел обработать до падения, теряются
+    """
+    def __init__(self, index: int) -> None:
+        self.index = index
+        self.process: asyncio.subprocess.Process | None = None
+        self.restarts = 0
+        self._ready = asyncio.Event()
+        self._stopping = False
+        self._task: asyncio.Task | None = None
+
+    async def _spawn(self) -> None:
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable, '-m', 'ruentrainerbot.workers.worker', str(self.index),
+            stdin=asyncio.subprocess.PIPE,
+        )
+        self._ready.set()
+        logger.info('worker_spawned', worker=self.index, pid=self.process.pid)
+
+    async def _supervise(self) -> None:
+        delay = 1.0
+        while True:
+            await self._spawn()
+            code = await self.process.wait()
+            self._ready.clear()
+            if self._stopping:
+                return
+            self.restarts += 1
+            worker_restarts.inc(worker=str(self.index))
+            logger.error('worker_exited', worker=self.index, code=code, restart_in=delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RESTART_DELAY)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._supervise())
+
+    async def send(self, line: bytes) -> None:
+        """
+        Передает строку воркеру. Ждет, пока воркер запущен,
+        и пока канал не разгрузится (обратное давление)
+        """
+        while True:
+            await self._ready.wait()
+            if self.process.returncode is None:
+                try:
+                    self.process.stdin.write(line)
+                    await self.process.stdin.drain()
+                    return
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+            # воркер упал, ждем перезапуска
+            await asyncio.sleep(0.1)
+
+    async def stop(self) -> None:
+        """
+        Закрывает канал: воркер дообрабатывает принятые апдейты и выходит
+        """
+        self._stopping = True
+        if self.process is not None and self.process.returncode is None:
+            self.process.stdin.close()
+            try:
+                await asyncio.wait_for(self.process.wait(), timeout=STOP_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.error('worker_stop_timeout', worker=self.index)
+                self.process.kill()
+                await self.process.wait()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+
+class Launcher:
+    """
+    Распределяет апдейты по процессам-воркерам по id чата
+    (или пользователя, если чата нет): апдейты одного чата всегда
+    попадают в один воркер, и его FSM состояние живет в одном процессе
+    """
+    def __init__(self, workers: int) -> None:
+        self.workers = [WorkerProcess(i) for i in range(workers)]
+
+    def route(self, update: Update) -> WorkerProcess:
+        context = UserContextMiddleware.resolve_event_context(update)
+        if context.chat is not None:
+            key = context.chat.id
+        elif context.user is not None:
+            key = context.user.id
+        else:
+            key = update.update_id
+        return self.workers[key % len(self.workers)]
+
+    async def dispatch(self, update: Update) -> None:
+        worker = self.route(update)
+        line = update.model_dump_json(exclude_unset=True).encode() + b'\n'
+        await worker.send(line)
+        routed_updates.inc(worker=str(worker.index))
+
+    def start(self) -> None:
+        for worker in self.workers:
+            worker.start()
+
+    async def stop(self) -> None:
+        await asyncio.gather(*(worker.stop() for worker in self.workers))
+
+    async def poll(self, bot: Bot, allowed_updates: list[str]) -> None:
+        """
+        Забирает апдейты long polling и раздает их воркерам.
+        Смещение подтверждается только после передачи апдейта воркеру
+        """
+        offset = None
+        while True:
+            try:
+                updates = await bot.get_updates(offset=offset, timeout=30, allowed_updates=allowed_updates)
+            except Exception:
+                logger.exception('get_updates_failed')
+                await asyncio.sleep(1)
+                continue
+            for update in updates:
+                await self.dispatch(update)
+                offset = update.update_id + 1
+
+    async def serve_webhook(self, bot: Bot, allowed_updates: list[str]) -> None:
+        """
+        Принимает апдейты вебхуком и раздает их воркерам
+        """
+        async def handle(request: web.Request) -> web.Response:
+            if settings.webhook_secret and \
+                    request.headers.get('X-Telegram-Bot-Api-Secret-Token') != settings.webhook_secret:
+                return web.Response(status=401)
+            update = Update.model_validate(await request.json(), context={'bot': bot})
+            await self.dispatch(update)
+            return web.json_response({})
+
+        app = web.Application()
+        app.router.add_post(settings.webhook_path, handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, settings.webhook_host, settings.webhook_port).start()
+        if settings.webhook_url:
+            await bot.set_webhook(
+                settings.webhook_url.rstrip('/') + settings.webhook_path,
+                secret_token=settings.webhook_secret,
+                allowed_updates=allowed_updates,
+            )
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
+
+
+async def run_launcher(workers: int) -> None:
+    """
+    Многопроцессный режим: запускает workers процессов-воркеров
+    и раздает им апдейты из поллинга или вебхука
+    """
+    dp = Dispatcher()
+    for r in routers:
+        dp.include_router(r)
+    allowed_updates = dp.resolve_used_update_types()
+
+    bot = create_bot()
+    launcher = Launcher(workers)
+    launcher.start()
+    logger.info('launcher_started', workers=workers, mode=settings.mode)
+    try:
+        if settings.mode == 'webhook':
+            await launcher.serve_webhook(bot, allowed_updates)
+        else:
+            await launcher.poll(bot, allowed_updates)
+    finally:
+        with contextlib.suppress(Exception):
+            await bot.session.close()
+        await launcher.stop()
+        logger.info('launcher_stopped', restarts=sum(w.restarts for w in launcher.workers))
@@ -0,0 +1,51 @@
+"""
+Воркер многопроцессного режима: обычный бот, который получает апдейты
+не из Telegram, а от лаунчера через stdin (по JSON апдейту на строку).
+
+    python -m ruentrainerbot.workers.worker <index>
+"""
+import asyncio
+import json
+import sys
+from aiogram import Bot, Dispatcher
+from ruentrainerbot.app import run_bot
+from ruentrainerbot.core.config import settings
+from ruentrainerbot.core.logging import configure_logging, get_logger
+
+logger = get_logger(__name__)
+
+# апдейт с длинным текстом не должен упираться в лимит строки
+LINE_LIMIT = 16 * 1024 * 1024
+
+
+async def read_updates(dp: Dispatcher, bot: Bot) -> None:
+    """
+    Читает апдейты из stdin до EOF и передает их диспетчеру.
+    Исполнитель апдейтов принимает апдейт сразу, а при полной очереди
+    чтение останавливается, и лаунчер упирается в заполненный канал
+    """
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=LINE_LIMIT)
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    while line := await reader.readline():
+        await dp.feed_raw_update(bot, json.loads(line))
+
+
+async def main(index: int) -> None:
+    configure_logging(
+        debug=settings.debug,
+        log_level=getattr(settings, 'log_level', 'INFO'),
+        use_queue=settings.log_queue,
+        queue_size=settings.log_queue_size,
+        sample=settings.log_sample,
+    )
+    logger.info('worker_started', worker=index)
+    metrics_port = settings.metrics_port + 1 + index if settings.metrics_port else 0
+    # рассылку напоминаний ведет только первый воркер, она идет
+    # в его долю общего лимита сообщений
+    await run_bot(read_updates, metrics_port=metrics_port, reminders=index == 0,
+                  workers=settings.workers)
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1])))
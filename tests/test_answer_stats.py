@@ -0,0 +1,117 @@
+import asyncio
+import random
+from collections import Counter
+import pytest
+import sqlalchemy as sq
+
+try:
+    from ruentrainerbot.core.config import settings
+except Exception:
+    pytest.skip('нужны TOKEN, DSN и LOG_LEVEL в окружении или .env', allow_module_level=True)
+from sqlalchemy.ext.asyncio import create_async_engine
+from ruentrainerbot.db.models import LeaderboardScores, UserStats, WordStats
+from ruentrainerbot.db.queries import _streaks, apply_answer_stats
+
+
+def _reference(answers: list[bool]) -> tuple[int, int]:
+    """
+    Текущая и лучшая серия по всей истории ответов
+    """
+    current = best = 0
+    for ok in answers:
+        current = current + 1 if ok else 0
+        best = max(best, current)
+    return current, best
+
+
+def _random_batches(answers: list[bool], rng: random.Random) -> list[list[bool]]:
+    batches, start = [], 0
+    while start < len(answers):
+        size = rng.randint(1, 6)
+        batches.append(answers[start:start + size])
+        start += size
+    return batches
+
+
+@pytest.mark.parametrize('answers, expected', [
+    ([], (0, 0, 0)),
+    ([True, True, True], (3, 3, 3)),
+    ([False, False], (0, 0, 0)),
+    ([True, True, False, True], (2, 1, 2)),
+    ([False, True, True, True, False], (0, 0, 3)),
+])
+def test_streaks(answers, expected):
+    assert _streaks(answers) == expected
+
+
+def test_batched_streaks_match_history():
+    # та же формула, что в UPDATE apply_answer_stats
+    rng = random.Random(1)
+    for _ in range(500):
+        answers = [rng.random() < 0.7 for _ in range(rng.randint(1, 40))]
+        current = best = 0
+        for batch in _random_batches(answers, rng):
+            head, tail, batch_best = _streaks(batch)
+            best = max(best, batch_best, current + head)
+            current = current + len(batch) if head == len(batch) else tail
+        assert (current, best) == _reference(answers)
+
+
+async def _apply_and_check(dsn: str) -> None:
+    rng = random.Random(2)
+    # отрицательные id не пересекаются с настоящими пользователями и словами
+    histories = {
+        -9_000_000 - i: [rng.random() < 0.6 for _ in range(rng.randint(1, 30))]
+        for i in range(50)
+    }
+    rows_by_batch: list[list[dict]] = [[] for _ in range(8)]
+    for user_id, answers in histories.items():
+        batches = _random_batches(answers, rng)
+        for n, batch in enumerate(batches):
+            rows_by_batch[n * len(rows_by_batch) // len(batches)].extend(
+                {'user_id': user_id, 'word_id': -1 - rng.randrange(5), 'is_correct': ok} for ok in batch
+            )
+    engine = create_async_engine(dsn)
+    try:
+        async with engine.connect() as conn:
+            transaction = await conn.begin()
+            try:
+                before = dict((await conn.execute(sq.select(LeaderboardScores.score, LeaderboardScores.users))).all())
+                words_total = sq.select(
+                    sq.func.coalesce(sq.func.sum(WordStats.answers), 0),
+                    sq.func.coalesce(sq.func.sum(WordStats.correct), 0),
+                ).where(WordStats.word_id < 0)
+                words_before = (await conn.execute(words_total)).one()
+                for rows in rows_by_batch:
+                    if rows:
+                        await apply_answer_stats(conn, rows, chunk_size=7)
+
+                stats = {
+                    row.user_id: row for row in
+                    await conn.execute(sq.select(UserStats).where(UserStats.user_id.in_(histories)))
+                }
+                for user_id, answers in histories.items():
+                    row = stats[user_id]
+                    assert (row.answers, row.correct) == (len(answers), sum(answers))
+                    assert (row.current_streak, row.best_streak) == _reference(answers)
+
+                after = dict((await conn.execute(sq.select(LeaderboardScores.score, LeaderboardScores.users))).all())
+                buckets = Counter({score: after.get(score, 0) - before.get(score, 0) for score in {*before, *after}})
+                assert +buckets == Counter(sum(answers) for answers in histories.values())
+
+                words_after = (await conn.execute(words_total)).one()
+                assert (words_after[0] - words_before[0], words_after[1] - words_before[1]) == (
+                    sum(map(len, histories.values())),
+                    sum(map(sum, histories.values())),
+                )
+            finally:
+                await transaction.rollback()
+    finally:
+        await engine.dispose()
+
+
+def test_apply_answer_stats_matches_history():
+    try:
+        asyncio.run(_apply_and_check(settings.dsn))
+    except OSError as e:
+        pytest.skip(f'БД недоступна: {e}')
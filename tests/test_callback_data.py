@@ -0,0 +1,23 @@
+import pytest
+from ruentrainerbot.keyboards.callback_data import ADD, ANSWER, NOOP, REMOVE, STOP, QuizCallback, pack, unpack
+
+
+@pytest.mark.parametrize('action', [ANSWER, ADD, REMOVE, NOOP, STOP])
+def test_pack_unpack_roundtrip(action):
+    data = pack(action, 0xFFFFFFFF, 9, 123456)
+    assert unpack(data) == QuizCallback(action, 0xFFFFFFFF, 9, 123456)
+
+
+def test_pack_fits_telegram_limit():
+    assert len(pack(REMOVE, 2 ** 32 - 1, 99, 2 ** 31 - 1).encode()) <= 64
+
+
+def test_unpack_default_arg():
+    assert unpack(pack(STOP, 1, 0)) == QuizCallback(STOP, 1, 0, 0)
+
+
+@pytest.mark.parametrize('data', [
+    None, '', 'quiz:ans:0', 'quiz:stop', 'x1:0:0', 'a', 'a1:0', 'a1:0:0:0', 'azz:0:0', 'a1:x:0',
+])
+def test_unpack_rejects_foreign_data(data):
+    assert unpack(data) is None
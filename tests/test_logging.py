@@ -0,0 +1,88 @@
+import asyncio
+import io
+import json
+import logging
+import structlog
+from datetime import datetime, timezone
+from aiogram import Bot, Dispatcher
+from aiogram.types import Chat, Message, Update, User
+from ruentrainerbot.core import logging as bot_logging
+from ruentrainerbot.core.query_stats import current_query_stats
+from ruentrainerbot.middlewares.log_context import LogContextMiddleware, setup_log_context
+
+
+def _queue_logs(emit) -> list[dict]:
+    stream = io.StringIO()
+    bot_logging.configure_logging(debug=False, log_level='INFO', use_queue=True)
+    bot_logging._writer.stream = stream
+    try:
+        emit()
+    finally:
+        bot_logging._stop_writer()
+        logging.basicConfig(force=True, handlers=[logging.NullHandler()])
+        structlog.reset_defaults()
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_stdlib_args_are_merged_at_call_time():
+    items = ['a']
+
+    def emit():
+        logging.getLogger('aiogram').info('items %s', items)
+        items.append('b')
+
+    [record] = _queue_logs(emit)
+    assert record['event'] == "items ['a']"
+    assert record['level'] == 'info'
+
+
+def test_stdlib_exception_is_rendered():
+    def emit():
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            logging.getLogger('aiogram').exception('failed')
+
+    [record] = _queue_logs(emit)
+    assert record['event'] == 'failed'
+    assert 'ZeroDivisionError' in record['exception']
+
+
+def test_update_is_logged_once_with_queries_counted_before_fsm():
+    dp = Dispatcher()
+    setup_log_context(dp)
+    outer = [type(m) for m in dp.update.outer_middleware[:]]
+    assert outer.index(LogContextMiddleware) == outer.index(type(dp.fsm)) - 1
+
+    class CountingStorage(type(dp.fsm.storage)):
+        async def get_state(self, key):
+            current_query_stats().add(0.001)
+            return await super().get_state(key)
+
+    dp.fsm.storage = CountingStorage()
+
+    @dp.message()
+    async def handler(message: Message) -> None:
+        structlog.get_logger().info('handled')
+
+    update = Update(update_id=1, message=Message(
+        message_id=1,
+        date=datetime.now(timezone.utc),
+        chat=Chat(id=7, type='private'),
+        from_user=User(id=7, is_bot=False, first_name='u'),
+        text='hi',
+    ))
+    bot = Bot('1:test')
+    records = _queue_logs(lambda: asyncio.run(dp.feed_update(bot, update)))
+    records = [r for r in records if 'update_id' in r]
+    assert [r['event'] for r in records] == ['handled', 'update_processed']
+    assert 'db_queries' not in records[0]
+    assert records[1]['level'] == 'info'
+    assert records[1]['db_queries'] == 1
+    assert records[1]['handled'] is True
+    assert records[1]['user_id'] == 7
+
+
+def test_json_serializer_stringifies_non_str_keys():
+    # orjson без OPT_NON_STR_KEYS падает на словаре с ключами-числами
+    assert json.loads(bot_logging._dumps({'ids': {1: 'a'}})) == {'ids': {'1': 'a'}}
@@ -0,0 +1,24 @@
+import pytest
+from ruentrainerbot.core.metrics import Registry, _Metric
+
+
+def test_metric_without_samples_cannot_be_created():
+    class Broken(_Metric):
+        kind = 'gauge'
+
+    with pytest.raises(TypeError):
+        Broken('broken', 'без _samples')
+
+
+def test_registry_renders_all_kinds():
+    registry = Registry()
+    registry.counter('taps_total', 'Нажатия', labelnames=('action',)).inc(action='a')
+    registry.gauge('queue_depth', 'Очередь').set(3)
+    registry.histogram('wait_seconds', 'Ожидание', buckets=(0.1, 1.0)).observe(0.5)
+
+    text = registry.render()
+    assert '# TYPE taps_total counter\ntaps_total{action="a"} 1.0\n' in text
+    assert 'queue_depth 3.0\n' in text
+    assert 'wait_seconds_bucket{le="0.1"} 0\n' in text
+    assert 'wait_seconds_bucket{le="1.0"} 1\n' in text
+    assert 'wait_seconds_count 1\n' in text
@@ -0,0 +1,33 @@
+import json
+from array import array
+from ruentrainerbot.db.models import Dictionary
+from ruentrainerbot.db.snapshot import DictionarySnapshot
+from ruentrainerbot.utils.quiz import Question, build_question
+
+
+def test_question_stores_ids_only():
+    correct = Dictionary(id=5, ru='кот', en='cat')
+    wrong = [Dictionary(id=7, ru='машина', en='car'), Dictionary(id=9, ru='шапка', en='hat')]
+    question = build_question(correct, wrong, is_added=True)
+    assert sorted(question.option_ids) == [5, 7, 9]
+    assert question.option_ids[question.correct_index] == 5
+
+    raw = json.loads(json.dumps(question))
+    assert 'cat' not in json.dumps(raw)
+    assert Question.load(raw) == question
+
+
+def test_old_question_format_is_not_loaded():
+    assert Question.load([5, 'кот', 'cat', ['cat', 'car', 'hat'], 0, False]) is None
+
+
+def test_snapshot_get_by_id():
+    snapshot = DictionarySnapshot()
+    snapshot._ids = array('i', [3, 5, 9])
+    snapshot._ru = 'докоткепка'.encode()
+    snapshot._ru_offsets = array('I', [0, len('до'.encode()), len('докот'.encode()), len('докоткепка'.encode())])
+    snapshot._en, snapshot._en_offsets = b'docatcap', array('I', [0, 2, 5, 8])
+    word = snapshot.get(5)
+    assert (word.id, word.ru, word.en) == (5, 'кот', 'cat')
+    assert snapshot.get(4) is None
+    assert snapshot.get(10) is None
@@ -0,0 +1,60 @@
+from ruentrainerbot.utils.quiz import QuizPositions
+
+
+def test_unknown_position_is_left_to_fsm():
+    positions = QuizPositions()
+    assert positions.accept_answer(1, 10, 0)
+    assert positions.accept_stop(1, 10)
+    assert positions.get(1) is None
+
+
+def test_answer_to_current_question_advances():
+    positions = QuizPositions()
+    positions.set(1, 10, 2)
+    assert positions.accept_answer(1, 10, 2)
+    assert positions.get(1) == (10, 3)
+
+
+def test_double_tap_is_rejected():
+    positions = QuizPositions()
+    positions.set(1, 10, 2)
+    assert positions.accept_answer(1, 10, 2)
+    assert not positions.accept_answer(1, 10, 2)
+
+
+def test_old_question_and_old_quiz_are_rejected():
+    positions = QuizPositions()
+    positions.set(1, 10, 2)
+    assert not positions.accept_answer(1, 10, 1)
+    assert not positions.accept_answer(1, 10, 3)
+    assert not positions.accept_answer(1, 9, 2)
+    assert positions.get(1) == (10, 2)
+
+
+def test_stop_finishes_quiz():
+    positions = QuizPositions()
+    positions.set(1, 10, 2)
+    assert not positions.accept_stop(1, 9)
+    assert positions.accept_stop(1, 10)
+    assert not positions.accept_stop(1, 10)
+    assert not positions.accept_answer(1, 10, 2)
+
+
+def test_users_are_independent():
+    positions = QuizPositions()
+    positions.set(1, 10, 0)
+    positions.set(2, 20, 0)
+    assert positions.accept_answer(1, 10, 0)
+    assert positions.accept_answer(2, 20, 0)
+
+
+def test_least_recent_user_is_evicted():
+    positions = QuizPositions(max_users=2)
+    positions.set(1, 10, 0)
+    positions.set(2, 20, 0)
+    positions.set(1, 10, 1)
+    positions.set(3, 30, 0)
+    assert len(positions) == 2
+    assert positions.get(2) is None
+    assert positions.get(1) == (10, 1)
+    assert positions.accept_answer(2, 99, 5)
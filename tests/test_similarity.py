@@ -0,0 +1,36 @@
+import numpy as np
+from ruentrainerbot.utils import similarity
+from ruentrainerbot.utils.similarity import max_similarity, nearest_neighbours, ngram_matrix
+
+WORDS = ['cat', 'cats', 'car', 'cart', 'dog', 'dogs', 'door', 'house', 'mouse', 'horse']
+
+
+def _brute_force(vectors: np.ndarray, k: int) -> np.ndarray:
+    sims = vectors @ vectors.T
+    np.fill_diagonal(sims, -np.inf)
+    return np.sort(sims, axis=1)[:, ::-1][:, :k]
+
+
+def test_nearest_neighbours_match_brute_force():
+    vectors = ngram_matrix(WORDS)
+    indices, scores = nearest_neighbours(vectors, np.arange(len(WORDS)), k=3, block_size=4)
+    np.testing.assert_allclose(scores, _brute_force(vectors, 3), rtol=1e-6)
+    assert (indices != np.arange(len(WORDS))[:, None]).all()
+    assert WORDS[indices[WORDS.index('cat'), 0]] == 'cats'
+
+
+def test_block_shrinks_under_memory_cap(monkeypatch):
+    vectors = ngram_matrix(WORDS)
+    expected_scores = nearest_neighbours(vectors, np.arange(len(WORDS)), k=3)[1]
+    expected_best = max_similarity(vectors, np.arange(3))
+    # блок из одной строки: 10 слов * 12 байт
+    monkeypatch.setattr(similarity, 'MAX_BLOCK_BYTES', 120)
+    assert similarity._block_rows(len(WORDS), 256, bytes_per_cell=12) == 1
+    np.testing.assert_allclose(nearest_neighbours(vectors, np.arange(len(WORDS)), k=3)[1], expected_scores)
+    np.testing.assert_allclose(max_similarity(vectors, np.arange(3)), expected_best)
+
+
+def test_block_rows_bounds():
+    assert similarity._block_rows(1000, 256, bytes_per_cell=12) == 256
+    assert similarity._block_rows(500_000, 256, bytes_per_cell=12) == 11
+    assert similarity._block_rows(10 ** 9, 256, bytes_per_cell=12) == 1
@@ -0,0 +1,36 @@
+import pytest
+
+try:
+    from ruentrainerbot.utils.user_dictionary import batched, parse_user_words
+except Exception:
+    pytest.skip('нужны TOKEN, DSN и LOG_LEVEL в окружении или .env', allow_module_level=True)
+
+
+def test_json_export_format():
+    data = '[{"en": "cat", "ru": "кот", "added_at": ""}, ["dog", "собака"], "house"]'.encode()
+    assert list(parse_user_words(data, 'my_words.json')) == [('cat', 'кот'), ('dog', 'собака'), ('house', '')]
+
+
+@pytest.mark.parametrize('data', [b'{"en": "cat", "ru": "cat"}', b'"cat"', b'42', b'[{"en": '])
+def test_json_must_be_a_list(data):
+    with pytest.raises(ValueError):
+        list(parse_user_words(data, 'words.json'))
+
+
+def test_csv_with_header_and_delimiter():
+    data = 'ru;en\nкот;cat\nсобака;dog\n'.encode()
+    assert list(parse_user_words(data, 'words.csv')) == [('cat', 'кот'), ('dog', 'собака')]
+
+
+def test_csv_without_header():
+    data = '\ufeffcat,кот\ndog\n'.encode()
+    assert list(parse_user_words(data, None)) == [('cat', 'кот'), ('dog', '')]
+
+
+def test_too_long_word_is_empty():
+    assert list(parse_user_words(('x' * 500 + ',кот').encode(), 'words.csv')) == [('', 'кот')]
+
+
+def test_batched_skips_duplicates_and_empty_rows():
+    rows = [('cat', 'кот'), ('', ''), ('cat', 'кот'), ('dog', ''), ('', 'дом')]
+    assert list(batched(iter(rows), 2)) == [[('cat', 'кот'), ('dog', '')], [('', 'дом')]]